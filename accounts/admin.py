@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import CustomUser
+from .models import CustomUser, OutboundEmail
 # Register your models here.
 
 
 @admin.register(CustomUser)
 class CustomUserManager(admin.ModelAdmin):
     list_display = ['username','email','is_superuser','is_active','is_staff']
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
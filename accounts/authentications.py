@@ -1,14 +1,50 @@
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .revocation import is_revoked
 
 User = get_user_model()
 
 
+DEFAULTS = {
+    # must be shared by all workers (REDIS_URL) for evictions to reach every worker
+    'CACHE_ALIAS': 'default',
+    # seconds a resolved user is served from the cache, saves and deletes evict it earlier
+    'TIMEOUT': 60,
+}
+
+
+def get_user_cache_options():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_USER_CACHE', {})}
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def evict_user(user_id):
+    caches[get_user_cache_options()['CACHE_ALIAS']].delete(user_cache_key(user_id))
+
+
 class AuthenticationBackend(BaseBackend):
-    @classmethod
-    def authenticate(self, email=None, password=None):
-        user = User.objects.get(email=email)
-        if user is not None and user.check_password(password) and user.is_active == True:
+    # everything a login response needs, fetched with one lookup on the unique email index
+    login_fields = ['id', 'username', 'email', 'password', 'is_active']
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        try:
+            user = User.objects.only(*self.login_fields).get(email=email)
+        except User.DoesNotExist:
+            # hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and user.is_active:
             return user
         return None
 
@@ -16,4 +52,40 @@ class AuthenticationBackend(BaseBackend):
         try:
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that keeps resolved users in the cache, so
+    authenticated requests do not load the user row every time, and rejects
+    revoked tokens.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken('توکن باطل شده است')
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        options = get_user_cache_options()
+        cache = caches[options['CACHE_ALIAS']]
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # checks the user exists and is active, only users that pass are cached
+            user = super().get_user(validated_token)
+            cache.set(key, user, options['TIMEOUT'])
+            return user
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
@@ -0,0 +1,89 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.benchmarks import endpoint
+
+User = get_user_model()
+
+
+@endpoint('user-login')
+def login(data):
+    return 'post', reverse('user-login'), {
+        'email': data.random.choice(data.users).email, 'password': data.password
+    }
+
+
+@endpoint('token_obtain_pair')
+def token_obtain_pair(data):
+    return 'post', reverse('token_obtain_pair'), {
+        'email': data.random.choice(data.users).email, 'password': data.password
+    }
+
+
+@endpoint('token_refresh')
+def token_refresh(data):
+    return 'post', reverse('token_refresh'), {
+        'refresh': str(RefreshToken.for_user(data.random.choice(data.users)))
+    }
+
+
+@endpoint('user-logout')
+def logout(data):
+    return 'post', reverse('user-logout'), {
+        'refresh_token': str(RefreshToken.for_user(data.random.choice(data.users)))
+    }
+
+
+@endpoint('user-registration', status=201)
+def registration(data):
+    name = f'benchmark-{uuid.uuid4().hex[:12]}'
+    return 'post', reverse('user-registration'), {
+        'username': name,
+        'email': f'{name}@example.com',
+        'password': data.password,
+        'confirm_password': data.password,
+    }
+
+
+@endpoint('email-verification')
+def email_verification(data):
+    name = f'benchmark-{uuid.uuid4().hex[:12]}'
+    token = str(uuid.uuid4())
+    User.objects.create(
+        username=name,
+        email=f'{name}@example.com',
+        email_verification_token=token,
+        token_created_at=timezone.now(),
+    )
+    return 'get', reverse('email-verification', args=[token]), None
+
+
+@endpoint('password_reset_request')
+def password_reset_request(data):
+    return 'post', reverse('password_reset_request'), {'email': data.random.choice(data.users).email}
+
+
+@endpoint('password_reset_check')
+def password_reset_check(data):
+    return 'get', reverse('password_reset_check', args=[reset_token(data)]), None
+
+
+@endpoint('password_reset_confirm')
+def password_reset_confirm(data):
+    # the seeded password is kept, later logins still use it
+    return 'post', reverse('password_reset_confirm'), {
+        'token': reset_token(data),
+        'new_password': data.password,
+        'confirm_new_password': data.password,
+    }
+
+
+def reset_token(data):
+    token = str(uuid.uuid4())
+    User.objects.filter(pk=data.random.choice(data.users).pk).update(
+        token=token, token_created_at=timezone.now()
+    )
+    return token
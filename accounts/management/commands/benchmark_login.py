@@ -0,0 +1,70 @@
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+from accounts.views import LoginView
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = 'Measure LoginView throughput of one worker for password hash cost profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--logins', type=int, default=200, help='Logins per profile')
+        parser.add_argument(
+            '--iterations', type=int, nargs='+',
+            help='PBKDF2 iteration counts to compare, defaults to PASSWORD_HASH_ITERATIONS'
+        )
+
+    def handle(self, *args, **options):
+        profiles = options['iterations'] or [settings.PASSWORD_HASH_ITERATIONS]
+        view = LoginView.as_view()
+        factory = APIRequestFactory()
+
+        with transaction.atomic():
+            prefix = uuid.uuid4().hex[:8]
+            emails = [f'{prefix}-login-{i}@example.com' for i in range(options['users'])]
+            User.objects.bulk_create([
+                User(username=email, email=email, password=make_password(PASSWORD), is_active=True)
+                for email in emails
+            ])
+
+            for iterations in profiles:
+                with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+                    # the first login of each user rehashes to the profile, measure the steady state
+                    for email in emails:
+                        self.login(view, factory, email)
+                    timings = [
+                        self.login(view, factory, emails[i % len(emails)])
+                        for i in range(options['logins'])
+                    ]
+                self.report(iterations, timings)
+
+            transaction.set_rollback(True)
+
+    def login(self, view, factory, email):
+        request = factory.post('/accounts/login/', {'email': email, 'password': PASSWORD}, format='json')
+        started = time.perf_counter()
+        response = view(request)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, response.data
+        return elapsed * 1000
+
+    def report(self, iterations, timings):
+        timings.sort()
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        self.stdout.write(
+            f'{iterations:>8} iterations   {1000 / statistics.mean(timings):7.1f} logins/s per worker   '
+            f'p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms'
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from accounts.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Emails sent over one SMTP connection')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new emails')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            # drain everything that is due before sleeping
+            while True:
+                sent, failed = send_pending(options['batch_size'])
+                if not sent and not failed:
+                    break
+                self.stdout.write(f'{sent} sent, {failed} failed')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('token__isnull', False)), fields=['token'], name='user_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('email_verification_token__isnull', False)), fields=['email_verification_token'], name='user_email_token_idx'),
+        ),
+    ]
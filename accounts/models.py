@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 
 
@@ -50,6 +51,61 @@ class CustomUser(PermissionsMixin, AbstractBaseUser):
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
+        indexes = [
+            models.Index(fields=['token'], name='user_token_idx', condition=models.Q(token__isnull=False)),
+            models.Index(
+                fields=['email_verification_token'],
+                name='user_email_token_idx',
+                condition=models.Q(email_verification_token__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.username
+
+
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'در انتظار ارسال'),
+        ('sent', 'ارسال شده'),
+        ('failed', 'ناموفق'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Outbound email"
+        verbose_name_plural = "Outbound emails"
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                name='outbound_email_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class RevokedToken(models.Model):
+    # the token's jti claim, checked on every refresh
+    jti = models.CharField(max_length=255, primary_key=True)
+    # the token's own expiry, after which the row is useless and purged
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Revoked token"
+        verbose_name_plural = "Revoked tokens"
+
+    def __str__(self):
+        return self.jti
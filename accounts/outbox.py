@@ -0,0 +1,112 @@
+"""
+Outbound email queue. Requests only insert an ``OutboundEmail`` row, in the
+same transaction as the change that triggered it; the ``send_emails`` worker
+delivers pending rows in batches over one SMTP connection and retries
+failures with exponential backoff. A batch is claimed in a short
+transaction that pushes its ``next_attempt_at`` out by a lease, the emails
+are sent outside of it and every result is saved on its own, so a slow
+mail server holds no locks. Rows of a worker that dies mid-batch are due
+again once the lease runs out.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    # seconds before the first retry, doubled for every further attempt
+    'RETRY_BACKOFF': 60,
+    'MAX_BACKOFF': 60 * 60,
+    # seconds a claimed batch is hidden from other workers, longer than sending it takes
+    'LEASE': 10 * 60,
+}
+
+
+def get_outbox_options():
+    return {**DEFAULTS, **getattr(settings, 'EMAIL_OUTBOX', {})}
+
+
+def enqueue(subject, body, to, from_email=None):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+
+
+def retry_delay(attempts):
+    options = get_outbox_options()
+    return timedelta(seconds=min(options['RETRY_BACKOFF'] * 2 ** (attempts - 1), options['MAX_BACKOFF']))
+
+
+def claim(batch_size, options):
+    """Lease a batch of due emails to this worker, skipping rows other workers are claiming."""
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=options['LEASE'])
+        )
+    return emails
+
+
+def send_pending(batch_size=None):
+    """
+    Send one batch of due emails and return ``(sent, failed)``. Rows are
+    claimed with SKIP LOCKED and a lease, so several workers can run side
+    by side.
+    """
+    options = get_outbox_options()
+    emails = claim(batch_size or options['BATCH_SIZE'], options)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            record_failure(email, error, options)
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.to, connection=connection
+            )
+            try:
+                message.send()
+            except Exception as error:
+                record_failure(email, error, options)
+                failed += 1
+            else:
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.attempts += 1
+                email.save(update_fields=['status', 'sent_at', 'attempts'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def record_failure(email, error, options):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'
+    if email.attempts >= options['MAX_ATTEMPTS']:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from core.query_plans import hot_query
+from .models import OutboundEmail
+
+User = get_user_model()
+
+
+@hot_query('login_by_email', 'accounts_customuser')
+def login_by_email():
+    return User.objects.filter(email='user@example.com')
+
+
+@hot_query('password_reset_token', 'accounts_customuser', indexes=['user_token_idx'])
+def password_reset_token():
+    return User.objects.filter(
+        token='00000000-0000-0000-0000-000000000000',
+        token_created_at__gt=timezone.now() - timezone.timedelta(hours=1)
+    )
+
+
+@hot_query('email_verification_token', 'accounts_customuser', indexes=['user_email_token_idx'])
+def email_verification_token():
+    return User.objects.filter(
+        email_verification_token='00000000-0000-0000-0000-000000000000',
+        is_active=False,
+        token_created_at__gt=timezone.now() - timezone.timedelta(days=1)
+    )
+
+
+@hot_query('pending_emails', 'accounts_outboundemail', indexes=['outbound_email_pending_idx'])
+def pending_emails():
+    return OutboundEmail.objects.filter(
+        status='pending', next_attempt_at__lte=timezone.now()
+    ).order_by('next_attempt_at')[:100]
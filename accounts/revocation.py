@@ -0,0 +1,67 @@
+"""
+Revoked JWTs, keyed by their ``jti``. Revoking writes one ``RevokedToken``
+row per token, which ``TokenRefreshView`` checks with a primary key lookup,
+and a cache entry that expires together with the token, which the
+authentication of every request checks without touching the database. Rows
+are useless once their token expired, ``purge_revoked_tokens`` deletes them
+through the index on ``expires_at``.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+
+DEFAULTS = {
+    # must be shared by all workers (REDIS_URL) for logouts to reach the auth path everywhere
+    'CACHE_ALIAS': 'default',
+}
+
+
+def get_revocation_options():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_REVOCATION', {})}
+
+
+def cache_key(jti):
+    return f'auth:revoked:{jti}'
+
+
+def revoke(*tokens):
+    """Revoke validated tokens until they expire."""
+    revoked = [
+        RevokedToken(jti=token[api_settings.JTI_CLAIM], expires_at=datetime_from_epoch(token['exp']))
+        for token in tokens
+    ]
+    RevokedToken.objects.bulk_create(revoked, ignore_conflicts=True)
+
+    def cache_revoked():
+        now = timezone.now()
+        cache = caches[get_revocation_options()['CACHE_ALIAS']]
+        for token in revoked:
+            seconds = (token.expires_at - now).total_seconds()
+            if seconds > 0:
+                cache.set(cache_key(token.jti), True, seconds)
+
+    transaction.on_commit(cache_revoked)
+
+
+def is_revoked(token, durable=False):
+    """
+    Whether ``token`` was revoked. The cache answers unless ``durable`` asks
+    for the table, which also holds revocations the cache lost.
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti is None:
+        return False
+    if caches[get_revocation_options()['CACHE_ALIAS']].get(cache_key(jti)):
+        return True
+    return durable and RevokedToken.objects.filter(jti=jti).exists()
+
+
+def purge_expired():
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -1,10 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
-from django.core.mail import send_mail
-from django.conf import settings
 from .authentications import AuthenticationBackend
+from . import outbox
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from .revocation import is_revoked, revoke
 import uuid
 
 User = get_user_model()
@@ -23,7 +27,8 @@ class LoginSerializer(serializers.Serializer):
         password = attrs.get('password', None)
 
         if email and password:
-            user = AuthenticationBackend.authenticate(
+            user = AuthenticationBackend().authenticate(
+                self.context.get('request'),
                 email=email, 
                 password=password
             )
@@ -85,6 +90,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         
         return attrs
 
+    @transaction.atomic
     def create(self, validated_data):
         email_verification_token = str(uuid.uuid4())
         
@@ -98,18 +104,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             token_created_at=timezone.now()
         )
         
-        try:
-            request = self.context.get('request')
-            verification_link = f"http://{request.get_host()}/accounts/verify-email/{email_verification_token}/"
-            send_mail(
-                'تایید ایمیل',
-                f'برای تایید ایمیل روی لینک زیر کلیک کنید:\n{verification_link}',
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-            )
-        except:
-            raise serializers.ValidationError({"email": "ناموفق در ارسال ایمیل"})
+        request = self.context.get('request')
+        verification_link = f"http://{request.get_host()}/accounts/verify-email/{email_verification_token}/"
+        outbox.enqueue(
+            'تایید ایمیل',
+            f'برای تایید ایمیل روی لینک زیر کلیک کنید:\n{verification_link}',
+            [user.email],
+        )
         
         return user
 
@@ -122,6 +123,7 @@ class PasswordResetRequestSerializer(serializers.Serializer):
             raise serializers.ValidationError("ایمیل موجود نیست")
         return value
 
+    @transaction.atomic
     def send_password_reset_email(self, email):
         user = User.objects.get(email=email)
         reset_token = str(uuid.uuid4())
@@ -132,12 +134,10 @@ class PasswordResetRequestSerializer(serializers.Serializer):
         request = self.context.get('request')
         reset_link = f"http://{request.get_host()}/accounts/password-reset-confirm/{reset_token}/"
         
-        send_mail(
+        outbox.enqueue(
             'بازیابی رمز عبور',
             f'برای بازیابی رمز عبور روی لینک زیر کلیک کنید:\n{reset_link}',
-            settings.DEFAULT_FROM_EMAIL,
             [email],
-            fail_silently=False,
         )
 
 
@@ -175,4 +175,15 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         user.token = None
         user.token_created_at = None
         user.save()
-        return user
\ No newline at end of file
+        return user
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked(refresh, durable=True):
+            raise InvalidToken('توکن باطل شده است')
+        data = super().validate(attrs)
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            revoke(refresh)
+        return data
@@ -1,3 +1,227 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from core.throttling import local_buckets
+from .authentications import user_cache_key
+from .models import OutboundEmail, RevokedToken
+from .outbox import enqueue, send_pending
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class LoginTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'secret', is_active=True)
+        self.url = reverse('user-login')
+
+    def login(self, email='buyer@example.com', password='secret'):
+        return self.client.post(self.url, {'email': email, 'password': password}, format='json')
+
+    def iterations(self):
+        self.user.refresh_from_db()
+        return identify_hasher(self.user.password).decode(self.user.password)['iterations']
+
+    def test_login_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_id'], self.user.pk)
+        self.assertEqual(response.data['email'], 'buyer@example.com')
+        self.assertIn('access_token', response.data)
+        self.assertIn('refresh_token', response.data)
+
+    def test_rejected_logins(self):
+        self.assertEqual(self.login(password='wrong').status_code, 400)
+        self.assertEqual(self.login(email='nobody@example.com').status_code, 400)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login().status_code, 400)
+
+    def test_password_is_rehashed_for_a_new_cost_profile(self):
+        self.assertEqual(self.iterations(), 1000)
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.iterations(), 2000)
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'secret', is_active=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('carts-list')
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_saving_the_user_evicts_it(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.set_password('changed')
+            self.user.save()
+        self.client.get(self.url)
+        self.assertEqual(cache.get(user_cache_key(self.user.pk)).password, self.user.password)
+
+
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'secret', is_active=True)
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def logout(self, refresh_token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('user-logout'), {'refresh_token': refresh_token}, format='json')
+
+    def test_logout_revokes_refresh_and_access_tokens(self):
+        self.assertEqual(self.client.get(reverse('carts-list')).status_code, 200)
+        self.assertEqual(self.logout(str(self.refresh)).status_code, 200)
+
+        self.assertEqual(self.client.get(reverse('carts-list')).status_code, 401)
+        cache.clear()
+        refresh = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(refresh.status_code, 401)
+
+        other = RefreshToken.for_user(self.user)
+        refresh = self.client.post(reverse('token_refresh'), {'refresh': str(other)}, format='json')
+        self.assertEqual(refresh.status_code, 200)
+
+    def test_invalid_logouts(self):
+        self.client.credentials()
+        self.assertEqual(self.logout('').status_code, 400)
+        self.assertEqual(self.logout('not a token').status_code, 400)
+
+    def test_purge_deletes_expired_tokens_only(self):
+        RevokedToken.objects.create(jti='old', expires_at=timezone.now() - timedelta(seconds=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(days=1))
+        call_command('purge_revoked_tokens', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, THROTTLING={'RATES': {'login': '3/min'}})
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_buckets.clear()
+        self.url = reverse('user-login')
+
+    def login(self, **extra):
+        return self.client.post(self.url, {'email': 'nobody@example.com', 'password': 'x'}, format='json', **extra)
+
+    def test_bucket_empties_and_reports_quota(self):
+        responses = [self.login() for _ in range(4)]
+        self.assertEqual([response.status_code for response in responses], [400, 400, 400, 429])
+        self.assertEqual([response['X-RateLimit-Remaining'] for response in responses], ['2', '1', '0', '0'])
+        self.assertEqual(responses[0]['X-RateLimit-Limit'], '3')
+        self.assertTrue(0 < int(responses[3]['Retry-After']) <= 20)
+
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, 400)
+        # the token endpoint checks passwords too and shares the quota
+        response = self.client.post(reverse('token_obtain_pair'), {'email': 'nobody@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_forwarded_addresses_count_behind_proxies_only(self):
+        for i in range(3):
+            self.login(HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+        self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='10.0.0.9').status_code, 429)
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.9').status_code, 400)
+
+    def test_local_buckets_when_the_cache_fails(self):
+        with patch('django.core.cache.backends.locmem.LocMemCache.add', side_effect=ConnectionError), \
+                self.assertLogs('core.throttling', 'WARNING'):
+            statuses = [self.login().status_code for _ in range(4)]
+        self.assertEqual(statuses, [400, 400, 400, 429])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, EMAIL_OUTBOX={'MAX_ATTEMPTS': 2, 'RETRY_BACKOFF': 60})
+class EmailOutboxTests(APITestCase):
+    def test_registration_only_enqueues(self):
+        response = self.client.post(reverse('user-registration'), {
+            'username': 'buyer',
+            'email': 'buyer@example.com',
+            'password': 'secret-password',
+            'confirm_password': 'secret-password',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, ['buyer@example.com'])
+        self.assertIn('/accounts/verify-email/', email.body)
+
+        out = StringIO()
+        call_command('send_emails', stdout=out)
+        self.assertIn('1 sent, 0 failed', out.getvalue())
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+
+    def test_batches_reuse_one_connection(self):
+        for i in range(3):
+            enqueue('subject', 'body', [f'user{i}@example.com'])
+        with patch('django.core.mail.backends.locmem.EmailBackend.open') as open_connection:
+            self.assertEqual(send_pending(batch_size=2), (2, 0))
+        open_connection.assert_called_once()
+        self.assertEqual(send_pending(), (1, 0))
+        self.assertEqual(send_pending(), (0, 0))
+
+    def test_claimed_emails_are_leased_while_they_are_sent(self):
+        enqueue('subject', 'body', ['user@example.com'])
+        due = []
+
+        def send(backend, messages):
+            # another worker looking for due rows now
+            due.append(OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=timezone.now()).exists())
+            return 1
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send):
+            self.assertEqual(send_pending(), (1, 0))
+        self.assertEqual(due, [False])
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+
+    def test_failures_back_off_then_give_up(self):
+        email = enqueue('subject', 'body', ['user@example.com'])
+        with patch('django.core.mail.EmailMessage.send', side_effect=OSError('connection reset')):
+            self.assertEqual(send_pending(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('pending', 1))
+            self.assertIn('connection reset', email.last_error)
+            # not due again until the backoff has passed
+            self.assertEqual(send_pending(), (0, 0))
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
+
+    def test_unreachable_server_reschedules_the_batch(self):
+        enqueue('subject', 'body', ['user@example.com'])
+        with patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError):
+            self.assertEqual(send_pending(), (0, 1))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.get().attempts, 1)
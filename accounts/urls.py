@@ -7,11 +7,9 @@ from .views import (
     PasswordResetCheckView,
     LoginView,
     LogoutView,
+    TokenObtainView,
 )
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path('login/', LoginView.as_view(), name='user-login'),
@@ -21,7 +19,7 @@ urlpatterns = [
     
     path('verify-email/<str:token>/', EmailVerificationView.as_view(), name='email-verification'),
     
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', TokenObtainView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     path('password-reset/', PasswordResetRequestView.as_view(), name='password_reset_request'),
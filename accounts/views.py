@@ -4,6 +4,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+from core.throttling import RateLimitMixin
+from .revocation import revoke
 from .serializers import (
     UserRegistrationSerializer, 
     PasswordResetRequestSerializer, 
@@ -17,8 +22,9 @@ User = get_user_model()
 
 
 
-class LoginView(APIView):
+class LoginView(RateLimitMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = LoginSerializer(
@@ -35,11 +41,8 @@ class LoginView(APIView):
                 'refresh_token': serializer.validated_data['refresh']
             }
             
-            response_serializer = UserLoginResponseSerializer(data=response_data)
-            response_serializer.is_valid(raise_exception=True)
-            
             return Response(
-                response_serializer.data, 
+                UserLoginResponseSerializer(response_data).data, 
                 status=status.HTTP_200_OK
             )
         
@@ -49,27 +52,33 @@ class LoginView(APIView):
         )
 
 
+class TokenObtainView(RateLimitMixin, TokenObtainPairView):
+    # checks passwords like LoginView, shares its quota
+    throttle_scope = 'login'
+
+
 class LogoutView(APIView):
     def post(self, request):
+        refresh_token = request.data.get('refresh_token')
         try:
-            refresh_token = request.data.get('refresh_token')
-            
-            from rest_framework_simplejwt.tokens import RefreshToken
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-            
-            return Response({
-                'message': 'با موفقیت خارج شدید'
-            }, status=status.HTTP_200_OK)
-        
-        except Exception as e:
+            token = RefreshToken(refresh_token) if refresh_token else None
+        except TokenError:
+            token = None
+        if token is None:
             return Response({
                 'error': 'خطا در خروج'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        # the access token of this request stops working too, not only the refresh token
+        revoke(token, *([request.auth] if request.auth is not None else []))
+        return Response({
+            'message': 'با موفقیت خارج شدید'
+        }, status=status.HTTP_200_OK)
+
 
-class UserRegistrationView(APIView):
+class UserRegistrationView(RateLimitMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'registration'
 
     def post(self, request):
         serializer = UserRegistrationSerializer(data=request.data,
@@ -104,8 +113,9 @@ class EmailVerificationView(APIView):
                 'error': 'توکن نامعتبر یا منقضی شده است'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class PasswordResetRequestView(APIView):
+class PasswordResetRequestView(RateLimitMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'password_reset'
 
     def post(self, request):
         serializer = PasswordResetRequestSerializer(data=request.data,
@@ -0,0 +1,38 @@
+"""
+Registry of endpoint benchmarks. Apps register one request builder per
+endpoint in their ``benchmarks`` module and ``manage.py benchmark_endpoints``
+replays each of them against a seeded dataset, recording latency and query
+counts and comparing them with a stored baseline.
+"""
+from django.utils.module_loading import autodiscover_modules
+
+
+class Endpoint:
+    def __init__(self, name, build, user=None, status=200):
+        self.name = name
+        self.build = build
+        self.user = user
+        self.status = status
+
+    def __repr__(self):
+        return f'<Endpoint {self.name}>'
+
+
+registry = {}
+
+
+def endpoint(name, user=None, status=200):
+    """
+    Register ``build(data)``, returning the ``(method, path, payload)`` of one
+    request to the endpoint. Any setup it does is not timed. ``user`` is
+    ``None``, ``'user'`` or ``'admin'``; the response must have ``status``.
+    """
+    def decorator(build):
+        registry[name] = Endpoint(name, build, user, status)
+        return build
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('benchmarks')
+    return registry
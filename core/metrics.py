@@ -0,0 +1,256 @@
+"""
+Per-view request metrics. ``RequestMetricsMiddleware`` records latency, SQL
+query count, database time and response rendering time of every request
+into histograms labelled by URL name, ``metrics_view`` exposes them in the
+Prometheus text format. Histograms live in process memory, so every worker
+process is scraped on its own. When ``REQUEST_METRICS['ENABLED']`` is off
+the middleware removes itself from the chain at startup.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': False,
+    # requests slower than this are logged with their SQL, None disables the log
+    'SLOW_REQUEST_MS': 500,
+    'LOG_SQL': True,
+    # at most this many statements are kept per request for the slow request log
+    'MAX_LOGGED_QUERIES': 50,
+    # addresses allowed to read the metrics endpoint
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+UNMATCHED = '<unmatched>'
+
+
+def get_metrics_options():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # one count per bucket plus +Inf, then the sum
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, '+Inf'], values):
+                cumulative += count
+                yield f'{self.name}_bucket{format_labels(self.labels, labels, le=bound)} {cumulative}'
+            yield f'{self.name}_sum{format_labels(self.labels, labels)} {values[-1]}'
+            yield f'{self.name}_count{format_labels(self.labels, labels)} {cumulative}'
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + 1
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        with self.lock:
+            series = dict(self.series)
+        for labels, value in sorted(series.items()):
+            yield f'{self.name}{format_labels(self.labels, labels)} {value}'
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+REQUEST_LABELS = ('view', 'method')
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Total time spent handling the request.',
+    LATENCY_BUCKETS, REQUEST_LABELS,
+)
+db_duration = Histogram(
+    'http_request_db_duration_seconds', 'Time spent executing SQL per request.',
+    LATENCY_BUCKETS, REQUEST_LABELS,
+)
+db_queries = Histogram(
+    'http_request_db_queries', 'SQL queries executed per request.',
+    QUERY_BUCKETS, REQUEST_LABELS,
+)
+render_duration = Histogram(
+    'http_response_render_seconds', 'Time spent serializing the response body.',
+    LATENCY_BUCKETS, REQUEST_LABELS,
+)
+responses = Counter('http_responses_total', 'Responses by status code.', (*REQUEST_LABELS, 'status'))
+
+METRICS = (request_duration, db_duration, db_queries, render_duration, responses)
+
+
+def render_metrics():
+    return '\n'.join(line for metric in METRICS for line in metric.collect()) + '\n'
+
+
+def reset_metrics():
+    for metric in METRICS:
+        metric.reset()
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` that times the SQL of one request."""
+
+    def __init__(self, keep_sql=0):
+        self.count = 0
+        self.duration = 0.0
+        self.keep_sql = keep_sql
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if len(self.statements) < self.keep_sql:
+                self.statements.append((elapsed, sql))
+
+
+def _add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = get_metrics_options()
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request = options['SLOW_REQUEST_MS'] and options['SLOW_REQUEST_MS'] / 1000
+        self.keep_sql = options['MAX_LOGGED_QUERIES'] if self.slow_request and options['LOG_SQL'] else 0
+        # under ASGI with async views the whole chain stays on the event loop
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = QueryRecorder(self.keep_sql)
+        request._metrics_render = 0.0
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder(self.keep_sql)
+        request._metrics_render = 0.0
+        started = time.perf_counter()
+        # the async ORM runs in the thread sync_to_async keeps for the request,
+        # the connection of the event loop thread never sees a query
+        await sync_to_async(_add_execute_wrapper)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_execute_wrapper)(recorder)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request, response, elapsed, recorder):
+        match = request.resolver_match
+        view = match.view_name if match else UNMATCHED
+        if view == 'metrics':
+            return
+        labels = (view, request.method)
+        request_duration.observe(labels, elapsed)
+        db_duration.observe(labels, recorder.duration)
+        db_queries.observe(labels, recorder.count)
+        render_duration.observe(labels, request._metrics_render)
+        responses.inc((*labels, str(response.status_code)))
+
+        if self.slow_request and elapsed >= self.slow_request:
+            self.log_slow_request(request, view, response, elapsed, recorder)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, time it from here
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def log_slow_request(self, request, view, response, elapsed, recorder):
+        lines = [
+            f'Slow request {request.method} {request.path} ({view}) {response.status_code}: '
+            f'{elapsed * 1000:.0f} ms, {recorder.count} queries in {recorder.duration * 1000:.0f} ms'
+        ]
+        lines.extend(f'  {duration * 1000:8.2f} ms  {sql}' for duration, sql in recorder.statements)
+        if recorder.count > len(recorder.statements) and recorder.statements:
+            lines.append(f'  ... {recorder.count - len(recorder.statements)} more')
+        logger.warning('\n'.join(lines))
+
+
+def metrics_view(request):
+    options = get_metrics_options()
+    if not options['ENABLED'] or request.META.get('REMOTE_ADDR') not in options['ALLOWED_IPS']:
+        raise Http404
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
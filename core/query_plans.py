@@ -0,0 +1,49 @@
+"""
+Registry of the queries behind hot endpoints. Apps register them in their
+``query_plans`` module and ``manage.py check_query_plans`` verifies with
+the default planner settings that each one is served by an index.
+"""
+import json
+
+from django.utils.module_loading import autodiscover_modules
+
+
+class HotQuery:
+    def __init__(self, name, build, table, indexes=(), max_filtered=100):
+        self.name = name
+        self.build = build
+        self.table = table
+        self.indexes = tuple(indexes)
+        self.max_filtered = max_filtered
+
+    def __repr__(self):
+        return f'<HotQuery {self.name}>'
+
+
+registry = {}
+
+
+def hot_query(name, table, indexes=(), max_filtered=100):
+    """
+    Register a function returning the queryset of a hot query. The plan must
+    not sequentially scan ``table``, must not discard more than
+    ``max_filtered`` rows in a filter and, when given, must use one of
+    ``indexes``.
+    """
+    def decorator(build):
+        registry[name] = HotQuery(name, build, table, indexes, max_filtered)
+        return build
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('query_plans')
+    return registry
+
+
+def plan_nodes(plan):
+    """Every node of a plan from ``explain(format='json')``, the root first."""
+    nodes = [json.loads(plan)[0]['Plan']]
+    for node in nodes:
+        nodes.extend(node.get('Plans', ()))
+    return nodes
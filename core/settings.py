@@ -25,7 +25,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config('DEBUG', default=True, cast=bool)
 
 ALLOWED_HOSTS = ["*"]
 
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # enteral_apps
     'accounts.apps.AccountsConfig',
     'products.apps.ProductsConfig',
@@ -50,8 +51,36 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'accounts.authentications.CachedJWTAuthentication',
+    ),
+    # proxies in front of the app that append to X-Forwarded-For, see core.throttling.client_ip
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+}
+
+
+# token buckets per user or, for anonymous requests, per IP, see core.throttling
+THROTTLING = {
+    "CACHE_ALIAS": "default",
+    "RATES": {
+        "login": "10/min",
+        "registration": "5/hour",
+        "password_reset": "5/hour",
+        "comments": "20/min",
+    },
+}
+
+
+# users resolved from access tokens are cached, evicted when the user is saved or deleted
+AUTH_USER_CACHE = {
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 60,
+}
+
+
+# logouts revoke tokens in accounts.RevokedToken and the cache, `manage.py purge_revoked_tokens`
+# deletes the expired ones, run it daily
+TOKEN_REVOCATION = {
+    "CACHE_ALIAS": "default",
 }
 
 
@@ -79,6 +108,8 @@ SIMPLE_JWT = {
     "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
 
     "JTI_CLAIM": "jti",
+    # rejects refresh tokens revoked by logout, see accounts.revocation
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.RevocableTokenRefreshSerializer",
 
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=100),
@@ -86,7 +117,89 @@ SIMPLE_JWT = {
 }
 
 
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "eshop",
+        }
+    }
+
+
+CATALOG_CACHE = {
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+
+INVENTORY_RESERVATION = {
+    # seconds a cart item holds its stock after the cart was last touched
+    "TTL": 15 * 60,
+    "BATCH_SIZE": 500,
+}
+
+
+# refreshed by `manage.py refresh_popular_products`, run it every few minutes
+PRODUCT_RANKING = {
+    # seconds after which a visit counts half as much
+    "HALF_LIFE": 7 * 24 * 60 * 60,
+    "LAG": 60,
+}
+
+
+# `manage.py compact_visits` folds raw visits into daily rollups, run it daily
+VISIT_HISTORY = {
+    "RAW_DAYS": 30,
+    "ROLLUP_DAYS": 2 * 365,
+    "BATCH_DAYS": 7,
+}
+
+
+PRODUCT_VIEW_TRACKING = {
+    # use products.view_tracking.DirectViewTracker to write every visit synchronously
+    "ENGINE": "products.view_tracking.BufferedViewTracker",
+    "CACHE_ALIAS": "default",
+    "FLUSH_INTERVAL": 10,
+    "FLUSH_THRESHOLD": 500,
+}
+
+
+# resized WebP/JPEG copies of uploaded images, rendered by `manage.py generate_image_derivatives --loop`
+IMAGE_DERIVATIVES = {
+    "SIZES": {"thumbnail": (160, 160), "card": (480, 480), "full": (1600, 1600)},
+    "FORMATS": ("webp", "jpeg"),
+    "QUALITY": 80,
+    "PROCESSES": None,
+}
+
+
+# serve the read-heavy catalog endpoints with the async views in products/async_views.py,
+# worth it under ASGI only, the gunicorn asgi profile turns it on
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+
+# per-view latency and SQL histograms, scraped from /metrics in the Prometheus format
+REQUEST_METRICS = {
+    "ENABLED": config('REQUEST_METRICS', default=False, cast=bool),
+    # requests slower than this are logged with their SQL, None disables the log
+    "SLOW_REQUEST_MS": 500,
+    "LOG_SQL": True,
+    "ALLOWED_IPS": ('127.0.0.1', '::1'),
+}
+
+
 MIDDLEWARE = [
+    # first, so the latency it records includes the other middleware
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -141,6 +254,18 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# Every login pays for one hash, so the iteration count is the CPU cost of a login.
+# Changing it rehashes each password on its next successful login.
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=600000, cast=int)
+
+PASSWORD_HASHERS = [
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -197,4 +322,14 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
-EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
\ No newline at end of file
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
+
+# emails are queued in accounts.OutboundEmail and sent by `manage.py send_emails --loop`
+EMAIL_OUTBOX = {
+    "BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_BACKOFF": 60,
+    "MAX_BACKOFF": 60 * 60,
+    # seconds a claimed batch is hidden from other workers while it is sent
+    "LEASE": 10 * 60,
+}
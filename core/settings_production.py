@@ -0,0 +1,61 @@
+"""
+Production settings, used by the gunicorn profiles in ``gunicorn.conf.py``.
+Everything not overridden here comes from ``core.settings``.
+"""
+from decouple import Csv
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import (
+    AUTH_USER_CACHE, BASE_DIR, CACHES, DATABASES, REDIS_URL, REST_FRAMEWORK, THROTTLING, TOKEN_REVOCATION, config,
+)
+
+# DEBUG keeps every executed query of a request in memory and renders error pages with settings
+DEBUG = False
+
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='*', cast=Csv())
+CSRF_TRUSTED_ORIGINS = config('CSRF_TRUSTED_ORIGINS', default='', cast=Csv())
+
+# reuse connections across requests instead of reconnecting every time, broken ones are
+# replaced before the request uses them. The ASGI profile sets 0, Django does not support
+# persistent connections in async mode, put pgbouncer in front of the database there.
+DATABASES['default']['CONN_MAX_AGE'] = config('CONN_MAX_AGE', default=600, cast=int)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# revoked tokens, resolved users and throttle buckets live in the cache, with a per-process cache
+# a logout or an eviction would only reach the worker that handled it and every worker would
+# grant the whole throttle quota
+if not REDIS_URL:
+    raise ImproperlyConfigured('REDIS_URL is required in production, every worker has to share the cache')
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+for name, options in (
+    ('TOKEN_REVOCATION', TOKEN_REVOCATION), ('AUTH_USER_CACHE', AUTH_USER_CACHE), ('THROTTLING', THROTTLING),
+):
+    if CACHES[options['CACHE_ALIAS']]['BACKEND'] in PER_PROCESS_CACHES:
+        raise ImproperlyConfigured(f"{name}['CACHE_ALIAS'] has to name a cache shared by every worker")
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # the browsable API renders forms and runs extra queries, clients only need JSON
+    'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer',),
+}
+
+# served by the proxy in front of gunicorn after `manage.py collectstatic`
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = config('SECURE_COOKIES', default=True, cast=bool)
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'root': {'handlers': ['console'], 'level': config('LOG_LEVEL', default='INFO')},
+    'loggers': {
+        # SQL is only logged at DEBUG, keep it off even when LOG_LEVEL is lowered
+        'django.db.backends': {'level': 'INFO'},
+    },
+}
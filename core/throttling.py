@@ -0,0 +1,157 @@
+"""
+Token bucket throttling for DRF views. A rate of ``n/period`` gives every
+client of a scope a bucket of ``n`` requests that refills one request every
+``period / n``. Buckets are kept as the time they are full again (GCRA), a
+single integer per client that the cache updates with atomic ``add`` and
+``incr``, so workers share them in O(1) without locks, as long as the cache
+is shared too; the production settings refuse a per-process one. When the
+cache is unreachable the worker falls back to buckets in its own memory. Views throttle
+with ``RateLimitMixin`` and a ``throttle_scope`` from ``THROTTLING['RATES']``
+and report the quota in ``X-RateLimit-*`` headers.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    # must be shared by all workers (REDIS_URL), each worker would grant the whole quota otherwise
+    'CACHE_ALIAS': 'default',
+    # scope: 'requests/period', period is one of s, min, hour, day
+    'RATES': {},
+}
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def get_throttling_options():
+    return {**DEFAULTS, **getattr(settings, 'THROTTLING', {})}
+
+
+def parse_rate(rate):
+    count, _, period = rate.partition('/')
+    try:
+        return int(count), PERIODS[period]
+    except (ValueError, KeyError):
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}, use "<requests>/<s|min|hour|day>"')
+
+
+def client_ip(request):
+    """
+    The client address, taken from X-Forwarded-For only as far as the
+    ``NUM_PROXIES`` proxies in front of the app appended to it; entries
+    further left are set by the client and can be anything.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR')
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    num_proxies = api_settings.NUM_PROXIES or 0
+    if not num_proxies or not forwarded_for:
+        return remote_addr
+    addresses = forwarded_for.split(',')
+    return addresses[-min(num_proxies, len(addresses))].strip()
+
+
+class CacheBuckets:
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, now, interval, capacity):
+        """Take a token, return the time the bucket is full again, in ms, and whether it was taken."""
+        full_at = now + interval
+        if not self.cache.add(key, full_at, math.ceil(interval / 1000)):
+            try:
+                full_at = self.cache.incr(key, interval)
+            except ValueError:
+                # expired between add and incr
+                full_at = now + interval
+                self.cache.set(key, full_at, math.ceil(interval / 1000))
+            if full_at - interval < now:
+                # full for a while and not expired yet, start from a full bucket
+                full_at = now + interval
+                self.cache.set(key, full_at, math.ceil(interval / 1000))
+        if full_at - now > capacity * interval:
+            self.cache.decr(key, interval)
+            return full_at - interval, False
+        self.cache.touch(key, math.ceil((full_at - now) / 1000))
+        return full_at, True
+
+
+class LocalBuckets:
+    # buckets of one worker, used while the cache is down
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, now, interval, capacity):
+        with self.lock:
+            if len(self.buckets) > 10000:
+                self.buckets = {key: full_at for key, full_at in self.buckets.items() if full_at > now}
+            full_at = max(self.buckets.get(key, now), now) + interval
+            if full_at - now > capacity * interval:
+                return full_at - interval, False
+            self.buckets[key] = full_at
+            return full_at, True
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+local_buckets = LocalBuckets()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttles clients by the ``throttle_scope`` of the view, per user or, for anonymous requests, per IP."""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        options = get_throttling_options()
+        rate = options['RATES'].get(scope)
+        if rate is None:
+            return True
+
+        self.capacity, period = parse_rate(rate)
+        self.interval = period * 1000 // self.capacity
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{client_ip(request)}'
+        key = f'throttle:{scope}:{ident}'
+
+        now = int(time.time() * 1000)
+        try:
+            self.full_at, allowed = CacheBuckets(options['CACHE_ALIAS']).take(key, now, self.interval, self.capacity)
+        except Exception:
+            logger.warning('Throttle cache unavailable, using local buckets', exc_info=True)
+            self.full_at, allowed = local_buckets.take(key, now, self.interval, self.capacity)
+        self.now = now
+        request._rate_limit = self
+        return allowed
+
+    def remaining(self):
+        return max(self.capacity - math.ceil((self.full_at - self.now) / self.interval), 0)
+
+    def wait(self):
+        # until the bucket has room for one more request
+        return max(self.full_at - self.now - (self.capacity - 1) * self.interval, 0) / 1000
+
+
+class RateLimitMixin:
+    throttle_classes = [TokenBucketThrottle]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        throttle = getattr(request, '_rate_limit', None)
+        if throttle is not None:
+            response['X-RateLimit-Limit'] = throttle.capacity
+            response['X-RateLimit-Remaining'] = throttle.remaining()
+        return response
@@ -0,0 +1,43 @@
+"""
+gunicorn configuration, picked up from the working directory by ``gunicorn``.
+
+SERVER_PROFILE=wsgi (default) serves core.wsgi with threaded workers,
+SERVER_PROFILE=asgi serves core.asgi with uvicorn workers. Both run
+core.settings_production unless DJANGO_SETTINGS_MODULE is set.
+"""
+import multiprocessing
+import os
+
+profile = os.environ.get('SERVER_PROFILE', 'wsgi')
+if profile not in ('wsgi', 'asgi'):
+    raise RuntimeError(f'Unknown SERVER_PROFILE {profile!r}, use wsgi or asgi')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+# requests spend most of their time waiting on postgres, two workers per core keep the CPUs busy
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+if profile == 'wsgi':
+    wsgi_app = 'core.wsgi:application'
+    worker_class = 'gthread'
+    # every thread holds its own persistent connection, workers * threads must fit max_connections
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+else:
+    wsgi_app = 'core.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+
+raw_env = [f"DJANGO_SETTINGS_MODULE={os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings_production')}"]
+if profile == 'asgi':
+    raw_env.extend(
+        f'{name}={value}' for name, value in (('CONN_MAX_AGE', 0), ('ASYNC_VIEWS', 1))
+        if name not in os.environ
+    )
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# recycle workers now and then so a slow leak cannot grow without bound
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Category, Brand, Product, Banners, Cart, CartItem, VisitedProduct, ProductComment
+from .models import (
+    Category, Brand, Product, Banners, Cart, CartItem, Order, OrderItem, VisitedProduct, ProductComment
+)
 
 # Register your models here.
 
@@ -21,12 +23,38 @@ class BannersAdmin(admin.ModelAdmin):
 
 
 class CartAdmin(admin.ModelAdmin):
-    list_display = ('user', 'is_paid', 'created_at', 'updated_at')
+    list_display = ('user', 'is_paid', 'total_items', 'total_price', 'created_at', 'updated_at')
+    readonly_fields = ('total_items', 'total_price')
 
 
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'product', 'quantity', 'total_price')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        Cart.objects.filter(pk=obj.cart_id).update_totals()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Cart.objects.filter(pk=obj.cart_id).update_totals()
+
+    def delete_queryset(self, request, queryset):
+        cart_ids = list(queryset.values_list('cart_id', flat=True))
+        super().delete_queryset(request, queryset)
+        Cart.objects.filter(pk__in=cart_ids).update_totals()
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    readonly_fields = ('product', 'title', 'price', 'quantity')
+
+
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_items', 'total_price', 'created_at')
+    readonly_fields = ('user', 'cart', 'total_items', 'total_price')
+    inlines = [OrderItemInline]
+
 
 class VisitedProductAdmin(admin.ModelAdmin):
     list_display = ('user', 'product', 'visited_date')
@@ -39,6 +67,7 @@ class ProductCommentAdmin(admin.ModelAdmin):
 admin.site.register(Banners, BannersAdmin)
 admin.site.register(Cart, CartAdmin)
 admin.site.register(CartItem, CartItemAdmin)
+admin.site.register(Order, OrderAdmin)
 admin.site.register(ProductComment, ProductCommentAdmin)
 admin.site.register(VisitedProduct, VisitedProductAdmin)
 admin.site.register(Product, ProductAdmin)
@@ -0,0 +1,27 @@
+from django.urls import path
+from . import async_views
+from .async_views import with_sync_fallback
+from .urls import urlpatterns as sync_urlpatterns
+from .views import ProductViewSet, ProductCommentViewSet
+
+
+# matched before the DRF routes, other methods on these paths still reach the viewsets
+urlpatterns = [
+    path('products/', with_sync_fallback(
+        async_views.product_list, ProductViewSet.as_view({'get': 'list', 'post': 'create'})
+    ), name='products-list'),
+    path('products/popular_products/', with_sync_fallback(
+        async_views.popular_products, ProductViewSet.as_view({'get': 'popular_products'})
+    ), name='products-popular-products'),
+    path('products/<int:pk>/', with_sync_fallback(
+        async_views.product_detail, ProductViewSet.as_view({
+            'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+        })
+    ), name='products-detail'),
+    path('products/<int:product_pk>/comments/', with_sync_fallback(
+        async_views.comment_list, ProductCommentViewSet.as_view({'get': 'list', 'post': 'create'})
+    ), name='product-comment-list'),
+    path('products/<int:product_pk>/comments/thread/', with_sync_fallback(
+        async_views.comment_thread, ProductCommentViewSet.as_view({'get': 'thread'})
+    ), name='product-comment-thread'),
+] + sync_urlpatterns
@@ -0,0 +1,167 @@
+"""
+Async variants of the read-heavy catalog endpoints, served by
+``products.async_urls`` when ``ASYNC_VIEWS`` is on (the ASGI profile). They
+use the async ORM and cache API, so one worker keeps serving other requests
+while a request waits on the database, and they return the same JSON, cache
+entries and validators as the DRF views. Other methods on the same URLs go
+to the DRF viewsets.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from accounts.authentications import CachedJWTAuthentication
+
+from .cache import amake_key, aget_or_build, entry_etag, make_entry, set_validators
+from .models import Product, ProductComment
+from .pagination import ProductPagination, CommentPagination
+from .serializers import (
+    ProductSerializer,
+    ProductValuesSerializer,
+    ProductCommentSerializer,
+    ProductCommentThreadSerializer,
+    PopularProductsSerializer,
+)
+from .views import ProductViewSet, ProductCommentViewSet, popular_queryset, thread_replies, link_thread
+
+renderer = JSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def api_view(view):
+    """Wrap the request for DRF and turn API exceptions into error responses, like APIView."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = Request(request)
+        try:
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as error:
+            data = error.detail if isinstance(error.detail, (list, dict)) else {'detail': error.detail}
+            response = json_response(data, error.status_code)
+            if isinstance(error, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(request)
+            return response
+    return wrapper
+
+
+def with_sync_fallback(async_view, sync_view):
+    """Serve GET and HEAD with ``async_view`` and every other method with the DRF view."""
+    sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_view(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    # csrf_exempt() wraps async views in a sync function on Django 4.2
+    view.csrf_exempt = True
+    return view
+
+
+async def authenticate(request):
+    user_auth = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    if user_auth is None:
+        raise exceptions.NotAuthenticated()
+    request.user, request.auth = user_auth
+
+
+async def cached_json(request, namespace, build):
+    """
+    The async ``CatalogCacheMixin.cached_response``. ``build`` returns the data,
+    or None for a missing object, which is not cached and returns None.
+    """
+    async def build_entry():
+        data = await build()
+        return None if data is None else make_entry(data)
+
+    key = await amake_key(namespace, request)
+    entry = await aget_or_build(key, build_entry)
+    if entry is None:
+        return None
+
+    etag = entry_etag(key, entry, renderer.format)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = json_response(entry['data'])
+    set_validators(response, etag)
+    return response
+
+
+def serializer_context(request):
+    return {'request': request, 'format': None}
+
+
+@api_view
+async def product_list(request):
+    async def build():
+        paginator = ProductPagination()
+        products = await paginator.apaginate_queryset(
+            ProductValuesSerializer.rows(ProductViewSet.queryset.all()), request
+        )
+        data = ProductValuesSerializer(products, many=True, context=serializer_context(request)).data
+        return paginator.get_paginated_response(data).data
+
+    return await cached_json(request, 'products', build)
+
+
+@api_view
+async def product_detail(request, pk):
+    async def build():
+        try:
+            product = await ProductViewSet.queryset.aget(pk=pk)
+        except Product.DoesNotExist:
+            return None
+        return ProductSerializer(product, context=serializer_context(request)).data
+
+    response = await cached_json(request, f'product:{pk}', build)
+    if response is None:
+        raise exceptions.NotFound(f'No {Product._meta.object_name} matches the given query.')
+    return response
+
+
+@api_view
+async def popular_products(request):
+    async def build():
+        params = PopularProductsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        products = [
+            product async for product in popular_queryset(
+                ProductValuesSerializer.rows(ProductViewSet.queryset.all()), params.validated_data
+            )
+        ]
+        return ProductValuesSerializer(products, many=True, context=serializer_context(request)).data
+
+    return await cached_json(request, 'popular', build)
+
+
+@api_view
+async def comment_list(request, product_pk):
+    await authenticate(request)
+    paginator = CommentPagination()
+    comments = await paginator.apaginate_queryset(ProductComment.objects.filter(product__id=product_pk), request)
+    data = ProductCommentSerializer(comments, many=True, context=serializer_context(request)).data
+    return json_response(paginator.get_paginated_response(data).data)
+
+
+@api_view
+async def comment_thread(request, product_pk):
+    await authenticate(request)
+    depth = ProductCommentViewSet.get_thread_depth(request)
+    comments = ProductComment.objects.filter(product__id=product_pk)
+    paginator = CommentPagination()
+    roots = await paginator.apaginate_queryset(comments.filter(parent__isnull=True), request)
+    replies = []
+    if depth and roots:
+        replies = [comment async for comment in thread_replies(comments, roots, depth)]
+    link_thread(roots, replies)
+
+    data = ProductCommentThreadSerializer(roots, many=True, context=serializer_context(request)).data
+    return json_response(paginator.get_paginated_response(data).data)
@@ -0,0 +1,169 @@
+import csv
+import io
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core.benchmarks import endpoint
+from .catalog_io import EXPORT_FIELDS
+from .inventory import add_to_cart
+from .models import Product, Cart, CartItem, ProductComment
+from .pagination import ProductPagination
+from .views import ProductViewSet
+
+
+@endpoint('categories-list')
+def categories_list(data):
+    return 'get', reverse('categories-list'), None
+
+
+@endpoint('categories-detail')
+def categories_detail(data):
+    return 'get', reverse('categories-detail', args=[data.random.choice(data.categories)]), None
+
+
+@endpoint('categories-active-categories')
+def active_categories(data):
+    return 'get', reverse('categories-active-categories'), None
+
+
+@endpoint('products-list')
+def products_list(data):
+    # a cursor into the second half of the list, the keyset paginator ignores ?page=
+    paginator = ProductPagination()
+    paginator.page_queryset(ProductViewSet.queryset, Request(APIRequestFactory().get(reverse('products-list'))))
+    rows = ProductViewSet.queryset.order_by(*paginator.ordering)
+    count = rows.count()
+    url = paginator.encode_cursor(rows[data.random.randint(count // 2, count - 1)], reverse=False)
+    return 'get', reverse('products-list'), {'cursor': parse_qs(urlsplit(url).query)['cursor'][0]}
+
+
+@endpoint('products-detail')
+def products_detail(data):
+    return 'get', reverse('products-detail', args=[data.random.choice(data.products)]), None
+
+
+@endpoint('products-view-product')
+def view_product(data):
+    return 'get', reverse('products-view-product', args=[data.random.choice(data.products)]), None
+
+
+@endpoint('products-search')
+def search(data):
+    return 'get', reverse('products-search'), {'q': data.random.choice(data.words)}
+
+
+@endpoint('products-popular-products')
+def popular_products(data):
+    return 'get', reverse('products-popular-products'), {'category': data.random.choice(data.categories)}
+
+
+@endpoint('products-visit-stats', user='admin')
+def visit_stats(data):
+    return 'get', reverse('products-visit-stats', args=[data.random.choice(data.products)]), {'days': 60}
+
+
+@endpoint('products-export-products', user='admin')
+def export_products(data):
+    return 'get', reverse('products-export-products'), {'file_format': 'csv'}
+
+
+@endpoint('products-import-products', user='admin')
+def import_products(data):
+    products = Product.objects.filter(
+        pk__in=data.random.sample(data.products, 50)
+    ).select_related('category', 'brand')
+    content = io.StringIO()
+    writer = csv.DictWriter(content, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for product in products:
+        writer.writerow({
+            'slug': product.slug,
+            'title': product.title,
+            'description': product.description,
+            'price': product.price + 1000,
+            'category': product.category.slug,
+            'brand': product.brand.slug,
+            'status': product.status,
+            'inventory': product.inventory,
+        })
+    upload = SimpleUploadedFile('products.csv', content.getvalue().encode(), content_type='text/csv')
+    return 'post', reverse('products-import-products'), {'file': upload}
+
+
+@endpoint('carts-list', user='user')
+def carts_list(data):
+    return 'get', reverse('carts-list'), None
+
+
+@endpoint('carts-detail', user='user')
+def carts_detail(data):
+    return 'get', reverse('carts-detail', args=[data.cart]), None
+
+
+@endpoint('carts-add-item', user='user')
+def add_item(data):
+    return 'post', reverse('carts-add-item', args=[data.cart]), {
+        'product_id': data.random.choice(data.products), 'quantity': 1
+    }
+
+
+@endpoint('carts-update-item-quantity', user='user')
+def update_item_quantity(data):
+    # an item of a product in stock, seeded items may not have room for one more unit
+    item = (
+        CartItem.objects.filter(cart_id=data.cart, product_id__in=data.products).order_by('?').first()
+        or add_to_cart(Cart.objects.get(pk=data.cart), data.random.choice(data.products), 1)
+    )
+    return 'post', reverse('carts-update-item-quantity', args=[data.cart]), {
+        'cart_item_id': item.pk, 'quantity': data.random.randint(1, 2)
+    }
+
+
+@endpoint('carts-remove-item', user='user')
+def remove_item(data):
+    item = add_to_cart(Cart.objects.get(pk=data.cart), data.random.choice(data.products), 1)
+    return 'post', reverse('carts-remove-item', args=[data.cart]), {'cart_item_id': item.pk}
+
+
+@endpoint('product-comment-list', user='user')
+def comment_list(data):
+    return 'get', reverse('product-comment-list', args=[data.random.choice(data.commented)]), None
+
+
+@endpoint('product-comment-create', user='user', status=201)
+def comment_create(data):
+    return 'post', reverse('product-comment-list', args=[data.random.choice(data.products)]), {
+        'text': 'benchmark comment'
+    }
+
+
+@endpoint('product-comment-thread', user='user')
+def comment_thread(data):
+    return 'get', reverse('product-comment-thread', args=[data.random.choice(data.commented)]), None
+
+
+@endpoint('product-comment-detail', user='user')
+def comment_detail(data):
+    comment = ProductComment.objects.filter(product_id=data.random.choice(data.commented)).first()
+    return 'get', reverse('product-comment-detail', args=[comment.product_id, comment.pk]), None
+
+
+@endpoint('product-comment-reply', user='user', status=201)
+def comment_reply(data):
+    comment = ProductComment.objects.filter(product_id=data.random.choice(data.commented)).first()
+    return 'post', reverse('product-comment-reply', args=[comment.product_id, comment.pk]), {
+        'text': 'benchmark reply'
+    }
+
+
+@endpoint('catalog-cache-stats', user='admin')
+def catalog_cache_stats(data):
+    return 'get', reverse('catalog-cache-stats'), None
+
+
+@endpoint('product-detail-view')
+def product_detail_view(data):
+    return 'get', reverse('product-detail-view', args=[data.random.choice(data.products)]), None
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    # how long a rebuild may hold the lock before another request takes over
+    'LOCK_TIMEOUT': 10,
+    # how long concurrent requests wait for the rebuild before building themselves
+    'LOCK_WAIT': 5,
+}
+
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+
+def get_cache_options():
+    return {**DEFAULTS, **getattr(settings, 'CATALOG_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_cache_options()['CACHE_ALIAS']]
+
+
+def _incr(key, delta=1):
+    cache = get_cache()
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+async def _aincr(key, delta=1):
+    cache = get_cache()
+    try:
+        return await cache.aincr(key, delta)
+    except ValueError:
+        if await cache.aadd(key, delta, timeout=None):
+            return delta
+        return await cache.aincr(key, delta)
+
+
+def get_version(namespace):
+    key = f'catalog:version:{namespace}'
+    version = get_cache().get(key)
+    if version is None:
+        get_cache().add(key, 1, timeout=None)
+        version = get_cache().get(key, 1)
+    return version
+
+
+async def aget_version(namespace):
+    key = f'catalog:version:{namespace}'
+    version = await get_cache().aget(key)
+    if version is None:
+        await get_cache().aadd(key, 1, timeout=None)
+        version = await get_cache().aget(key, 1)
+    return version
+
+
+def bump_version(*namespaces):
+    for namespace in namespaces:
+        _incr(f'catalog:version:{namespace}')
+
+
+def invalidate(*namespaces):
+    """Bump the given namespaces once the current transaction commits."""
+    transaction.on_commit(lambda: bump_version(*namespaces))
+
+
+def request_digest(request):
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        for value in values
+    )
+    raw = f'{request.get_host()}|{request.path}|{params}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def make_key(namespace, request):
+    return f'catalog:entry:{namespace}:{get_version(namespace)}:{request_digest(request)}'
+
+
+async def amake_key(namespace, request):
+    return f'catalog:entry:{namespace}:{await aget_version(namespace)}:{request_digest(request)}'
+
+
+def get_or_build(key, build):
+    """
+    Return the cached value for ``key`` or build and store it. Only one caller
+    rebuilds a cold key, the others wait for its result.
+    """
+    cache = get_cache()
+    options = get_cache_options()
+
+    value = cache.get(key)
+    if value is not None:
+        _incr(HITS_KEY)
+        return value
+
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, timeout=options['LOCK_TIMEOUT'])
+    if not locked:
+        deadline = time.monotonic() + options['LOCK_WAIT']
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(key)
+            if value is not None:
+                _incr(HITS_KEY)
+                return value
+            if cache.get(lock_key) is None:
+                break
+
+    _incr(MISSES_KEY)
+    try:
+        value = build()
+        if value is not None:
+            cache.set(key, value, timeout=options['TIMEOUT'])
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+async def aget_or_build(key, build):
+    """``get_or_build`` for async views, ``build`` is a coroutine function."""
+    cache = get_cache()
+    options = get_cache_options()
+
+    value = await cache.aget(key)
+    if value is not None:
+        await _aincr(HITS_KEY)
+        return value
+
+    lock_key = f'{key}:lock'
+    locked = await cache.aadd(lock_key, 1, timeout=options['LOCK_TIMEOUT'])
+    if not locked:
+        deadline = time.monotonic() + options['LOCK_WAIT']
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            value = await cache.aget(key)
+            if value is not None:
+                await _aincr(HITS_KEY)
+                return value
+            if await cache.aget(lock_key) is None:
+                break
+
+    await _aincr(MISSES_KEY)
+    try:
+        value = await build()
+        if value is not None:
+            await cache.aset(key, value, timeout=options['TIMEOUT'])
+    finally:
+        if locked:
+            await cache.adelete(lock_key)
+    return value
+
+
+def get_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def make_entry(data):
+    """
+    A cache entry for ``data``. Its ETag depends only on the data, so every
+    worker and every rebuild of the same data agree on it.
+    """
+    serialized = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return {'digest': hashlib.md5(serialized.encode()).hexdigest(), 'data': data}
+
+
+def entry_etag(key, entry, renderer_format):
+    """
+    ETag of a cached entry as rendered in ``renderer_format``, the key carries
+    the namespace version. There is no Last-Modified: stock and view counts
+    change through ``QuerySet.update()`` without touching ``updated_at``.
+    """
+    tag = hashlib.md5(f"{key}|{entry['digest']}|{renderer_format}".encode())
+    return f'"{tag.hexdigest()}"'
+
+
+def set_validators(response, etag):
+    response['ETag'] = etag
+    # the catalog changes any time, clients have to revalidate before reusing a copy
+    patch_cache_control(response, no_cache=True)
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class CatalogCacheMixin:
+    """
+    Serves successful GET responses of a viewset from the catalog cache. Every
+    cached entry carries a digest of its data, its ETag comes from that, so
+    clients holding the current entry get a 304 without the serializer or the
+    renderer running.
+    """
+
+    def cached_response(self, namespace, handler, request, *args, **kwargs):
+        def build():
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                raise _Uncacheable(response)
+            return make_entry(response.data)
+
+        key = make_key(namespace, request)
+        try:
+            entry = get_or_build(key, build)
+        except _Uncacheable as error:
+            return error.response
+
+        etag = entry_etag(key, entry, request.accepted_renderer.format)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(entry['data'])
+        set_validators(response, etag)
+        return response
@@ -0,0 +1,177 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Category, Brand, Product, Cart
+from .serializers import ProductSerializer
+from .search import refresh_search_index
+from .slugs import make_slug
+from . import cache
+
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = [
+    'slug', 'title', 'description', 'price',
+    'category', 'brand', 'status', 'inventory',
+]
+UPDATE_FIELDS = [
+    'title', 'description', 'price', 'category',
+    'brand', 'status', 'inventory', 'updated_at',
+]
+MAX_REPORTED_ERRORS = 100
+SLUG_LENGTH = Product._meta.get_field('slug').max_length
+
+
+class ProductImportSerializer(ProductSerializer):
+    slug = serializers.SlugField(required=False, allow_blank=True, max_length=SLUG_LENGTH, allow_unicode=True)
+    category = serializers.SlugField()
+    brand = serializers.SlugField()
+
+    class Meta(ProductSerializer.Meta):
+        fields = [
+            'title', 'slug', 'description', 'price',
+            'category', 'brand', 'status', 'inventory',
+        ]
+
+    def validate_category(self, value):
+        try:
+            return self.context['categories'][value]
+        except KeyError:
+            raise serializers.ValidationError('دسته بندی یافت نشد')
+
+    def validate_brand(self, value):
+        try:
+            return self.context['brands'][value]
+        except KeyError:
+            raise serializers.ValidationError('برند یافت نشد')
+
+    def validate(self, attrs):
+        attrs['slug'] = attrs.get('slug') or make_slug(attrs['title'], SLUG_LENGTH)
+        if not attrs['slug']:
+            raise serializers.ValidationError({'slug': 'امکان ساخت اسلاگ از عنوان وجود ندارد'})
+        return attrs
+
+
+def detect_format(name, default='csv'):
+    if name and name.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name and name.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, file_format):
+    """Yield ``(line_number, row)`` pairs from a text stream."""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # empty cells fall back to the model defaults
+            yield reader.line_num, {
+                key: value for key, value in row.items() if value not in ('', None)
+            }
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f'Unsupported format: {file_format}')
+
+
+def import_products(stream, file_format='csv', chunk_size=1000):
+    """
+    Validate and upsert products by slug, one chunk at a time, so memory
+    only ever holds ``chunk_size`` rows and the slugs seen so far. A row
+    whose slug, given or derived from the title, repeats an earlier row is
+    reported instead of overwriting it. Returns a summary of the import.
+    """
+    serializer = ProductImportSerializer(context={
+        'categories': {category.slug: category for category in Category.objects.all()},
+        'brands': {brand.slug: brand for brand in Brand.objects.all()},
+    })
+    result = {'created': 0, 'updated': 0, 'invalid': 0, 'errors': []}
+    rows = read_rows(stream, file_format)
+    # slug -> line of the row that wrote it
+    seen = {}
+
+    while chunk := list(islice(rows, chunk_size)):
+        valid = []
+        for line_number, row in chunk:
+            try:
+                if row is None:
+                    raise serializers.ValidationError('سطر نامعتبر است')
+                data = serializer.run_validation(row)
+                if data['slug'] in seen:
+                    raise serializers.ValidationError(
+                        {'slug': [f"اسلاگ تکراری است، سطر {seen[data['slug']]}"]}
+                    )
+            except serializers.ValidationError as error:
+                result['invalid'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append({'line': line_number, 'errors': error.detail})
+                continue
+            seen[data['slug']] = line_number
+            valid.append(data)
+
+        if valid:
+            created, updated = write_chunk(valid)
+            result['created'] += created
+            result['updated'] += updated
+
+    return result
+
+
+def write_chunk(rows):
+    slugs = [row['slug'] for row in rows]
+    with transaction.atomic():
+        existing = dict(Product.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+        Product.objects.bulk_create(
+            [Product(**row) for row in rows],
+            update_conflicts=True,
+            unique_fields=['slug'],
+            update_fields=UPDATE_FIELDS,
+        )
+        refresh_search_index(Product.objects.filter(slug__in=slugs))
+        if existing:
+            Cart.objects.filter(
+                is_paid=False, items__product__slug__in=existing
+            ).update_totals()
+        # new products have no cached detail yet
+        cache.invalidate('products', 'popular', *(f'product:{pk}' for pk in existing.values()))
+    return len(rows) - len(existing), len(existing)
+
+
+def export_rows():
+    queryset = Product.objects.order_by('pk').values_list(
+        'slug', 'title', 'description', 'price',
+        'category__slug', 'brand__slug', 'status', 'inventory',
+    )
+    for values in queryset.iterator(chunk_size=2000):
+        yield dict(zip(EXPORT_FIELDS, values))
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_products(file_format='csv'):
+    """Yield the catalog as CSV or JSON Lines text, row by row."""
+    if file_format == 'csv':
+        writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDS)
+        yield writer.writeheader()
+        for row in export_rows():
+            yield writer.writerow(row)
+    elif file_format == 'jsonl':
+        for row in export_rows():
+            row['price'] = str(row['price'])
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f'Unsupported format: {file_format}')
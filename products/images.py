@@ -0,0 +1,138 @@
+"""
+Image derivatives. Uploads are stored as they come; the
+``generate_image_derivatives`` worker polls the rows flagged
+``derivatives_stale`` when their image changed, renders resized WebP and JPEG
+copies in a process pool and stores them under content-hashed names, so
+their URLs never change meaning and can be cached as immutable. The names
+are kept in a JSON column next to the image field:
+``{'source': <image name>, 'files': {size: {format: <name>}}}``, or
+``{'source': ..., 'error': ...}`` when the upload cannot be decoded.
+"""
+import hashlib
+import os
+from concurrent.futures import BrokenExecutor, Future
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from . import cache
+from .imaging import EXTENSIONS, render
+from .models import Product, Brand, Banners
+
+
+DEFAULTS = {
+    # images are scaled down to fit (width, height), never up
+    'SIZES': {'thumbnail': (160, 160), 'card': (480, 480), 'full': (1600, 1600)},
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    # images read and rendered per model in one round
+    'BATCH_SIZE': 20,
+    # worker processes, None uses one per core
+    'PROCESSES': None,
+    'LOCATION': 'derivatives',
+}
+
+
+def get_image_options():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_DERIVATIVES', {})}
+
+
+def invalidate_products(pks):
+    cache.invalidate('products', 'popular', *(f'product:{pk}' for pk in pks))
+
+
+# (model, image field, derivatives field, called with the updated pks)
+SOURCES = [
+    (Product, 'image', 'image_derivatives', invalidate_products),
+    (Brand, 'logo', 'logo_derivatives', None),
+    (Banners, 'image', 'image_derivatives', None),
+]
+
+
+def pending(model):
+    # a scan of the partial index on the flag, however many rows are up to date
+    return model.objects.filter(derivatives_stale=True)
+
+
+def derivatives_storage(model, derivatives):
+    """The storage of the image field whose copies ``derivatives`` holds, they are stored next to it."""
+    for source_model, field, source_derivatives, _ in SOURCES:
+        if issubclass(model, source_model) and derivatives == source_derivatives:
+            return model._meta.get_field(field).storage
+    raise LookupError(f'{model.__name__}.{derivatives} is not a derivatives field')
+
+
+def derivative_name(source, size, format, data, options):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    return os.path.join(options['LOCATION'], directory, f'{stem}-{size}.{digest}.{EXTENSIONS[format]}')
+
+
+def store(storage, source, rendered, options):
+    files = {}
+    for size, formats in rendered.items():
+        files[size] = {}
+        for format, data in formats.items():
+            name = derivative_name(source, size, format, data, options)
+            # same name means same content, a rerun or a second worker has nothing to write
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(data))
+            files[size][format] = name
+    return files
+
+
+def generate_pending(executor, batch_size=None):
+    """
+    Render one batch of pending images of every source in ``executor`` and
+    return ``(generated, failed)``. Rows are not locked while their images
+    render, a row whose image changed meanwhile is left for the next round.
+    """
+    options = get_image_options()
+    generated = failed = 0
+    for model, field, derivatives, on_update in SOURCES:
+        rows = list(
+            pending(model).order_by('pk')
+            .values_list('pk', field)[:batch_size or options['BATCH_SIZE']]
+        )
+        storage = model._meta.get_field(field).storage
+        jobs = []
+        for pk, source in rows:
+            try:
+                with storage.open(source, 'rb') as image:
+                    data = image.read()
+            except OSError as error:
+                future = Future()
+                future.set_exception(error)
+            else:
+                future = executor.submit(render, data, options['SIZES'], options['FORMATS'], options['QUALITY'])
+            jobs.append((pk, source, future))
+
+        updated = []
+        for pk, source, future in jobs:
+            try:
+                value = {'source': source, 'files': store(storage, source, future.result(), options)}
+                generated += 1
+            except BrokenExecutor:
+                raise
+            except Exception as error:
+                value = {'source': source, 'error': f'{type(error).__name__}: {error}'}
+                failed += 1
+            # a row whose image changed meanwhile stays flagged
+            if model.objects.filter(pk=pk, **{field: source}).update(**{derivatives: value, 'derivatives_stale': False}):
+                updated.append(pk)
+        if updated and on_update:
+            on_update(updated)
+    return generated, failed
+
+
+def derivative_urls(storage, value, request=None):
+    """``{size: {format: url}}`` for a derivatives column, empty until they are generated."""
+    files = (value or {}).get('files') or {}
+    urls = {}
+    for size, formats in files.items():
+        urls[size] = {}
+        for format, name in formats.items():
+            url = storage.url(name)
+            urls[size][format] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,48 @@
+"""
+Pillow rendering for ``products.images``. Runs in the worker's process pool,
+so it only deals in bytes and stays free of Django imports: pool processes
+can import it whatever the multiprocessing start method.
+"""
+import io
+
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def encode(image, format, quality):
+    buffer = io.BytesIO()
+    if format == 'jpeg':
+        if has_alpha(image):
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def render(data, sizes, formats, quality):
+    """
+    Return ``{size: {format: bytes}}`` for the image in ``data``. Images are
+    scaled down to fit each ``(width, height)`` box and never scaled up.
+    """
+    boxes = sorted(sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True)
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEGs decode straight at a fraction of their size when that still covers the largest box
+        image.draft('RGB', boxes[0][1])
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+
+    rendered = {}
+    # every size is scaled from the previous one, which is smaller than the original
+    for size, box in boxes:
+        image = image.copy()
+        image.thumbnail(box, Image.Resampling.LANCZOS)
+        rendered[size] = {format: encode(image, format, quality) for format in formats}
+    return rendered
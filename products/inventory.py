@@ -0,0 +1,211 @@
+"""
+Inventory reservations. Adding a product to a cart takes the units out of
+``Product.inventory`` with a conditional ``UPDATE`` and records them on the
+cart item until ``reserved_until``; ``release_expired`` returns the units of
+abandoned carts and ``checkout`` turns the reserved units of a cart into an
+order.
+
+Row locks are always taken in the order cart, cart items, product, and
+several products in primary key order, so the views, checkouts and the
+reaper cannot deadlock each other.
+
+Stock is changed with ``QuerySet.update()``, which sends no ``post_save``,
+so every change invalidates the cached details of its products itself.
+Cached lists and popular products are left to expire with the catalog cache
+timeout, cart traffic would otherwise keep them cold; checkouts check the
+stock themselves.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+from django.utils import timezone
+
+from .models import Product, Cart, CartItem, Order, OrderItem
+from . import cache
+
+
+DEFAULTS = {
+    'TTL': 15 * 60,
+    'BATCH_SIZE': 500,
+}
+
+
+class InsufficientInventory(Exception):
+    pass
+
+
+class EmptyCart(Exception):
+    pass
+
+
+def get_reservation_options():
+    return {**DEFAULTS, **getattr(settings, 'INVENTORY_RESERVATION', {})}
+
+
+def lock_cart(cart):
+    """
+    Serialize changes to one cart and extend the reservations of its items,
+    so a cart stays reserved while its owner keeps using it.
+    """
+    Cart.objects.select_for_update().filter(pk=cart.pk).exists()
+    cart.items.filter(reserved_quantity__gt=0).update(reserved_until=expiry())
+
+
+def stock_changed(product_ids):
+    cache.invalidate(*(f'product:{pk}' for pk in product_ids))
+
+
+def expiry():
+    return timezone.now() + timedelta(seconds=get_reservation_options()['TTL'])
+
+
+def reserve(item, quantity):
+    """
+    Set ``item`` to ``quantity`` units, taking or returning the difference
+    to the reserved stock. Raises ``InsufficientInventory`` or
+    ``Product.DoesNotExist`` when the extra units cannot be taken.
+    """
+    delta = quantity - item.reserved_quantity
+    item.quantity = item.reserved_quantity = quantity
+    item.reserved_until = expiry()
+    item.save()
+    Cart.objects.filter(pk=item.cart_id).update_totals()
+    # the product row is the contended one, lock it last to hold it until commit only
+    if delta > 0:
+        taken = Product.objects.filter(
+            pk=item.product_id, status='available', inventory__gte=delta
+        ).update(inventory=F('inventory') - delta)
+        if not taken:
+            if not Product.objects.filter(pk=item.product_id, status='available').exists():
+                raise Product.DoesNotExist
+            raise InsufficientInventory
+    elif delta < 0:
+        Product.objects.filter(pk=item.product_id).update(inventory=F('inventory') - delta)
+    if delta:
+        stock_changed([item.product_id])
+    return item
+
+
+def add_to_cart(cart, product_id, quantity):
+    with transaction.atomic():
+        lock_cart(cart)
+        item = (
+            CartItem.objects.select_for_update()
+            .filter(cart=cart, product_id=product_id)
+            .first()
+        ) or CartItem(cart=cart, product_id=product_id, quantity=0)
+        return reserve(item, item.quantity + quantity)
+
+
+def set_quantity(cart, item_id, quantity):
+    with transaction.atomic():
+        lock_cart(cart)
+        item = CartItem.objects.select_for_update().get(cart=cart, id=item_id)
+        return reserve(item, quantity)
+
+
+def release(product_quantities):
+    """Return ``{product_id: quantity}`` units to the products in one update."""
+    if product_quantities:
+        # the UPDATE alone would lock the rows in whatever order the plan scans them, the
+        # subquery locks them in primary key order first; the slice keeps its ORDER BY
+        locked = (
+            Product.objects.select_for_update().filter(pk__in=product_quantities)
+            .order_by('pk').values('pk')[:len(product_quantities)]
+        )
+        Product.objects.filter(pk__in=locked).update(
+            inventory=F('inventory') + Case(*[
+                When(pk=product_id, then=quantity)
+                for product_id, quantity in product_quantities.items()
+            ], output_field=IntegerField())
+        )
+        stock_changed(product_quantities)
+
+
+def release_expired(batch_size=None):
+    """
+    Return the stock of expired reservations in unpaid carts, one batch per
+    transaction. Items locked by a running request are left for the next run.
+    """
+    batch_size = batch_size or get_reservation_options()['BATCH_SIZE']
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = list(
+                CartItem.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(
+                    reserved_quantity__gt=0,
+                    reserved_until__lt=timezone.now(),
+                    cart__is_paid=False,
+                )
+                .values_list('pk', 'product_id', 'reserved_quantity')[:batch_size]
+            )
+            quantities = Counter()
+            for _, product_id, quantity in expired:
+                quantities[product_id] += quantity
+            CartItem.objects.filter(pk__in=[pk for pk, _, _ in expired]).update(
+                reserved_quantity=0, reserved_until=None
+            )
+            release(quantities)
+        released += len(expired)
+        if len(expired) < batch_size:
+            return released
+
+
+def checkout(cart):
+    """
+    Turn ``cart`` into an ``Order`` with the current prices and mark it paid.
+    Reserved units are already out of the inventory and become sold, units
+    whose reservation expired are taken again. Raises ``Cart.DoesNotExist``
+    when the cart was paid meanwhile, ``EmptyCart``,
+    ``InsufficientInventory`` or ``Product.DoesNotExist``.
+    """
+    with transaction.atomic():
+        if not Cart.objects.select_for_update().filter(pk=cart.pk, is_paid=False).exists():
+            raise Cart.DoesNotExist
+        items = list(CartItem.objects.select_for_update().filter(cart=cart).order_by('pk'))
+        if not items:
+            raise EmptyCart
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update()
+            .filter(pk__in={item.product_id for item in items})
+            .order_by('pk')
+            .only('title', 'price', 'status', 'inventory')
+        }
+
+        missing = Counter()
+        for item in items:
+            missing[item.product_id] += item.quantity - item.reserved_quantity
+        for product_id, quantity in missing.items():
+            product = products.get(product_id)
+            if product is None:
+                raise Product.DoesNotExist
+            if quantity > 0 and (product.status != 'available' or product.inventory < quantity):
+                raise InsufficientInventory
+        # a negative release takes the units, the rows are locked and were checked above
+        release({product_id: -quantity for product_id, quantity in missing.items() if quantity})
+
+        order = Order.objects.create(
+            user_id=cart.user_id,
+            cart=cart,
+            total_price=sum(products[item.product_id].price * item.quantity for item in items),
+            total_items=sum(item.quantity for item in items),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=item.product_id,
+                title=products[item.product_id].title,
+                price=products[item.product_id].price,
+                quantity=item.quantity,
+            )
+            for item in items
+        ])
+        # the units are sold now, deleting the items or the reaper must not return them
+        CartItem.objects.filter(cart=cart).update(reserved_quantity=0, reserved_until=None)
+        Cart.objects.filter(pk=cart.pk).update(is_paid=True)
+        return order
@@ -0,0 +1,154 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, DatabaseError
+from django.db.models import Sum
+from products.inventory import InsufficientInventory, checkout
+from products.models import Category, Brand, Product, Cart, CartItem, Order, OrderItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Check out many carts over overlapping products from concurrent threads and check the stock adds up'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--checkouts', type=int, default=800, help='Carts checked out in total')
+        parser.add_argument('--products', type=int, default=8, help='Products shared by all carts')
+        parser.add_argument('--items', type=int, default=3, help='Distinct products per cart')
+        parser.add_argument('--inventory', type=int, default=250, help='Initial stock of every product')
+        parser.add_argument(
+            '--reserved', action='store_true',
+            help='Check out carts that still hold their reservations instead of expired ones'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_checkout requires PostgreSQL')
+        if options['items'] > options['products']:
+            raise CommandError('--items cannot exceed --products')
+
+        # threads use their own connections, so the fixtures are committed and removed afterwards
+        prefix = uuid.uuid4().hex[:8]
+        category = Category.objects.create(title=f'benchmark {prefix}')
+        brand = Brand.objects.create(name=f'benchmark {prefix}')
+        products = Product.objects.bulk_create([
+            Product(
+                title=f'benchmark {prefix} {i}', slug=f'{prefix}-checkout-{i}', description='benchmark',
+                price=1000 + i, category=category, brand=brand, inventory=options['inventory'],
+            )
+            for i in range(options['products'])
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}-buyer-{i}', email=f'{prefix}-buyer-{i}@example.com', is_active=True)
+            for i in range(options['threads'])
+        ])
+
+        try:
+            carts = self.fill_carts(users, products, options)
+            started = time.perf_counter()
+            timings, outcomes = self.run(carts, options['threads'])
+            elapsed = time.perf_counter() - started
+            stock = dict(Product.objects.filter(pk__in=[p.pk for p in products]).values_list('pk', 'inventory'))
+            sold = dict(
+                OrderItem.objects.filter(product__in=products).values('product')
+                .annotate(total=Sum('quantity')).values_list('product', 'total')
+            )
+            reserved = dict(
+                CartItem.objects.filter(product__in=products, cart__is_paid=False).values('product')
+                .annotate(total=Sum('reserved_quantity')).values_list('product', 'total')
+            )
+        finally:
+            Order.objects.filter(user__in=users).delete()
+            Cart.objects.filter(user__in=users).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+            Product.objects.filter(pk__in=[product.pk for product in products]).delete()
+            category.delete()
+            brand.delete()
+
+        timings.sort()
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)] if timings else 0
+        self.stdout.write(
+            f"{len(carts)} checkouts of {options['items']} out of {options['products']} products "
+            f"from {options['threads']} threads: {outcomes['paid']} paid, {outcomes['rejected']} rejected, "
+            f"{outcomes['failed']} failed, {len(carts) / elapsed:.0f} per second"
+        )
+        if timings:
+            self.stdout.write(
+                f'checkout p50 {statistics.median(timings):7.2f} ms   '
+                f'p95 {p95:7.2f} ms   max {timings[-1]:7.2f} ms'
+            )
+        mismatched = [
+            pk for pk in stock
+            if stock[pk] + sold.get(pk, 0) + reserved.get(pk, 0) != options['inventory']
+        ]
+        if outcomes['failed'] or mismatched or min(stock.values()) < 0:
+            raise CommandError(
+                f"{outcomes['failed']} checkouts failed, stock does not add up for {len(mismatched)} products"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'stock adds up: {sum(stock.values())} left, {sum(sold.values())} sold, '
+            f'{sum(reserved.values())} still reserved'
+        ))
+
+    def fill_carts(self, users, products, options):
+        rng = random.Random(options['seed'])
+        carts = Cart.objects.bulk_create([
+            Cart(user=users[i % len(users)]) for i in range(options['checkouts'])
+        ])
+        items = []
+        for cart in carts:
+            # random order, checkouts still lock the products in primary key order
+            for product in rng.sample(products, options['items']):
+                quantity = rng.randint(1, 2)
+                items.append(CartItem(
+                    cart=cart, product=product, quantity=quantity,
+                    reserved_quantity=quantity if options['reserved'] else 0,
+                ))
+        CartItem.objects.bulk_create(items)
+        if options['reserved']:
+            # reserved units are out of the inventory, as add_to_cart leaves them
+            for product in products:
+                held = sum(item.quantity for item in items if item.product_id == product.pk)
+                if held > options['inventory']:
+                    raise CommandError('--inventory is too small to reserve every cart')
+                Product.objects.filter(pk=product.pk).update(inventory=options['inventory'] - held)
+        return carts
+
+    def run(self, carts, threads):
+        timings, outcomes = [], {'paid': 0, 'rejected': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def worker(batch):
+            try:
+                for cart in batch:
+                    started = time.perf_counter()
+                    try:
+                        checkout(cart)
+                        outcome = 'paid'
+                    except InsufficientInventory:
+                        outcome = 'rejected'
+                    except DatabaseError as error:
+                        # a deadlock or serialization failure would land here
+                        self.stderr.write(f'checkout of cart {cart.pk} failed: {error}')
+                        outcome = 'failed'
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        timings.append(elapsed)
+                        outcomes[outcome] += 1
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(carts[i::threads],)) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return timings, outcomes
@@ -0,0 +1,187 @@
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core.benchmarks import autodiscover
+from core.throttling import get_throttling_options
+from products.models import Product, Category, Cart, ProductComment
+from products.seeding import Seeder, SEED_PASSWORD, NOUNS
+from products.view_tracking import get_tracking_options
+
+User = get_user_model()
+
+BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'endpoints.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay every registered endpoint benchmark against a seeded dataset, '
+        'report p50/p95 latency and query counts and compare them with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help='Endpoint names, all of them by default')
+        parser.add_argument('--requests', type=int, default=30, help='Requests per endpoint')
+        parser.add_argument(
+            '--rows', type=int, default=5000,
+            help='Number of products to seed, other tables are scaled from it'
+        )
+        parser.add_argument('--baseline', type=Path, default=BASELINE)
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Allowed p95 slowdown over the baseline, as a fraction'
+        )
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Keep the cache between requests instead of measuring every request cold'
+        )
+
+    def handle(self, *args, **options):
+        endpoints = autodiscover()
+        unknown = set(options['endpoints']) - set(endpoints)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        names = options['endpoints'] or sorted(endpoints)
+
+        # the configured caches also hold revoked tokens, cached users and throttle buckets of the
+        # environment, the run clears its own in-process caches instead
+        private_caches = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+            for alias in settings.CACHES
+        }
+        # the throttles still run, with quotas repeated requests cannot use up
+        throttling = get_throttling_options()
+        throttling = {**throttling, 'RATES': {scope: '1000000/day' for scope in throttling['RATES']}}
+        results = {}
+        with transaction.atomic(), override_settings(CACHES=private_caches, THROTTLING=throttling):
+            data = self.seed(options['rows'])
+            # visits are written in the request that fills the buffer, inside this transaction
+            with override_settings(PRODUCT_VIEW_TRACKING={**get_tracking_options(), 'FLUSH_INTERVAL': None}):
+                for name in names:
+                    results[name] = self.measure(endpoints[name], data, options)
+                    self.report(name, results[name])
+            transaction.set_rollback(True)
+
+        if options['save']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            baseline = self.load(options['baseline'])
+            baseline.update(results)
+            options['baseline'].write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f"baseline written to {options['baseline']}")
+            return
+
+        regressions = self.compare(results, self.load(options['baseline']), options['tolerance'])
+        if regressions:
+            raise CommandError(f'{len(regressions)} endpoints regressed: {", ".join(regressions)}')
+
+    def seed(self, rows):
+        seeder = Seeder(seed=0)
+        seeder.seed(
+            products=rows,
+            users=max(rows // 10, 1),
+            carts=max(rows // 10, 1),
+            visits=rows * 4,
+            daily_visits=rows * 10,
+            comments=rows,
+            emails=rows,
+        )
+        users = list(User.objects.filter(username__startswith=f'{seeder.prefix}-user-').order_by('pk'))
+        products = Product.objects.filter(slug__startswith=f'{seeder.prefix}-product-')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return SimpleNamespace(
+            random=random.Random(0),
+            password=SEED_PASSWORD,
+            users=users,
+            user=users[0],
+            admin=User.objects.create_user(
+                f'{seeder.prefix}-admin', f'{seeder.prefix}-admin@example.com', SEED_PASSWORD,
+                is_active=True, is_staff=True,
+            ),
+            cart=Cart.objects.filter(user=users[0], is_paid=False).values_list('pk', flat=True).first(),
+            categories=list(Category.objects.filter(
+                slug__startswith=f'{seeder.prefix}-category-'
+            ).values_list('pk', flat=True)),
+            # in stock, so cart requests do not run out of inventory mid-run
+            products=list(products.filter(
+                status='available', inventory__gte=20
+            ).values_list('pk', flat=True)),
+            commented=list(ProductComment.objects.filter(
+                product__in=products, parent__isnull=True
+            ).values_list('product_id', flat=True).distinct()),
+            words=[noun for noun in NOUNS if noun.isascii()],
+        )
+
+    def measure(self, endpoint, data, options):
+        client = APIClient()
+        if endpoint.user:
+            client.force_authenticate(data.admin if endpoint.user == 'admin' else data.user)
+
+        timings, queries = [], []
+        # the first request pays for imports and connection setup, it is not recorded
+        for _ in range(options['requests'] + 1):
+            method, path, payload = endpoint.build(data)
+            if not options['warm_cache']:
+                for cache in caches.all():
+                    cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, payload)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if response.status_code != endpoint.status:
+                raise CommandError(
+                    f'{endpoint.name}: {method.upper()} {path} returned {response.status_code}, '
+                    f'expected {endpoint.status}'
+                )
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+
+        timings, queries = sorted(timings[1:]), queries[1:]
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 2),
+            'queries': max(queries),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<32} p50 {result['p50_ms']:8.2f} ms   p95 {result['p95_ms']:8.2f} ms   "
+            f"{result['queries']:>3} queries"
+        )
+
+    def load(self, path):
+        return json.loads(path.read_text()) if path.exists() else {}
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                self.stdout.write(f'new  {name}: no baseline')
+                continue
+            problems = []
+            if result['queries'] > expected['queries']:
+                problems.append(f"{result['queries']} queries, baseline {expected['queries']}")
+            # a millisecond of jitter is not a regression on fast endpoints
+            if result['p95_ms'] > max(expected['p95_ms'] * (1 + tolerance), expected['p95_ms'] + 1):
+                problems.append(f"p95 {result['p95_ms']} ms, baseline {expected['p95_ms']} ms")
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'FAIL {name}: {"; ".join(problems)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok   {name}'))
+        return regressions
@@ -0,0 +1,109 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from products.inventory import InsufficientInventory, add_to_cart
+from products.models import Category, Brand, Product, Cart, CartItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Add one product to many carts from concurrent threads and check for overselling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--attempts', type=int, default=2000, help='Add-to-cart calls in total')
+        parser.add_argument('--inventory', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_inventory requires PostgreSQL')
+
+        # threads use their own connections, so the fixtures are committed and removed afterwards
+        prefix = uuid.uuid4().hex[:8]
+        category = Category.objects.create(title=f'benchmark {prefix}')
+        brand = Brand.objects.create(name=f'benchmark {prefix}')
+        product = Product.objects.create(
+            title=f'benchmark {prefix}', description='benchmark', price=1000,
+            category=category, brand=brand, inventory=options['inventory'],
+        )
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}-buyer-{i}', email=f'{prefix}-buyer-{i}@example.com', is_active=True)
+            for i in range(options['threads'])
+        ])
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+
+        try:
+            started = time.perf_counter()
+            timings, outcomes = self.run(carts, product.pk, options)
+            elapsed = time.perf_counter() - started
+            product.refresh_from_db()
+            reserved = CartItem.objects.filter(product=product).aggregate(
+                total=Sum('reserved_quantity')
+            )['total'] or 0
+        finally:
+            Cart.objects.filter(pk__in=[cart.pk for cart in carts]).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+            product.delete()
+            category.delete()
+            brand.delete()
+
+        timings.sort()
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        self.stdout.write(
+            f"{len(timings)} attempts from {options['threads']} threads: "
+            f"{outcomes['reserved']} reserved, {outcomes['rejected']} rejected, "
+            f'{len(timings) / elapsed:.0f} per second'
+        )
+        self.stdout.write(
+            f'add_to_cart p50 {statistics.median(timings):7.2f} ms   '
+            f'p95 {p95:7.2f} ms   max {timings[-1]:7.2f} ms'
+        )
+        expected = min(options['attempts'], options['inventory'])
+        if product.inventory < 0 or product.inventory + reserved != options['inventory'] \
+                or outcomes['reserved'] != expected:
+            raise CommandError(
+                f'inventory mismatch: {product.inventory} left, {reserved} reserved, '
+                f"{outcomes['reserved']} reservations, {expected} expected"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'no oversell: {product.inventory} left, {reserved} reserved'
+        ))
+
+    def run(self, carts, product_id, options):
+        timings, outcomes = [], {'reserved': 0, 'rejected': 0}
+        lock = threading.Lock()
+        per_thread = options['attempts'] // len(carts)
+        extra = options['attempts'] % len(carts)
+
+        def worker(cart, attempts):
+            try:
+                for _ in range(attempts):
+                    started = time.perf_counter()
+                    try:
+                        add_to_cart(cart, product_id, 1)
+                        outcome = 'reserved'
+                    except InsufficientInventory:
+                        outcome = 'rejected'
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        timings.append(elapsed)
+                        outcomes[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(cart, per_thread + (i < extra)))
+            for i, cart in enumerate(carts)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings, outcomes
@@ -0,0 +1,44 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from core.metrics import get_metrics_options, reset_metrics
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of RequestMetricsMiddleware against the existing data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/products/', '/categories/', '/products/popular_products/'])
+        parser.add_argument('--requests', type=int, default=500, help='Requests per path and profile')
+
+    def handle(self, *args, **options):
+        clients = {}
+        for enabled in (False, True):
+            with override_settings(REQUEST_METRICS={**get_metrics_options(), 'ENABLED': enabled}):
+                # the middleware chain is built on the first request, inside the override
+                clients[enabled] = Client()
+                for path in options['paths']:
+                    self.get(clients[enabled], path)
+
+        for path in options['paths']:
+            timings = {False: [], True: []}
+            # alternate the profiles so both see the same cache and database state
+            for _ in range(options['requests']):
+                for enabled, client in clients.items():
+                    timings[enabled].append(self.get(client, path))
+            off, on = statistics.median(timings[False]), statistics.median(timings[True])
+            self.stdout.write(
+                f'{path:<32} disabled p50 {off:7.3f} ms   enabled p50 {on:7.3f} ms   '
+                f'overhead {on - off:+7.3f} ms ({(on - off) / off * 100:+.1f}%)'
+            )
+        reset_metrics()
+
+    def get(self, client, path):
+        started = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}')
+        return elapsed * 1000
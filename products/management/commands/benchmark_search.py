@@ -0,0 +1,80 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from products.models import Product, Category
+from products.search import search_products
+from products.seeding import Seeder, NOUNS
+
+
+class Command(BaseCommand):
+    help = 'Seed a catalog and measure product search latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500000)
+        parser.add_argument('--queries', type=int, default=200, help='Queries per scenario')
+        parser.add_argument('--no-seed', action='store_true', help='Benchmark the existing catalog')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded data')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_search requires PostgreSQL')
+
+        self.random = random.Random(0)
+        with transaction.atomic():
+            if not options['no_seed']:
+                started = time.perf_counter()
+                Seeder(batch_size=5000, seed=0).seed(
+                    categories=50, brands=200, products=options['products'],
+                    users=0, carts=0, visits=0, comments=0,
+                )
+                self.stdout.write(
+                    f"seeded {options['products']} products in {time.perf_counter() - started:.1f}s"
+                )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE products_product, products_searchterm')
+
+            category_ids = list(Category.objects.values_list('pk', flat=True))
+            self.vocabulary = [
+                word
+                for title in Product.objects.values_list('title', flat=True)[:1000]
+                for word in title.split()
+                if not word.isdigit()
+            ]
+            scenarios = {
+                'fulltext': lambda: (self.words(), {}),
+                'fulltext + filters': lambda: (self.words(), {
+                    'category_id': self.random.choice(category_ids),
+                    'price__gte': 100000,
+                    'price__lte': 3000000,
+                }),
+                'typo fallback': lambda: (self.typo(), {}),
+            }
+            for name, make_query in scenarios.items():
+                self.report(name, [self.measure(*make_query()) for _ in range(options['queries'])])
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def words(self):
+        return ' '.join(self.random.sample(self.vocabulary, self.random.randint(1, 2)))
+
+    def typo(self):
+        word = self.random.choice([noun for noun in NOUNS if noun.isascii()])
+        position = self.random.randrange(len(word))
+        return word[:position] + word[position + 1:]
+
+    def measure(self, text, filters):
+        started = time.perf_counter()
+        search_products(Product.objects.filter(status='available', **filters), text, 20)
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, name, timings):
+        timings.sort()
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        self.stdout.write(
+            f'{name:<20} p50 {statistics.median(timings):7.2f} ms   '
+            f'p95 {p95:7.2f} ms   max {timings[-1]:7.2f} ms'
+        )
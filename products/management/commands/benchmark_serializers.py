@@ -0,0 +1,61 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from products.models import Product
+from products.serializers import ProductSerializer, ProductValuesSerializer
+from products.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = 'Compare fetching and serializing product pages with ProductSerializer and ProductValuesSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Products per page')
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        size = options['products']
+        with transaction.atomic():
+            products = Product.objects.filter(status='available').order_by('-created_at', '-id')
+            missing = size - products.count()
+            if missing > 0:
+                # seeded rows are rolled back with the transaction
+                Seeder(batch_size=5000, seed=0).seed(
+                    categories=10, brands=20, products=missing,
+                    users=0, carts=0, visits=0, comments=0,
+                )
+            page = products[:size]
+
+            scenarios = {
+                'ProductSerializer': lambda: (list(page.all()), ProductSerializer),
+                'ProductValuesSerializer': lambda: (list(ProductValuesSerializer.rows(page)), ProductValuesSerializer),
+            }
+            outputs = {}
+            for name, fetch in scenarios.items():
+                fetch_timings, serialize_timings = [], []
+                for _ in range(options['rounds']):
+                    started = time.perf_counter()
+                    rows, serializer_class = fetch()
+                    fetched = time.perf_counter()
+                    outputs[name] = serializer_class(rows, many=True).data
+                    fetch_timings.append((fetched - started) * 1000)
+                    serialize_timings.append((time.perf_counter() - fetched) * 1000)
+                self.report(name, fetch_timings, serialize_timings, len(rows))
+
+            transaction.set_rollback(True)
+
+        full, values = outputs.values()
+        if [dict(product) for product in full] != list(values):
+            raise CommandError('ProductValuesSerializer output differs from ProductSerializer')
+
+    def report(self, name, fetch_timings, serialize_timings, count):
+        # per 1,000 products
+        scale = 1000 / max(count, 1)
+        fetch = statistics.median(fetch_timings) * scale
+        serialize = statistics.median(serialize_timings) * scale
+        self.stdout.write(
+            f'{name:<24} fetch {fetch:7.2f} ms   serialize {serialize:7.2f} ms   '
+            f'total {fetch + serialize:7.2f} ms per 1000 products'
+        )
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from core.query_plans import autodiscover, plan_nodes
+from products.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN ANALYZE on every registered hot query against a seeded '
+        'dataset and fail if one of them is not served by an index'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=5000,
+            help='Number of products to seed, other tables are scaled from it'
+        )
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Explain against the existing data instead of seeding'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('check_query_plans requires PostgreSQL')
+
+        queries = autodiscover()
+        failures = []
+        with transaction.atomic():
+            if not options['no_seed']:
+                rows = options['rows']
+                Seeder().seed(
+                    products=rows,
+                    users=max(rows // 10, 1),
+                    # carts beyond one per user are paid, like most carts of a live shop
+                    carts=max(rows // 2, 1),
+                    visits=rows * 4,
+                    daily_visits=rows * 4,
+                    comments=rows,
+                    emails=rows,
+                )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for name in sorted(queries):
+                query = queries[name]
+                queryset = query.build()
+                problems = self.check_plan(query, plan_nodes(queryset.explain(format='json', analyze=True)))
+                if problems:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'FAIL {name}: {"; ".join(problems)}'))
+                    self.stdout.write(queryset.explain(analyze=True))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'ok   {name}'))
+                    if options['verbosity'] > 1:
+                        self.stdout.write(queryset.explain(analyze=True))
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries are not index backed: {", ".join(failures)}')
+
+    def check_plan(self, query, nodes):
+        problems = []
+        for node in nodes:
+            # joined tables are left to the planner, the hot table must be read through its index
+            if node.get('Relation Name') != query.table:
+                continue
+            if node['Node Type'] == 'Seq Scan':
+                problems.append(f'sequential scan on {query.table}')
+            filtered = node.get('Rows Removed by Filter', 0) * node.get('Actual Loops', 1)
+            if filtered > query.max_filtered:
+                problems.append(f'{filtered:.0f} rows of {query.table} removed by filter')
+        if query.indexes and not any(node.get('Index Name') in query.indexes for node in nodes):
+            problems.append(f'expected one of {", ".join(query.indexes)}')
+        return problems
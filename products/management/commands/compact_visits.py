@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from products.visit_history import compact_visits, purge_rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold old raw product visits into daily rollups and drop expired rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=int, help='Days of raw visits to keep')
+        parser.add_argument('--rollup-days', type=int, help='Days of daily rollups to keep')
+
+    def handle(self, *args, **options):
+        compacted = compact_visits(options['raw_days'])
+        purged = purge_rollups(options['rollup_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{compacted} raw visits compacted, {purged} expired daily rollups removed'
+        ))
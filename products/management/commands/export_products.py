@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from products.catalog_io import FORMATS, detect_format, export_products
+
+
+class Command(BaseCommand):
+    help = 'Stream the product catalog as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help="Target file, '-' writes to stdout")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+
+    def handle(self, *args, **options):
+        path = options['output']
+        file_format = options['format'] or detect_format(path)
+        if path == '-':
+            for chunk in export_products(file_format):
+                self.stdout.write(chunk, ending='')
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(export_products(file_format))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from products.view_tracking import get_view_tracker
+
+
+class Command(BaseCommand):
+    help = 'Write buffered product views to the database'
+
+    def handle(self, *args, **options):
+        tracker = get_view_tracker()
+        tracker.request_flush()
+        written = tracker.flush()
+        self.stdout.write(self.style.SUCCESS(
+            f'{written} buffered views written, flush requested from running workers'
+        ))
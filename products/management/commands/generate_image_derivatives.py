@@ -0,0 +1,28 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from products.images import generate_pending, get_image_options
+
+
+class Command(BaseCommand):
+    help = 'Render resized copies of new and replaced product, brand and banner images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Images rendered per model in one round')
+        parser.add_argument('--processes', type=int, help='Render processes, defaults to one per core')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new images')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        processes = options['processes'] or get_image_options()['PROCESSES']
+        with ProcessPoolExecutor(processes) as executor:
+            while True:
+                while True:
+                    generated, failed = generate_pending(executor, options['batch_size'])
+                    if not generated and not failed:
+                        break
+                    self.stdout.write(f'{generated} generated, {failed} failed')
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
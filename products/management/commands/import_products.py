@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from products.catalog_io import FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Upsert products from a CSV or JSON Lines file, matched on slug'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, '-' reads from stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or detect_format(path)
+        try:
+            if path == '-':
+                result = import_products(sys.stdin, file_format, options['chunk_size'])
+            else:
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    result = import_products(stream, file_format, options['chunk_size'])
+        except OSError as error:
+            raise CommandError(error)
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} created, {result['updated']} updated, {result['invalid']} invalid"
+        ))
@@ -0,0 +1,108 @@
+import http.client
+import socket
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a running server with concurrent keep-alive clients and report throughput '
+        'and latency, run it once per serving profile to compare them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/products/', '/categories/', '/products/popular_products/'])
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run')
+        parser.add_argument('--warmup', type=float, default=2, help='Seconds before measuring starts')
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Extra clients that trickle their requests, each one holds a connection the whole time'
+        )
+        parser.add_argument('--slow-seconds', type=float, default=5, help='Time a slow client takes to send a request')
+
+    def handle(self, *args, **options):
+        base = urlsplit(options['url'])
+        if base.scheme not in ('http', 'https'):
+            raise CommandError(f"Unsupported URL {options['url']}")
+
+        started = time.monotonic()
+        measure_from = started + options['warmup']
+        stop_at = measure_from + options['duration']
+        results = []
+        threads = [
+            threading.Thread(
+                target=self.client,
+                args=(base, options['paths'], i, measure_from, stop_at, results),
+            )
+            for i in range(options['concurrency'])
+        ] + [
+            threading.Thread(
+                target=self.slow_client,
+                args=(base, options['paths'][i % len(options['paths'])], options['slow_seconds'], stop_at),
+                daemon=True,
+            )
+            for i in range(options['slow_clients'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        timings = sorted(elapsed for elapsed, ok in results if ok)
+        errors = sum(1 for _, ok in results if not ok)
+        if not timings:
+            raise CommandError(f'No successful requests, {errors} errors')
+        self.stdout.write(
+            f"{len(results) / options['duration']:8.1f} requests/s   "
+            f'p50 {statistics.median(timings):7.2f} ms   '
+            f'p95 {self.percentile(timings, 0.95):7.2f} ms   '
+            f'p99 {self.percentile(timings, 0.99):7.2f} ms   '
+            f'{errors} errors'
+        )
+
+    def client(self, base, paths, offset, measure_from, stop_at, results):
+        connection_class = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(base.netloc, timeout=30)
+        measured = []
+        # clients start at different paths so every path sees load from the first second
+        i = offset
+        while (now := time.monotonic()) < stop_at:
+            path = base.path.rstrip('/') + paths[i % len(paths)]
+            i += 1
+            try:
+                connection.request('GET', path, headers={'Accept': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            if now >= measure_from:
+                measured.append(((time.monotonic() - now) * 1000, ok))
+        connection.close()
+        results.extend(measured)
+
+    def slow_client(self, base, path, seconds, stop_at):
+        host, _, port = base.netloc.partition(':')
+        steps = 10
+        while time.monotonic() < stop_at:
+            try:
+                with socket.create_connection((host, int(port or 80)), timeout=30) as sock:
+                    sock.sendall(f'GET {base.path.rstrip("/")}{path} HTTP/1.1\r\nHost: {base.netloc}\r\n'.encode())
+                    for _ in range(steps):
+                        time.sleep(seconds / steps)
+                        sock.sendall(b'X-Padding: 1\r\n')
+                    sock.sendall(b'Connection: close\r\n\r\n')
+                    while sock.recv(65536):
+                        pass
+            except OSError:
+                time.sleep(0.1)
+
+    def percentile(self, timings, fraction):
+        return timings[min(int(len(timings) * fraction), len(timings) - 1)]
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.search import prune_search_terms
+
+
+class Command(BaseCommand):
+    help = 'Delete spelling correction words that no product contains any more'
+
+    def handle(self, *args, **options):
+        pruned = prune_search_terms()
+        self.stdout.write(self.style.SUCCESS(f'{pruned} search terms pruned'))
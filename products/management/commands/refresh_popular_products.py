@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products.ranking import refresh_ranking
+from products import cache
+
+
+class Command(BaseCommand):
+    help = 'Merge new product visits into the popular products ranking'
+
+    def handle(self, *args, **options):
+        updated = refresh_ranking()
+        if updated:
+            cache.invalidate('popular')
+        self.stdout.write(self.style.SUCCESS(f'{updated} products re-ranked'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Return the stock reserved by expired items of unpaid carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Items released per transaction')
+
+    def handle(self, *args, **options):
+        released = release_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{released} expired reservations released'))
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 10:59
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('products', 'Cart')
+    CartItem = apps.get_model('products', 'CartItem')
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    price_sum = items.annotate(
+        total=Sum(
+            F('quantity') * F('product__price'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=0)
+        )
+    ).values('total')
+    quantity_sum = items.annotate(total=Sum('quantity')).values('total')
+    Cart.objects.update(
+        total_price=Coalesce(Subquery(price_sum), 0, output_field=models.DecimalField()),
+        total_items=Coalesce(Subquery(quantity_sum), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=12),
+        ),
+        migrations.RunPython(populate_cart_totals, migrations.RunPython.noop),
+    ]
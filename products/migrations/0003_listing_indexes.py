@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_cart_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-views_count', '-id'], name='product_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcomment',
+            index=models.Index(fields=['product', '-created_date', '-id'], name='comment_product_created_idx'),
+        ),
+    ]
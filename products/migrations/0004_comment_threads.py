@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_threads(apps, schema_editor):
+    ProductComment = apps.get_model('products', 'ProductComment')
+    parents = dict(ProductComment.objects.values_list('id', 'parent_id'))
+    comments = []
+    for comment in ProductComment.objects.filter(parent__isnull=False).only('id'):
+        node, depth = comment.id, 0
+        while parents[node] is not None:
+            node, depth = parents[node], depth + 1
+        comment.root_id, comment.depth = node, depth
+        comments.append(comment)
+    ProductComment.objects.bulk_update(comments, ['root', 'depth'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcomment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productcomment',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread', to='products.productcomment'),
+        ),
+        migrations.RunPython(populate_threads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_comment_threads'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_views_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['user'], name='cart_user_unpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'available')), fields=['-created_at', '-id'], name='product_available_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'available')), fields=['-views_count', '-id'], name='product_available_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_popular', True), ('status', 'available')), fields=['-views_count'], name='product_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitedproduct',
+            index=models.Index(fields=['product', 'user_ip', '-visited_date'], name='visited_product_ip_date_idx'),
+        ),
+    ]
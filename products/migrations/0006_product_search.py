@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-18 11:14
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+POPULATE_SEARCH_INDEX = '''
+UPDATE products_product product SET search_vector =
+    setweight(to_tsvector('simple', coalesce(product.title, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(category.title, '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(brand.name, '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(product.description, '')), 'C')
+FROM products_category category, products_brand brand
+WHERE category.id = product.category_id AND brand.id = product.brand_id;
+
+INSERT INTO products_searchterm (word)
+SELECT DISTINCT word FROM (
+    SELECT unnest(tsvector_to_array(search_vector)) AS word FROM products_product
+) words
+WHERE length(word) BETWEEN 3 AND 100 AND word !~ '^[0-9]+$'
+ON CONFLICT (word) DO NOTHING;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name': 'واژه جستجو',
+                'verbose_name_plural': 'واژه های جستجو',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['word'], name='search_term_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(POPULATE_SEARCH_INDEX, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 11:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_inventory_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRanking',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='products.product')),
+                ('score', models.FloatField()),
+                ('last_visit_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'رتبه محبوبیت',
+                'verbose_name_plural': 'رتبه های محبوبیت',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_popular_idx',
+        ),
+        migrations.AddIndex(
+            model_name='visitedproduct',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['visited_date'], name='visited_product_date_brin'),
+        ),
+        migrations.AddField(
+            model_name='productranking',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.category'),
+        ),
+        migrations.AddIndex(
+            model_name='productranking',
+            index=models.Index(fields=['-score'], name='ranking_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productranking',
+            index=models.Index(fields=['category', '-score'], name='ranking_category_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productranking',
+            index=models.Index(fields=['last_visit_at'], name='ranking_last_visit_idx'),
+        ),
+    ]
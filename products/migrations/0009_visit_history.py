@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 11:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_popular_ranking'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='visitedproduct',
+            unique_together=set(),
+        ),
+        migrations.CreateModel(
+            name='ProductDailyVisits',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('visits', models.PositiveIntegerField()),
+                ('visitors', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_visits', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'آمار روزانه بازدید',
+                'verbose_name_plural': 'آمار روزانه بازدید ها',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productdailyvisits',
+            index=models.Index(fields=['date'], name='daily_visits_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productdailyvisits',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='daily_visits_product_date_uniq'),
+        ),
+    ]
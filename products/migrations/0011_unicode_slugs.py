@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='brand',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 13:00
+
+from django.db import migrations, models
+from django.db.models import F, Q
+from django.db.models.fields.json import KT
+
+
+def flag_stale_derivatives(apps, schema_editor):
+    # rows whose copies are missing or were built from another file
+    for model_name, field in (('Product', 'image'), ('Brand', 'logo'), ('Banners', 'image')):
+        model = apps.get_model('products', model_name)
+        model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).annotate(
+            derived_from=KT(f'{field}_derivatives__source')
+        ).filter(Q(derived_from__isnull=True) | ~Q(derived_from=F(field))).update(derivatives_stale=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_product_title_search_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banners',
+            name='derivatives_stale',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='derivatives_stale',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='derivatives_stale',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='banners',
+            index=models.Index(condition=models.Q(('derivatives_stale', True)), fields=['id'], name='banner_derivatives_stale_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='brand',
+            index=models.Index(condition=models.Q(('derivatives_stale', True)), fields=['id'], name='brand_derivatives_stale_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('derivatives_stale', True)), fields=['id'], name='product_derivatives_stale_idx'),
+        ),
+        migrations.RunPython(flag_stale_derivatives, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,38 @@
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
-from django.utils.text import slugify
+from .search import SEARCH_CONFIG
+from .slugs import SlugMixin
 
 User = get_user_model()
 
 
+class DerivativesMixin:
+    """
+    Flags the resized copies of ``derivatives_source`` stale when the image
+    changes. ``generate_image_derivatives`` polls the flag through a partial
+    index and clears it when it stores the copies, see products.images.
+    """
+    derivatives_source = 'image'
 
-
-class Category(models.Model):
+    def save(self, *args, **kwargs):
+        image = getattr(self, self.derivatives_source)
+        derived_from = getattr(self, f'{self.derivatives_source}_derivatives').get('source')
+        # an upload that is not stored yet has no final name to compare
+        stale = bool(image) and (not image._committed or image.name != derived_from)
+        if stale != self.derivatives_stale:
+            self.derivatives_stale = stale
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'derivatives_stale'}
+        super().save(*args, **kwargs)
+
+
+class Category(SlugMixin, models.Model):
     title = models.CharField(max_length=50)
-    slug = models.SlugField(unique=True, blank=True, null=True)
+    slug = models.SlugField(unique=True, blank=True, null=True, allow_unicode=True)
     description = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
 
@@ -19,30 +42,38 @@ class Category(models.Model):
     class Meta:
         verbose_name = 'دسته بندی'
         verbose_name_plural = 'دسته بندی ها'
-        
-    def save(self, *args, **kwargs):
-        self.slug = slugify(self.title)
-        return super().save(*args, **kwargs)
 
 
-class Brand(models.Model):
+class Brand(SlugMixin, DerivativesMixin, models.Model):
+    slug_source = 'name'
+    derivatives_source = 'logo'
+
     name = models.CharField(max_length=50)
-    slug = models.SlugField(unique=True, blank=True, null=True)
+    slug = models.SlugField(unique=True, blank=True, null=True, allow_unicode=True)
     logo = models.ImageField(upload_to='brands/', null=True, blank=True)
+    # resized copies of logo, see products.images
+    logo_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    derivatives_stale = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         return self.name
-    
+
     class Meta:
         verbose_name = 'برند'
         verbose_name_plural = 'برند'
-    
-    def save(self, *args, **kwargs):
-        self.slug = slugify(self.name)
-        return super().save(*args, **kwargs)
+        indexes = [
+            # polled by generate_image_derivatives
+            models.Index(fields=['id'], name='brand_derivatives_stale_idx', condition=Q(derivatives_stale=True)),
+        ]
+
 
+class ProductManager(models.Manager):
+    def get_queryset(self):
+        # the search vector is only ever read by the database
+        return super().get_queryset().defer('search_vector')
 
-class Product(models.Model):
+
+class Product(SlugMixin, DerivativesMixin, models.Model):
     STATUS_CHOICES = (
         ('available', 'موجود'),
         ('unavailable', 'ناموجود'),
@@ -50,7 +81,7 @@ class Product(models.Model):
     )
 
     title = models.CharField(max_length=200)
-    slug = models.SlugField(unique=True, null=True, blank=True)
+    slug = models.SlugField(unique=True, null=True, blank=True, allow_unicode=True)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=0)
     category = models.ForeignKey(
@@ -70,10 +101,16 @@ class Product(models.Model):
     )
     inventory = models.PositiveIntegerField(default=1)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # resized copies of image, see products.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    derivatives_stale = models.BooleanField(default=False, editable=False)
     views_count = models.PositiveIntegerField(default=0)
     is_popular = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductManager()
 
     def __str__(self):
         return self.title
@@ -81,13 +118,40 @@ class Product(models.Model):
     class Meta:
         verbose_name = 'محصول'
         verbose_name_plural = 'محصولات'
-    
-    def save(self, *args, **kwargs):
-        self.slug = slugify(self.title)
-        return super().save(*args, **kwargs)
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='product_available_created_idx',
+                condition=Q(status='available'),
+            ),
+            models.Index(
+                fields=['-views_count', '-id'],
+                name='product_available_views_idx',
+                condition=Q(status='available'),
+            ),
+            GinIndex(fields=['search_vector'], name='product_search_idx'),
+            # title matches are ranked first, see search.rank_products
+            GinIndex(SearchVector('title', config=SEARCH_CONFIG), name='product_title_search_idx'),
+            # polled by generate_image_derivatives
+            models.Index(fields=['id'], name='product_derivatives_stale_idx', condition=Q(derivatives_stale=True)),
+        ]
+
+
+class SearchTerm(models.Model):
+    word = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = 'واژه جستجو'
+        verbose_name_plural = 'واژه های جستجو'
+        indexes = [
+            GinIndex(fields=['word'], name='search_term_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    def __str__(self):
+        return self.word
 
 
-class Banners(models.Model):
+class Banners(DerivativesMixin, models.Model):
     class Position(models.TextChoices):
         product_list = 'product_list', 'لیست محصولات'
         home = 'home', 'صفحه اصلی'
@@ -95,6 +159,9 @@ class Banners(models.Model):
     title = models.CharField(max_length=200)
     url = models.URLField(max_length=200)
     image = models.ImageField(upload_to='banners/')
+    # resized copies of image, see products.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    derivatives_stale = models.BooleanField(default=False, editable=False)
     position = models.CharField(max_length=200, choices=Position.choices)
     is_active = models.BooleanField(default=True)
     
@@ -104,6 +171,26 @@ class Banners(models.Model):
     class Meta:
         verbose_name = 'بنر'
         verbose_name_plural = 'بنر ها'
+        indexes = [
+            # polled by generate_image_derivatives
+            models.Index(fields=['id'], name='banner_derivatives_stale_idx', condition=Q(derivatives_stale=True)),
+        ]
+
+
+class CartQuerySet(models.QuerySet):
+    def update_totals(self):
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        price_sum = items.annotate(
+            total=Sum(
+                F('quantity') * F('product__price'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=0)
+            )
+        ).values('total')
+        quantity_sum = items.annotate(total=Sum('quantity')).values('total')
+        return self.update(
+            total_price=Coalesce(Subquery(price_sum), 0, output_field=models.DecimalField()),
+            total_items=Coalesce(Subquery(quantity_sum), 0),
+        )
 
 
 class Cart(models.Model):
@@ -113,18 +200,23 @@ class Cart(models.Model):
         related_name='carts'
     )
     is_paid = models.BooleanField(default=False)
+    total_price = models.DecimalField(max_digits=12, decimal_places=0, default=0)
+    total_items = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+    objects = CartQuerySet.as_manager()
 
-    def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+    def update_totals(self):
+        Cart.objects.filter(pk=self.pk).update_totals()
+        self.refresh_from_db(fields=['total_price', 'total_items'])
 
     class Meta:
         verbose_name = 'سبد خرید'
         verbose_name_plural = 'سبد های خرید'
+        indexes = [
+            models.Index(fields=['user'], name='cart_user_unpaid_idx', condition=Q(is_paid=False)),
+        ]
 
 
 class CartItem(models.Model):
@@ -135,6 +227,9 @@ class CartItem(models.Model):
         )
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # units taken from product.inventory, returned when the reservation expires
+    reserved_quantity = models.PositiveIntegerField(default=0)
+    reserved_until = models.DateTimeField(blank=True, null=True)
 
     @property
     def total_price(self):
@@ -146,6 +241,44 @@ class CartItem(models.Model):
     class Meta:
         verbose_name = 'ایتم خرید'
         verbose_name_plural = 'ایتم های خرید'
+        indexes = [
+            models.Index(
+                fields=['reserved_until'],
+                name='cartitem_reserved_idx',
+                condition=Q(reserved_quantity__gt=0),
+            ),
+        ]
+
+
+class Order(models.Model):
+    user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='orders')
+    cart = models.OneToOneField(Cart, on_delete=models.SET_NULL, null=True, blank=True, related_name='order')
+    total_price = models.DecimalField(max_digits=12, decimal_places=0)
+    total_items = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.total_price}"
+
+    class Meta:
+        verbose_name = 'سفارش'
+        verbose_name_plural = 'سفارش ها'
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    # title and price as they were at checkout
+    title = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=0)
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.title} - {self.quantity}"
+
+    class Meta:
+        verbose_name = 'ایتم سفارش'
+        verbose_name_plural = 'ایتم های سفارش'
 
 
 class VisitedProduct(models.Model):
@@ -166,14 +299,67 @@ class VisitedProduct(models.Model):
         return self.user.username
     
     class Meta:
-        unique_together = ('product', 'user', 'user_ip', 'visited_date')
         verbose_name = 'محصول بازدید شده'
         verbose_name_plural = 'محصولات بازدید شده'
+        indexes = [
+            models.Index(fields=['product', 'user_ip', '-visited_date'], name='visited_product_ip_date_idx'),
+            # visits are append-only, so a tiny BRIN index serves the ranking's time windows
+            BrinIndex(fields=['visited_date'], name='visited_product_date_brin'),
+        ]
+
+
+class ProductDailyVisits(models.Model):
+    # raw visits older than VISIT_HISTORY['RAW_DAYS'] are compacted into these rows
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='daily_visits',
+        db_index=False,  # covered by daily_visits_product_date_uniq
+    )
+    date = models.DateField()
+    visits = models.PositiveIntegerField()
+    visitors = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'آمار روزانه بازدید'
+        verbose_name_plural = 'آمار روزانه بازدید ها'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='daily_visits_product_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='daily_visits_date_idx'),
+        ]
+
+
+class ProductRanking(models.Model):
+    # log2 of the time-decayed visit count, measured at the unix epoch: the order
+    # never changes as time passes, so rows are only touched by new visits
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking'
+    )
+    # covered by ranking_category_score_idx
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', db_index=False)
+    score = models.FloatField()
+    last_visit_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'رتبه محبوبیت'
+        verbose_name_plural = 'رتبه های محبوبیت'
+        indexes = [
+            models.Index(fields=['-score'], name='ranking_score_idx'),
+            models.Index(fields=['category', '-score'], name='ranking_category_score_idx'),
+            models.Index(fields=['last_visit_at'], name='ranking_last_visit_idx'),
+        ]
 
 
 class ProductComment(models.Model):
     product = models.ForeignKey(Product, related_name='comments', on_delete=models.CASCADE)
     parent = models.ForeignKey('ProductComment', null=True, blank=True, on_delete=models.CASCADE, related_name='child')
+    root = models.ForeignKey('ProductComment', null=True, blank=True, editable=False, on_delete=models.CASCADE, related_name='thread')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     user = models.ForeignKey(User, related_name='comments', on_delete=models.CASCADE)
     created_date = models.DateTimeField(auto_now_add=True)
     text = models.TextField()
@@ -181,6 +367,15 @@ class ProductComment(models.Model):
     class Meta:
         verbose_name = 'نظر محصولات'
         verbose_name_plural = 'نظرات محصولات'
+        indexes = [
+            models.Index(fields=['product', '-created_date', '-id'], name='comment_product_created_idx'),
+        ]
 
     def __str__(self):
-        return str(self.user)
\ No newline at end of file
+        return str(self.user)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent is not None:
+            self.root_id = self.parent.root_id or self.parent.pk
+            self.depth = self.parent.depth + 1
+        return super().save(*args, **kwargs)
\ No newline at end of file
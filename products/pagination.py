@@ -0,0 +1,194 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import BooleanField, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class Row(Func):
+    function = 'ROW'
+
+
+class RowComparison(Func):
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+    def __init__(self, left, operator, right):
+        self.arg_joiner = f' {operator} '
+        super().__init__(left, right)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ordering such as ``(-created_at, -id)``.
+    Pages are fetched with ``WHERE ROW(created_at, id) < ROW(...)`` instead
+    of OFFSET, which PostgreSQL uses as the start of the index scan, so every
+    page costs the same as the first one.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    # name -> ordering, the first entry is the default
+    orderings = {'newest': ('-created_at', '-id')}
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([instance async for instance in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """The requested page plus one row, which tells whether another page follows."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        self.reverse, self.position = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self.flip(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.after(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request):
+        name = request.query_params.get(self.ordering_query_param)
+        if name in self.orderings:
+            return self.orderings[name]
+        return next(iter(self.orderings.values()))
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        names = [field.lstrip('-') for field in ordering]
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) == 1:
+            return RowComparison(
+                Row(*names), '<' if descending.pop() else '>', Row(*(Value(value) for value in position))
+            )
+
+        # mixed directions have no row comparison, the leading bound still limits the scan
+        conditions = []
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = dict(zip(names[:index], position[:index]))
+            conditions.append(Q(**equal, **{f'{names[index]}__{lookup}': position[index]}))
+        bound = Q(**{f"{names[0]}__{'lte' if ordering[0].startswith('-') else 'gte'}": position[0]})
+        return bound & reduce(or_, conditions)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()))
+            reverse, values = bool(payload['r']), payload['v']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error,
+                FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, instance, reverse):
+        if isinstance(instance, dict):
+            # pages of .values() rows
+            values = [instance[field.lstrip('-')] for field in self.ordering]
+        else:
+            values = [getattr(instance, field.lstrip('-')) for field in self.ordering]
+        # isoformat keeps the microseconds DjangoJSONEncoder would drop
+        payload = json.dumps({'r': int(reverse), 'v': values}, default=self.encode_value)
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            urlsafe_b64encode(payload.encode()).decode()
+        )
+
+    @staticmethod
+    def encode_value(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ProductPagination(KeysetPagination):
+    orderings = {
+        'newest': ('-created_at', '-id'),
+        'popular': ('-views_count', '-id'),
+    }
+
+
+class CommentPagination(KeysetPagination):
+    orderings = {'newest': ('-created_date', '-id')}
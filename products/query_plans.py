@@ -0,0 +1,132 @@
+from django.db.models import Count
+from django.utils import timezone
+from core.query_plans import hot_query
+from .images import pending
+from .pagination import KeysetPagination, ProductPagination, CommentPagination
+from .models import (
+    Product, ProductRanking, ProductDailyVisits, Cart, CartItem, VisitedProduct, ProductComment
+)
+
+
+@hot_query('product_list', 'products_product', indexes=['product_available_created_idx'])
+def product_list():
+    return Product.objects.filter(status='available').order_by('-created_at', '-id')[:21]
+
+
+@hot_query('product_list_by_views', 'products_product', indexes=['product_available_views_idx'])
+def product_list_by_views():
+    return Product.objects.filter(status='available').order_by('-views_count', '-id')[:21]
+
+
+def deep_page(queryset, ordering, depth=0.9):
+    """A keyset page after ``depth`` of the rows in ``ordering``."""
+    rows = queryset.order_by(*ordering).values_list(*(field.lstrip('-') for field in ordering))
+    position = rows[int(rows.count() * depth)]
+    return queryset.filter(KeysetPagination.after(ordering, position)).order_by(*ordering)[:21]
+
+
+@hot_query('product_list_deep_page', 'products_product', indexes=['product_available_created_idx'])
+def product_list_deep_page():
+    return deep_page(Product.objects.filter(status='available'), ProductPagination.orderings['newest'])
+
+
+@hot_query('product_list_by_views_deep_page', 'products_product', indexes=['product_available_views_idx'])
+def product_list_by_views_deep_page():
+    return deep_page(Product.objects.filter(status='available'), ProductPagination.orderings['popular'])
+
+
+@hot_query('popular_products', 'products_productranking', indexes=['ranking_score_idx'])
+def popular_products():
+    return Product.objects.filter(status='available', ranking__isnull=False).order_by('-ranking__score')[:10]
+
+
+@hot_query(
+    'popular_products_by_category', 'products_productranking',
+    indexes=['ranking_category_score_idx']
+)
+def popular_products_by_category():
+    category_id = ProductRanking.objects.values_list('category_id', flat=True).first()
+    return Product.objects.filter(
+        status='available', ranking__category_id=category_id
+    ).order_by('-ranking__score')[:10]
+
+
+@hot_query('ranking_new_visits', 'products_visitedproduct', indexes=['visited_product_date_brin'])
+def ranking_new_visits():
+    return VisitedProduct.objects.filter(
+        visited_date__gt=timezone.now() - timezone.timedelta(minutes=5),
+        visited_date__lte=timezone.now() - timezone.timedelta(minutes=1),
+    )
+
+
+@hot_query('open_cart', 'products_cart')
+def open_cart():
+    user_id = Cart.objects.values_list('user_id', flat=True).first()
+    return Cart.objects.filter(user_id=user_id, is_paid=False)
+
+
+@hot_query('expired_reservations', 'products_cartitem', indexes=['cartitem_reserved_idx'])
+def expired_reservations():
+    return CartItem.objects.filter(
+        reserved_quantity__gt=0,
+        reserved_until__lt=timezone.now(),
+        cart__is_paid=False,
+    )[:500]
+
+
+@hot_query('pending_image_derivatives', 'products_product', indexes=['product_derivatives_stale_idx'])
+def pending_image_derivatives():
+    return pending(Product).order_by('pk').values_list('pk', 'image')[:20]
+
+
+@hot_query('product_daily_visits', 'products_productdailyvisits', indexes=['daily_visits_product_date_uniq'])
+def product_daily_visits():
+    product_id = ProductDailyVisits.objects.values_list('product_id', flat=True).first()
+    return ProductDailyVisits.objects.filter(
+        product_id=product_id, date__gte=timezone.localdate() - timezone.timedelta(days=365)
+    )
+
+
+@hot_query('expired_daily_visits', 'products_productdailyvisits', indexes=['daily_visits_date_idx'])
+def expired_daily_visits():
+    return ProductDailyVisits.objects.filter(date__lt=timezone.localdate() - timezone.timedelta(days=730))
+
+
+@hot_query('visit_dedup', 'products_visitedproduct', indexes=['visited_product_ip_date_idx'])
+def visit_dedup():
+    product_id = VisitedProduct.objects.values_list('product_id', flat=True).first()
+    return VisitedProduct.objects.filter(
+        product_id=product_id,
+        user_ip='10.0.0.1',
+        visited_date__gte=timezone.now() - timezone.timedelta(days=1)
+    )
+
+
+@hot_query('product_comments', 'products_productcomment', indexes=['comment_product_created_idx'])
+def product_comments():
+    return ProductComment.objects.filter(product_id=busiest_product()).order_by('-created_date', '-id')[:21]
+
+
+def busiest_product():
+    return (
+        ProductComment.objects.values('product_id')
+        .annotate(comments=Count('id'))
+        .order_by('-comments')
+        .values_list('product_id', flat=True)
+        .first()
+    )
+
+
+@hot_query('product_comments_deep_page', 'products_productcomment', indexes=['comment_product_created_idx'])
+def product_comments_deep_page():
+    return deep_page(
+        ProductComment.objects.filter(product_id=busiest_product()), CommentPagination.orderings['newest']
+    )
+
+
+@hot_query('comment_thread_replies', 'products_productcomment')
+def comment_thread_replies():
+    root_ids = list(
+        ProductComment.objects.filter(parent__isnull=True).values_list('pk', flat=True)[:20]
+    )
+    return ProductComment.objects.filter(root__in=root_ids, depth__lte=10)
@@ -0,0 +1,68 @@
+"""
+Time-decayed popularity ranking. A visit at time ``t`` weighs
+``2 ** ((t - now) / HALF_LIFE)``; ``ProductRanking.score`` stores the log2 of
+a product's summed weights at the unix epoch instead of at ``now``, so every
+score decays by the same factor and the ordering stays valid without ever
+rewriting old rows. Each refresh merges only the visits since the newest
+``last_visit_at`` into the table.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Product, ProductRanking, VisitedProduct
+
+
+DEFAULTS = {
+    'HALF_LIFE': 7 * 24 * 60 * 60,
+    # visits newer than this may still be in uncommitted transactions, they wait for the next refresh
+    'LAG': 60,
+}
+
+# keeps power(2, x) clear of double precision underflow, 2 ** -1000 is already negligible
+MIN_EXPONENT = -1000
+
+REFRESH_SQL = f'''
+INSERT INTO {ProductRanking._meta.db_table} AS ranking (product_id, category_id, score, last_visit_at)
+SELECT visits.product_id, product.category_id,
+       visits.peak + ln(sum(power(2, greatest(visits.weight - visits.peak, {MIN_EXPONENT})))) / ln(2),
+       max(visits.visited_date)
+FROM (
+    SELECT product_id, visited_date,
+           extract(epoch FROM visited_date)::float8 / %(half_life)s AS weight,
+           max(extract(epoch FROM visited_date)::float8 / %(half_life)s)
+               OVER (PARTITION BY product_id) AS peak
+    FROM {VisitedProduct._meta.db_table}
+    WHERE visited_date > %(since)s AND visited_date <= %(until)s
+) visits
+JOIN {Product._meta.db_table} product ON product.id = visits.product_id
+GROUP BY visits.product_id, product.category_id, visits.peak
+ON CONFLICT (product_id) DO UPDATE SET
+    score = greatest(ranking.score, EXCLUDED.score)
+        + ln(1 + power(2, greatest(-abs(ranking.score - EXCLUDED.score), {MIN_EXPONENT}))) / ln(2),
+    category_id = EXCLUDED.category_id,
+    last_visit_at = greatest(ranking.last_visit_at, EXCLUDED.last_visit_at)
+'''
+
+
+def get_ranking_options():
+    return {**DEFAULTS, **getattr(settings, 'PRODUCT_RANKING', {})}
+
+
+def refresh_ranking(until=None):
+    """Merge the visits since the last refresh, returns the number of products updated."""
+    options = get_ranking_options()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # concurrent refreshes would merge the same visits twice, readers are not blocked
+        cursor.execute(f'LOCK TABLE {ProductRanking._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        since = ProductRanking.objects.aggregate(last=Max('last_visit_at'))['last']
+        cursor.execute(REFRESH_SQL, {
+            'half_life': options['HALF_LIFE'],
+            'since': since or datetime(1970, 1, 1, tzinfo=dt_timezone.utc),
+            'until': until or timezone.now() - timedelta(seconds=options['LAG']),
+        })
+        return cursor.rowcount
+
@@ -0,0 +1,117 @@
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+)
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+
+
+# Persian has no stemming dictionary in PostgreSQL, 'simple' only lowercases
+SEARCH_CONFIG = 'simple'
+# broad terms match a large part of the catalog, only this many title matches
+# and as many other matches are ranked
+RANK_CANDIDATES = 1000
+MAX_CORRECTED_WORDS = 5
+
+
+def product_search_vector():
+    """
+    Expression computing ``Product.search_vector`` from the product row and
+    its category and brand, usable in ``QuerySet.update()``.
+    """
+    from .models import Category, Brand
+
+    category_title = Category.objects.filter(pk=OuterRef('category_id')).values('title')[:1]
+    brand_name = Brand.objects.filter(pk=OuterRef('brand_id')).values('name')[:1]
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(category_title), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(brand_name), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search_index(queryset):
+    """
+    Recompute the search vectors of ``queryset`` and add their words to the
+    ``SearchTerm`` dictionary used for spelling correction.
+    """
+    from .models import SearchTerm
+
+    queryset.update(search_vector=product_search_vector())
+    sql, params = queryset.values('search_vector').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {SearchTerm._meta.db_table} (word) '
+            f'SELECT DISTINCT word FROM ('
+            f'SELECT unnest(tsvector_to_array(vectors.search_vector)) AS word FROM ({sql}) vectors'
+            f') words '
+            f"WHERE length(word) BETWEEN 3 AND 100 AND word !~ '^[0-9]+$' "
+            f'ON CONFLICT (word) DO NOTHING',
+            params
+        )
+
+
+def correct_spelling(text):
+    """Replace every word of ``text`` with its closest indexed word."""
+    from .models import SearchTerm
+
+    corrected = []
+    for word in text.lower().split()[:MAX_CORRECTED_WORDS]:
+        match = (
+            SearchTerm.objects.filter(word__trigram_similar=word)
+            .annotate(similarity=TrigramSimilarity('word', word))
+            .order_by('-similarity', 'word')
+            .values_list('word', flat=True)
+            .first()
+        )
+        corrected.append(match or word)
+    return ' '.join(corrected)
+
+
+def prune_search_terms():
+    """Delete the ``SearchTerm`` words no product contains any more and return how many."""
+    from .models import Product, SearchTerm
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SearchTerm._meta.db_table} terms WHERE NOT EXISTS ('
+            f'SELECT 1 FROM (SELECT DISTINCT unnest(tsvector_to_array(search_vector)) AS word '
+            f'FROM {Product._meta.db_table}) words WHERE words.word = terms.word'
+            f')'
+        )
+        return cursor.rowcount
+
+
+def rank_products(queryset, text, limit):
+    """
+    The ``limit`` best matches of ``text``. Candidates are capped before
+    ranking, title matches come from their own index first so a broad term
+    cannot crowd the best matches out with description matches.
+    """
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    title_candidates = (
+        queryset.annotate(title_vector=SearchVector('title', config=SEARCH_CONFIG))
+        .filter(title_vector=query).values('pk')[:RANK_CANDIDATES]
+    )
+    candidates = queryset.filter(search_vector=query).values('pk')[:RANK_CANDIDATES]
+    return list(
+        # a union, an OR of the two IN lists makes PostgreSQL scan the whole table
+        queryset.model.objects.filter(pk__in=title_candidates.union(candidates))
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank', '-id')[:limit]
+    )
+
+
+def search_products(queryset, text, limit):
+    """
+    Rank full-text matches of ``text``. When nothing matches, every word is
+    replaced by its closest indexed word so typos still find products.
+    """
+    results = rank_products(queryset, text, limit)
+    if results:
+        return results
+
+    corrected = correct_spelling(text)
+    if corrected == ' '.join(text.lower().split()):
+        return []
+    return rank_products(queryset, corrected, limit)
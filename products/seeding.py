@@ -0,0 +1,275 @@
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Case, F, IntegerField, Max, Min, When
+from django.utils import timezone
+from accounts.models import OutboundEmail
+from .search import refresh_search_index
+from .ranking import refresh_ranking
+from .models import (
+    Category, Brand, Product,
+    Cart, CartItem,
+    VisitedProduct, ProductDailyVisits, ProductComment
+)
+
+User = get_user_model()
+
+
+DEFAULT_VOLUMES = {
+    'categories': 20,
+    'brands': 50,
+    'products': 5000,
+    'users': 500,
+    'carts': 2000,
+    'visits': 20000,
+    'daily_visits': 50000,
+    'comments': 5000,
+    'emails': 20000,
+}
+
+SEED_PASSWORD = 'seed-password'
+
+NOUNS = [
+    'phone', 'laptop', 'tablet', 'monitor', 'keyboard', 'mouse', 'camera',
+    'headphone', 'speaker', 'watch', 'charger', 'router', 'printer', 'console',
+    'گوشی', 'لپتاپ', 'تبلت', 'مانیتور', 'هدفون', 'ساعت', 'دوربین', 'اسپیکر',
+]
+ADJECTIVES = [
+    'wireless', 'portable', 'gaming', 'smart', 'compact', 'professional', 'classic',
+    'ultra', 'mini', 'pro', 'بی‌سیم', 'هوشمند', 'حرفه‌ای', 'کلاسیک', 'جدید',
+]
+SYLLABLES = ['ka', 'ro', 'mi', 'tel', 'vo', 'zen', 'ar', 'lux', 'nor', 'pi', 'sa', 'dex']
+
+
+class Seeder:
+    """
+    Generates a synthetic catalog with bulk inserts. Every run uses a random
+    prefix for unique columns so several runs can share a database.
+    """
+
+    def __init__(self, batch_size=1000, seed=None):
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.prefix = uuid.uuid4().hex[:8]
+        # a long tail of made-up words so text search sees a realistic vocabulary
+        self.words = [
+            ''.join(self.random.choices(SYLLABLES, k=self.random.randint(2, 4)))
+            for _ in range(5000)
+        ]
+
+    def seed(self, **volumes):
+        volumes = {**DEFAULT_VOLUMES, **volumes}
+        categories = self.create_categories(volumes['categories'])
+        brands = self.create_brands(volumes['brands'])
+        products = self.create_products(volumes['products'], categories, brands)
+        users = self.create_users(volumes['users'])
+        carts = self.create_carts(volumes['carts'], users, products)
+        visits = self.create_visits(volumes['visits'], users, products)
+        daily_visits = self.create_daily_visits(volumes['daily_visits'], products)
+        comments = self.create_comments(volumes['comments'], users, products)
+        emails = self.create_emails(volumes['emails'], users)
+        return {
+            'categories': len(categories),
+            'brands': len(brands),
+            'products': len(products),
+            'users': len(users),
+            'carts': len(carts),
+            'visits': visits,
+            'daily_visits': len(daily_visits),
+            'comments': len(comments),
+            'emails': len(emails),
+        }
+
+    def create_categories(self, count):
+        return Category.objects.bulk_create([
+            Category(
+                title=f'{NOUNS[i % len(NOUNS)]} {i}',
+                slug=f'{self.prefix}-category-{i}',
+                description='seeded category',
+            )
+            for i in range(count)
+        ], batch_size=self.batch_size)
+
+    def create_brands(self, count):
+        return Brand.objects.bulk_create([
+            Brand(name=f'brand {i}', slug=f'{self.prefix}-brand-{i}')
+            for i in range(count)
+        ], batch_size=self.batch_size)
+
+    def create_products(self, count, categories, brands):
+        if not categories or not brands:
+            return []
+        statuses = ['available'] * 8 + ['unavailable', 'limited']
+        products = Product.objects.bulk_create([
+            Product(
+                title=self.product_title(i),
+                slug=f'{self.prefix}-product-{i}',
+                description=' '.join(self.word() for _ in range(12)),
+                price=Decimal(self.random.randint(1, 5000) * 1000),
+                category=self.random.choice(categories),
+                brand=self.random.choice(brands),
+                status=self.random.choice(statuses),
+                inventory=self.random.randint(0, 100),
+                views_count=int(self.random.paretovariate(1.2)) - 1,
+                is_popular=self.random.random() < 0.1,
+            )
+            for i in range(count)
+        ], batch_size=self.batch_size)
+        refresh_search_index(Product.objects.filter(slug__startswith=f'{self.prefix}-product-'))
+        return products
+
+    def product_title(self, i):
+        return f'{self.random.choice(ADJECTIVES)} {self.random.choice(NOUNS)} {self.word()} {i}'
+
+    def word(self):
+        # Zipf-like: a few words are very common, most are rare
+        index = int(self.random.paretovariate(1.0)) - 1
+        return self.words[index % len(self.words)]
+
+    def create_users(self, count):
+        password = make_password(SEED_PASSWORD)
+        return User.objects.bulk_create([
+            User(
+                username=f'{self.prefix}-user-{i}',
+                email=f'{self.prefix}-user-{i}@example.com',
+                password=password,
+                is_active=True,
+            )
+            for i in range(count)
+        ], batch_size=self.batch_size)
+
+    def create_carts(self, count, users, products):
+        if not users or not products:
+            return []
+        carts = Cart.objects.bulk_create([
+            Cart(user=users[i % len(users)], is_paid=i >= len(users))
+            for i in range(count)
+        ], batch_size=self.batch_size)
+        now = timezone.now()
+        stock = {product.pk: product.inventory for product in products}
+        items = []
+        for cart in carts:
+            for product in self.random.sample(products, min(len(products), self.random.randint(1, 5))):
+                quantity = self.random.randint(1, 3)
+                # open carts hold reservations, some of them already expired
+                reserved = not cart.is_paid
+                if reserved:
+                    # reserved units are out of the inventory, as add_to_cart leaves them
+                    quantity = min(quantity, stock[product.pk])
+                    if not quantity:
+                        continue
+                    stock[product.pk] -= quantity
+                items.append(CartItem(
+                    cart=cart,
+                    product=product,
+                    quantity=quantity,
+                    reserved_quantity=quantity if reserved else 0,
+                    reserved_until=now + timedelta(minutes=self.random.randint(-2, 15)) if reserved else None,
+                ))
+        CartItem.objects.bulk_create(items, batch_size=self.batch_size)
+        Cart.objects.filter(pk__in=[cart.pk for cart in carts]).update_totals()
+        changed = [product.pk for product in products if stock[product.pk] != product.inventory]
+        if changed:
+            Product.objects.filter(pk__in=changed).update(inventory=Case(*[
+                When(pk=pk, then=stock[pk]) for pk in changed
+            ], output_field=IntegerField()))
+        return carts
+
+    def create_visits(self, count, users, products):
+        if not products:
+            return 0
+        last_id = VisitedProduct.objects.aggregate(last=Max('id'))['last'] or 0
+        visits = []
+        for i in range(count):
+            user = self.random.choice(users) if users and self.random.random() < 0.3 else None
+            # half of the traffic goes to a few hot products
+            if i % 2:
+                product = products[(int(self.random.paretovariate(1.2)) - 1) % len(products)]
+            else:
+                product = self.random.choice(products)
+            visits.append(VisitedProduct(
+                product=product,
+                user=user,
+                user_ip=f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}',
+            ))
+        VisitedProduct.objects.bulk_create(visits, batch_size=self.batch_size)
+        # spread the visits over the last 30 days in insertion order, as real traffic arrives
+        inserted = VisitedProduct.objects.filter(id__gt=last_id)
+        span = inserted.aggregate(first=Min('id'), last=Max('id'))
+        if span['first'] is not None:
+            inserted.update(
+                visited_date=timezone.now()
+                - timedelta(days=30) * (span['last'] - F('id')) / (span['last'] - span['first'] + 1)
+            )
+        refresh_ranking()
+        return len(visits)
+
+    def create_daily_visits(self, count, products):
+        if not products:
+            return []
+        # rollups of the days before the raw visit window, one row per product and day
+        first_day = timezone.localdate() - timedelta(days=31)
+        rows = []
+        for i in range(count):
+            visits = int(self.random.paretovariate(1.2))
+            rows.append(ProductDailyVisits(
+                product=products[i % len(products)],
+                date=first_day - timedelta(days=i // len(products)),
+                visits=visits,
+                visitors=max(visits - self.random.randint(0, 2), 1),
+            ))
+        return ProductDailyVisits.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def create_comments(self, count, users, products):
+        if not users or not products:
+            return []
+        # half of the discussion happens on the top 1% of products
+        hot_products = products[:max(len(products) // 100, 1)]
+        roots = ProductComment.objects.bulk_create([
+            ProductComment(
+                product=self.random.choice(hot_products if i % 2 else products),
+                user=self.random.choice(users),
+                text=f'comment {i}',
+            )
+            for i in range(count // 2 or count)
+        ], batch_size=self.batch_size)
+
+        # each level replies to half of the previous level, up to the requested total
+        comments, parents = list(roots), roots
+        remaining = count - len(roots)
+        while remaining > 0:
+            level = []
+            for _ in range(min(remaining, max(len(parents) // 2, 1))):
+                parent = self.random.choice(parents)
+                level.append(ProductComment(
+                    product_id=parent.product_id,
+                    user=self.random.choice(users),
+                    text=f'reply to {parent.pk}',
+                    parent=parent,
+                    root_id=parent.root_id or parent.pk,
+                    depth=parent.depth + 1,
+                ))
+            parents = ProductComment.objects.bulk_create(level, batch_size=self.batch_size)
+            comments += parents
+            remaining -= len(parents)
+        return comments
+
+    def create_emails(self, count, users):
+        if not users:
+            return []
+        now = timezone.now()
+        # a worker keeps the queue short, almost every row is history
+        return OutboundEmail.objects.bulk_create([
+            OutboundEmail(
+                subject='seeded email',
+                body='seeded email',
+                to=[self.random.choice(users).email],
+                status='pending' if i % 100 == 0 else 'sent',
+                next_attempt_at=now - timedelta(minutes=self.random.randint(0, 60 * 24 * 30)),
+            )
+            for i in range(count)
+        ], batch_size=self.batch_size)
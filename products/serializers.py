@@ -1,11 +1,92 @@
-from rest_framework import serializers
+import functools
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import (
     Category, Brand, Product, Banners, 
-    Cart, CartItem, 
+    Cart, CartItem, Order, OrderItem,
     VisitedProduct, ProductComment
 )
+from .images import derivative_urls, derivatives_storage
+
+
+
+class ImageDerivativesField(serializers.ReadOnlyField):
+    """URLs of the resized copies of an image, ``{size: {format: url}}``."""
+
+    @functools.cached_property
+    def storage(self):
+        return derivatives_storage(self.parent.Meta.model, self.source)
+
+    def to_representation(self, value):
+        return derivative_urls(self.storage, value, self.context.get('request'))
+
+
+def file_url(storage, request, name):
+    # FileField.to_representation for a file name instead of a FieldFile
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def iso_datetime(tz, value):
+    # DateTimeField.to_representation with the current timezone looked up once
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
 
 
+class ValuesSerializer(serializers.BaseSerializer):
+    """
+    Read-only ``Meta.serializer`` for list endpoints. It renders rows of
+    ``rows(queryset)``, the ``.values()`` of the serializer's fields, and
+    converts only the columns whose JSON is not the database value, so reads
+    build no model instances and run no field per attribute. The output is
+    the same as ``Meta.serializer``'s.
+    """
+    # fields that return database values as they are
+    plain_fields = (
+        serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+        serializers.ChoiceField, serializers.PrimaryKeyRelatedField,
+    )
+
+    @classmethod
+    def rows(cls, queryset):
+        return queryset.values(*cls.Meta.serializer.Meta.fields)
+
+    @functools.cached_property
+    def converters(self):
+        request = self.context.get('request')
+        model = self.Meta.serializer.Meta.model
+        converters = []
+        for name, field in self.Meta.serializer().fields.items():
+            if isinstance(field, self.plain_fields):
+                continue
+            if isinstance(field, ImageDerivativesField):
+                convert = functools.partial(derivative_urls, field.storage, request=request)
+            elif isinstance(field, serializers.FileField):
+                convert = functools.partial(file_url, model._meta.get_field(name).storage, request)
+            elif (
+                isinstance(field, serializers.DateTimeField) and settings.USE_TZ
+                and not hasattr(field, 'timezone')
+                and getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() == ISO_8601
+            ):
+                convert = functools.partial(iso_datetime, timezone.get_current_timezone())
+            else:
+                convert = field.to_representation
+            converters.append((name, convert))
+        return converters
+
+    def to_representation(self, row):
+        # a copy, paginators still read the raw values of the page
+        data = dict(row)
+        for name, convert in self.converters:
+            if data[name] is not None:
+                data[name] = convert(data[name])
+        return data
+
 
 class CategorySerializer(serializers.ModelSerializer):        
     class Meta:
@@ -13,10 +94,17 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'slug', 'description', 'is_active']
 
 
+class CategoryValuesSerializer(ValuesSerializer):
+    class Meta:
+        serializer = CategorySerializer
+
+
 class BrandSerializer(serializers.ModelSerializer):
+    logo_derivatives = ImageDerivativesField()
+
     class Meta:
         model = Brand
-        fields = ['id', 'name', 'slug', 'logo']
+        fields = ['id', 'name', 'slug', 'logo', 'logo_derivatives']
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -30,13 +118,15 @@ class ProductSerializer(serializers.ModelSerializer):
         required=False, 
         allow_null=True
     )
+    image_derivatives = ImageDerivativesField()
+
     class Meta:
         model = Product
         fields = [
             'id', 'title', 'slug', 'description', 
             'price', 'category', 
             'brand', 'status', 'inventory', 
-            'image', 'views_count', 'is_popular', 
+            'image', 'image_derivatives', 'views_count', 'is_popular', 
             'created_at', 'updated_at',
         ]
     
@@ -51,10 +141,36 @@ class ProductSerializer(serializers.ModelSerializer):
         return value
 
 
+class ProductValuesSerializer(ValuesSerializer):
+    class Meta:
+        serializer = ProductSerializer
+
+
+class ProductSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    category = serializers.IntegerField(required=False)
+    brand = serializers.IntegerField(required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=0, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=0, required=False)
+    status = serializers.ChoiceField(choices=Product.STATUS_CHOICES, default='available')
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class PopularProductsSerializer(serializers.Serializer):
+    category = serializers.IntegerField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class VisitStatsSerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=1, max_value=365, default=30)
+
+
 class BannerSerializer(serializers.ModelSerializer):
+    image_derivatives = ImageDerivativesField()
+
     class Meta:
         model = Banners
-        fields = ['id', 'title', 'url', 'image', 'position', 'is_active']
+        fields = ['id', 'title', 'url', 'image', 'image_derivatives', 'position', 'is_active']
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -77,18 +193,25 @@ class CartItemSerializer(serializers.ModelSerializer):
     
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField()
-    total_items = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
         fields = ['id', 'items', 'total_price', 'total_items', 'is_paid']
+        read_only_fields = ['total_price', 'total_items']
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'title', 'price', 'quantity']
+
 
-    def get_total_price(self, obj):
-        return obj.total_price()
+class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
 
-    def get_total_items(self, obj):
-        return obj.total_items()
+    class Meta:
+        model = Order
+        fields = ['id', 'cart', 'items', 'total_price', 'total_items', 'created_at']
 
 
 class VisitedProductSerializer(serializers.ModelSerializer):
@@ -105,4 +228,25 @@ class ProductCommentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'product', 'parent', 'user', 
             'created_date', 'text'
-        ]
\ No newline at end of file
+        ]
+        read_only_fields = ['product']
+
+    def validate_parent(self, value):
+        # root and depth are set when the comment is created, a reply stays in its thread
+        if self.instance is not None and value != self.instance.parent:
+            raise serializers.ValidationError("پاسخ را نمی‌توان به نظر دیگری منتقل کرد")
+        return value
+
+
+class ProductCommentThreadSerializer(ProductCommentSerializer):
+    replies = serializers.SerializerMethodField()
+
+    class Meta(ProductCommentSerializer.Meta):
+        fields = ProductCommentSerializer.Meta.fields + ['depth', 'replies']
+
+    def get_replies(self, obj):
+        return ProductCommentThreadSerializer(
+            getattr(obj, 'thread_replies', []),
+            many=True,
+            context=self.context
+        ).data
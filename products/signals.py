@@ -0,0 +1,61 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Product, Category, Brand, Cart, CartItem, ProductRanking
+from . import cache
+from .inventory import release
+from .search import refresh_search_index
+
+
+@receiver(post_save, sender=Product)
+def move_ranking_to_category(sender, instance, created, **kwargs):
+    if not created:
+        ProductRanking.objects.filter(product=instance).exclude(
+            category_id=instance.category_id
+        ).update(category_id=instance.category_id)
+
+
+@receiver(post_save, sender=Product)
+def refresh_cart_totals(sender, instance, created, **kwargs):
+    if not created:
+        Cart.objects.filter(is_paid=False, items__product=instance).update_totals()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_index(sender, instance, **kwargs):
+    refresh_search_index(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_search_index(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_index(Product.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Brand)
+def refresh_brand_search_index(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_index(Product.objects.filter(brand=instance))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    cache.invalidate('products', 'popular', f'product:{instance.pk}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    cache.invalidate('categories', 'products', 'popular')
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_brand_cache(sender, instance, **kwargs):
+    cache.invalidate('products', 'popular')
+
+
+@receiver(post_delete, sender=CartItem)
+def release_reserved_inventory(sender, instance, **kwargs):
+    if instance.reserved_quantity:
+        release({instance.product_id: instance.reserved_quantity})
@@ -0,0 +1,94 @@
+"""
+Slugs for catalog models. ``SlugMixin`` fills ``slug`` from ``slug_source``
+when it is empty and refreshes it only when the source changed and the slug
+was not edited alongside it, so saves that touch other fields never look
+at slugs. Collisions get the lowest free ``-<n>`` suffix, found with one
+prefix query on the slug index for any number of titles; a save that loses
+its slug to a concurrent one looks it up again.
+"""
+import functools
+import operator
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+# longest suffix a slug may need, ``-9999999``
+SUFFIX_ROOM = 8
+# saves that lose the slug to a concurrent save look it up again this many times
+SLUG_ATTEMPTS = 3
+
+
+def make_slug(value, max_length):
+    # allow_unicode keeps Persian titles, the ASCII slugify drops them to empty strings
+    return slugify(value, allow_unicode=True)[:max_length].strip('-')
+
+
+def unique_slugs(model, values, exclude_pk=None):
+    """Slugs for ``values`` in order, unique against the table and each other."""
+    max_length = model._meta.get_field('slug').max_length
+    bases = [make_slug(value, max_length) or model._meta.model_name for value in values]
+    if not bases:
+        return []
+
+    # every candidate of a base starts with its first max_length - SUFFIX_ROOM characters
+    stem_length = max_length - SUFFIX_ROOM
+    stems = {base[:stem_length] for base in bases}
+    taken = model._base_manager.filter(
+        functools.reduce(operator.or_, (Q(slug__startswith=stem) for stem in stems))
+    )
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+    taken = set(taken.values_list('slug', flat=True))
+
+    slugs = []
+    for base in bases:
+        slug, n = base, 1
+        while slug in taken:
+            n += 1
+            suffix = f'-{n}'
+            head = base[:max_length - len(suffix)]
+            # trailing hyphens go, the stem stays, the query above only saw slugs starting with it
+            slug = head[:stem_length] + head[stem_length:].rstrip('-') + suffix
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+class SlugMixin:
+    slug_source = 'title'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.slug_source in instance.__dict__ and 'slug' in instance.__dict__:
+            instance._loaded_slug = (instance.__dict__[cls.slug_source], instance.slug)
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {self.slug_source, 'slug'} & set(update_fields):
+            return super().save(*args, **kwargs)
+
+        source = getattr(self, self.slug_source)
+        loaded_source, loaded_slug = getattr(self, '_loaded_slug', (source, None))
+        if not self.slug or (source != loaded_source and self.slug == loaded_slug):
+            self.slug = unique_slugs(type(self), [source], exclude_pk=self.pk)[0]
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'slug'}
+            self._save_with_new_slug(source, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._loaded_slug = (source, self.slug)
+
+    def _save_with_new_slug(self, source, *args, **kwargs):
+        for attempt in range(SLUG_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # a concurrent save took the slug after unique_slugs looked, unless another constraint failed
+                taken = type(self)._base_manager.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if not taken or attempt == SLUG_ATTEMPTS - 1:
+                    raise
+                self.slug = unique_slugs(type(self), [source], exclude_pk=self.pk)[0]
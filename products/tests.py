@@ -1,3 +1,1188 @@
-from django.test import TestCase
+import json
+import math
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from core.metrics import reset_metrics
+from core.query_plans import plan_nodes
+from .models import (
+    Category, Brand, Product, VisitedProduct, Cart, CartItem, ProductComment, ProductRanking,
+    ProductDailyVisits, Order, SearchTerm
+)
+from .view_tracking import get_view_tracker, reset_view_tracker
+from .cache import get_stats
+from .pagination import ProductPagination
+from .inventory import InsufficientInventory, add_to_cart, checkout, release_expired
+from .ranking import refresh_ranking
+from .visit_history import compact_visits, purge_rollups
+from .images import generate_pending
+from .slugs import unique_slugs
+from .seeding import Seeder
+from . import catalog_io
+from .serializers import CategorySerializer, ProductSerializer
 
-# Create your tests here.
+User = get_user_model()
+
+
+class ProductTestMixin:
+    def create_product(self, title='phone', **kwargs):
+        if not hasattr(self, 'category'):
+            self.category = Category.objects.create(title='mobile')
+            self.brand = Brand.objects.create(name='samsung')
+        kwargs.setdefault('price', 1000)
+        kwargs.setdefault('description', 'description')
+        kwargs.setdefault('category', self.category)
+        kwargs.setdefault('brand', self.brand)
+        return Product.objects.create(title=title, **kwargs)
+
+
+@override_settings(PRODUCT_VIEW_TRACKING={'FLUSH_INTERVAL': None, 'FLUSH_THRESHOLD': 100})
+class ViewTrackingTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_view_tracker()
+        self.product = self.create_product()
+        self.url = reverse('products-view-product', args=[self.product.pk])
+
+    def test_repeated_views_are_counted_once_per_day(self):
+        first = self.client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        second = self.client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        self.client.get(self.url, REMOTE_ADDR='10.0.0.2')
+
+        self.assertTrue(first.data['is_new_view'])
+        self.assertFalse(second.data['is_new_view'])
+        self.assertEqual(get_view_tracker().pending, 2)
+
+    def test_views_are_buffered_until_flush(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        self.client.get(self.url, REMOTE_ADDR='10.0.0.2')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views_count, 0)
+
+        call_command('flush_product_views', stdout=StringIO())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views_count, 2)
+        self.assertEqual(VisitedProduct.objects.filter(product=self.product).count(), 2)
+
+    @override_settings(PRODUCT_VIEW_TRACKING={'FLUSH_INTERVAL': None, 'FLUSH_THRESHOLD': 2})
+    def test_threshold_triggers_flush(self):
+        self.client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        self.client.get(self.url, REMOTE_ADDR='10.0.0.2')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views_count, 2)
+        self.assertEqual(get_view_tracker().pending, 0)
+
+
+class CartTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'secret', is_active=True)
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = self.create_product(price=1000, inventory=10)
+
+    def add_items(self, count):
+        start = self.cart.items.count()
+        for i in range(start, start + count):
+            product = self.create_product(title=f'product {i}', price=500)
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        self.cart.update_totals()
+
+    def test_cart_list_query_count_is_constant(self):
+        self.add_items(1)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('carts-list'))
+
+        self.add_items(20)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('carts-list'))
+        self.assertEqual(len(response.data[0]['items']), 21)
+
+    def test_item_actions_maintain_totals(self):
+        url = reverse('carts-add-item', args=[self.cart.pk])
+        response = self.client.post(url, {'product_id': self.product.pk, 'quantity': 2}, format='json')
+        self.client.post(url, {'product_id': self.product.pk, 'quantity': 1}, format='json')
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_items, self.cart.total_price), (3, 3000))
+
+        self.client.post(
+            reverse('carts-update-item-quantity', args=[self.cart.pk]),
+            {'cart_item_id': response.data['id'], 'quantity': 5}, format='json'
+        )
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_items, self.cart.total_price), (5, 5000))
+
+        self.client.post(
+            reverse('carts-remove-item', args=[self.cart.pk]),
+            {'cart_item_id': response.data['id']}, format='json'
+        )
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_items, self.cart.total_price), (0, 0))
+
+    def test_price_change_updates_open_carts(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=3)
+        self.product.price = 2000
+        self.product.save()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_price, 6000)
+
+
+class InventoryReservationTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'secret', is_active=True)
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = self.create_product(inventory=5)
+
+    def post(self, name, data):
+        return self.client.post(reverse(name, args=[self.cart.pk]), data, format='json')
+
+    def assertInventory(self, expected):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory, expected)
+
+    def test_cart_actions_reserve_and_return_stock(self):
+        response = self.post('carts-add-item', {'product_id': self.product.pk, 'quantity': 3})
+        item_id = response.data['id']
+        self.assertInventory(2)
+
+        response = self.post('carts-add-item', {'product_id': self.product.pk, 'quantity': 3})
+        self.assertEqual(response.status_code, 400)
+        self.assertInventory(2)
+
+        self.post('carts-update-item-quantity', {'cart_item_id': item_id, 'quantity': 5})
+        self.assertInventory(0)
+        self.post('carts-update-item-quantity', {'cart_item_id': item_id, 'quantity': 1})
+        self.assertInventory(4)
+        self.post('carts-remove-item', {'cart_item_id': item_id})
+        self.assertInventory(5)
+
+    def test_stock_changes_invalidate_cached_products(self):
+        cache.clear()
+        url = reverse('products-detail', args=[self.product.pk])
+        self.assertEqual(self.client.get(url).data['inventory'], 5)
+        list_etag = self.client.get(reverse('products-list'))['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post('carts-add-item', {'product_id': self.product.pk, 'quantity': 2})
+        self.assertEqual(self.client.get(url).data['inventory'], 3)
+        # lists stay cached, carts change stock all the time
+        self.assertEqual(self.client.get(reverse('products-list'))['ETag'], list_etag)
+
+        CartItem.objects.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('release_expired_reservations', stdout=StringIO())
+        self.assertEqual(self.client.get(url).data['inventory'], 5)
+
+    def test_invalid_requests(self):
+        response = self.post('carts-add-item', {'product_id': self.product.pk, 'quantity': 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.post('carts-add-item', {'quantity': 1})
+        self.assertEqual(response.status_code, 404)
+        self.product.status = 'unavailable'
+        self.product.save()
+        response = self.post('carts-add-item', {'product_id': self.product.pk})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(self.cart.items.exists())
+
+    def test_expired_reservations_are_released(self):
+        self.post('carts-add-item', {'product_id': self.product.pk, 'quantity': 2})
+        paid = Cart.objects.create(user=self.user, is_paid=True)
+        CartItem.objects.create(cart=paid, product=self.product, reserved_quantity=1)
+        CartItem.objects.update(reserved_until=timezone.now() - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command('release_expired_reservations', stdout=out)
+        self.assertIn('1 expired reservations released', out.getvalue())
+        self.assertInventory(5)
+
+        # the item stays in the cart and reserves its stock again when changed
+        item = self.cart.items.get()
+        self.assertEqual((item.quantity, item.reserved_quantity), (2, 0))
+        self.post('carts-update-item-quantity', {'cart_item_id': item.pk, 'quantity': 2})
+        self.assertInventory(3)
+
+
+class CheckoutTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'secret', is_active=True)
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.phone = self.create_product(price=1000, inventory=5)
+        self.case = self.create_product(title='case', price=200, inventory=5)
+        self.url = reverse('carts-checkout', args=[self.cart.pk])
+
+    def add(self, product, quantity):
+        return self.client.post(
+            reverse('carts-add-item', args=[self.cart.pk]),
+            {'product_id': product.pk, 'quantity': quantity}, format='json'
+        )
+
+    def test_checkout_sells_reserved_units_at_current_prices(self):
+        self.add(self.phone, 2)
+        self.add(self.case, 3)
+        Product.objects.filter(pk=self.phone.pk).update(price=1500)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['total_items'], response.data['total_price']), (5, '3600'))
+        self.assertEqual(
+            sorted((item['title'], item['price'], item['quantity']) for item in response.data['items']),
+            [('case', '200', 3), ('phone', '1500', 2)]
+        )
+
+        self.cart.refresh_from_db()
+        self.assertTrue(self.cart.is_paid)
+        self.assertFalse(self.cart.items.filter(reserved_quantity__gt=0).exists())
+        # the units were taken when reserved, releasing expired reservations returns nothing
+        call_command('release_expired_reservations', stdout=StringIO())
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('inventory', flat=True)), [3, 2]
+        )
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_reservations_are_taken_again(self):
+        self.add(self.phone, 2)
+        self.add(self.case, 4)
+        CartItem.objects.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        call_command('release_expired_reservations', stdout=StringIO())
+        Product.objects.filter(pk=self.case.pk).update(inventory=3)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('inventory', flat=True)), [5, 3]
+        )
+
+        Product.objects.filter(pk=self.case.pk).update(inventory=4)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('inventory', flat=True)), [3, 0]
+        )
+
+    def test_empty_cart(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 400)
+        self.cart.refresh_from_db()
+        self.assertFalse(self.cart.is_paid)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'row locks need PostgreSQL')
+class ConcurrentReservationTests(ProductTestMixin, TransactionTestCase):
+    def test_concurrent_buyers_never_oversell(self):
+        product = self.create_product(inventory=4)
+        carts = [
+            Cart.objects.create(user=User.objects.create_user(f'buyer{i}', f'buyer{i}@example.com'))
+            for i in range(8)
+        ]
+        barrier = threading.Barrier(len(carts))
+        results = []
+
+        def buy(cart):
+            barrier.wait()
+            try:
+                add_to_cart(cart, product.pk, 1)
+                results.append(True)
+            except InsufficientInventory:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(cart,)) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count(True), 4)
+        self.assertEqual(product.inventory, 0)
+        self.assertEqual(CartItem.objects.count(), 4)
+
+    def test_concurrent_checkouts_lock_products_in_order(self):
+        products = [self.create_product(title=f'product {i}', inventory=6) for i in range(3)]
+        carts = []
+        for i in range(8):
+            cart = Cart.objects.create(user=User.objects.create_user(f'buyer{i}', f'buyer{i}@example.com'))
+            # half the carts list the products the other way round
+            for product in products if i % 2 else products[::-1]:
+                CartItem.objects.create(cart=cart, product=product, quantity=1)
+            carts.append(cart)
+        barrier = threading.Barrier(len(carts))
+        results = []
+
+        def buy(cart):
+            barrier.wait()
+            try:
+                checkout(cart)
+                results.append(True)
+            except InsufficientInventory:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(cart,)) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 6)
+        self.assertEqual(Order.objects.count(), 6)
+        self.assertEqual(Cart.objects.filter(is_paid=True).count(), 6)
+        self.assertEqual(set(Product.objects.values_list('inventory', flat=True)), {0})
+
+@skipUnless(connection.vendor == 'postgresql', 'the ranking refresh is PostgreSQL SQL')
+@override_settings(PRODUCT_RANKING={'HALF_LIFE': 7 * 24 * 60 * 60, 'LAG': 60})
+class PopularRankingTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('products-popular-products')
+        self.old = self.create_product(title='old hit')
+        self.recent = self.create_product(title='recent')
+        self.other = self.create_product(title='other', category=Category.objects.create(title='laptop'))
+        self.visit(self.old, days_ago=30, count=3)
+        self.visit(self.recent, days_ago=1)
+        self.visit(self.other, days_ago=2, count=2)
+
+    def visit(self, product, days_ago, count=1):
+        start = VisitedProduct.objects.count()
+        VisitedProduct.objects.bulk_create([
+            VisitedProduct(product=product, user_ip=f'10.0.0.{start + i}') for i in range(count)
+        ])
+        VisitedProduct.objects.filter(product=product, user_ip__in=[
+            f'10.0.0.{start + i}' for i in range(count)
+        ]).update(visited_date=timezone.now() - timedelta(days=days_ago))
+
+    def titles(self, **params):
+        cache.clear()
+        return [item['title'] for item in self.client.get(self.url, params).data]
+
+    def test_recent_visits_outrank_old_ones(self):
+        self.assertEqual(refresh_ranking(), 3)
+        # 2 visits 2 days ago > 1 visit yesterday > 3 visits a month ago
+        self.assertEqual(self.titles(), ['other', 'recent', 'old hit'])
+        self.assertEqual(self.titles(category=self.category.pk), ['recent', 'old hit'])
+        self.assertEqual(self.titles(page_size=1), ['other'])
+
+    def test_refresh_is_incremental(self):
+        refresh_ranking()
+        self.assertEqual(refresh_ranking(), 0)
+
+        self.visit(self.old, days_ago=0.5, count=2)
+        # visits inside the lag window wait for a later refresh
+        self.visit(self.recent, days_ago=0)
+        self.assertEqual(refresh_ranking(), 1)
+
+        weights = [
+            visited.timestamp() / (7 * 24 * 60 * 60)
+            for visited in VisitedProduct.objects.filter(product=self.old).values_list('visited_date', flat=True)
+        ]
+        # the same score recomputed from scratch, log2(sum(2 ** weight)) without overflowing
+        expected = max(weights) + math.log2(sum(2 ** (weight - max(weights)) for weight in weights))
+        self.assertAlmostEqual(ProductRanking.objects.get(product=self.old).score, expected)
+        self.assertEqual(self.titles(), ['old hit', 'other', 'recent'])
+
+    def test_ranking_follows_category_changes(self):
+        refresh_ranking()
+        self.other.category = self.category
+        self.other.save()
+        self.assertEqual(self.titles(category=self.category.pk), ['other', 'recent', 'old hit'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'the compaction is PostgreSQL SQL')
+class VisitHistoryTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        self.product = self.create_product()
+        self.visit(days_ago=40, ips=['10.0.0.1', '10.0.0.1', '10.0.0.2'])
+        self.visit(days_ago=35, ips=['10.0.0.3'])
+        self.visit(days_ago=1, ips=['10.0.0.4', '10.0.0.5'])
+
+    def visit(self, days_ago, ips):
+        visits = VisitedProduct.objects.bulk_create([
+            VisitedProduct(product=self.product, user_ip=ip) for ip in ips
+        ])
+        VisitedProduct.objects.filter(pk__in=[visit.pk for visit in visits]).update(
+            visited_date=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_old_days_are_folded_into_rollups(self):
+        refresh_ranking()
+        call_command('compact_visits', stdout=StringIO())
+        self.assertEqual(VisitedProduct.objects.count(), 2)
+        rollups = ProductDailyVisits.objects.order_by('date')
+        self.assertEqual([(r.visits, r.visitors) for r in rollups], [(3, 2), (1, 1)])
+        self.assertEqual(compact_visits(), 0)
+
+    def test_backdated_visits_are_compacted(self):
+        # the newest row holds the oldest visit
+        self.visit(days_ago=50, ips=['10.0.0.6'])
+        refresh_ranking()
+        self.assertEqual(compact_visits(), 5)
+        self.assertEqual(ProductDailyVisits.objects.count(), 3)
+
+    def test_unranked_visits_stay_raw(self):
+        # without rankings no visit has been merged yet
+        self.assertEqual(compact_visits(), 0)
+        # compaction stops at the day of the last visit the ranking has merged
+        refresh_ranking(until=timezone.now() - timedelta(days=38))
+        self.assertEqual(compact_visits(), 0)
+        refresh_ranking(until=timezone.now() - timedelta(days=34))
+        self.assertEqual(compact_visits(), 3)
+        self.assertEqual(VisitedProduct.objects.count(), 3)
+
+    def test_days_are_deleted_in_batches(self):
+        refresh_ranking()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(compact_visits(batch_days=7), 4)
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+        rollups = ProductDailyVisits.objects.order_by('date')
+        self.assertEqual([(r.visits, r.visitors) for r in rollups], [(3, 2), (1, 1)])
+
+    def test_old_rollups_are_purged(self):
+        refresh_ranking()
+        compact_visits()
+        self.assertEqual(purge_rollups(rollup_days=38), 1)
+        self.assertEqual(ProductDailyVisits.objects.get().visits, 1)
+
+    def test_visit_stats_merge_rollups_and_raw_visits(self):
+        url = reverse('products-visit-stats', args=[self.product.pk])
+        self.client.force_authenticate(User.objects.create_user(
+            'buyer', 'buyer@example.com', 'secret', is_active=True
+        ))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        refresh_ranking()
+        compact_visits()
+        self.client.force_authenticate(User.objects.create_user(
+            'admin', 'admin@example.com', 'secret', is_active=True, is_staff=True
+        ))
+        response = self.client.get(url, {'days': 45})
+        self.assertEqual(len(response.data), 45)
+        self.assertEqual(sum(day['visits'] for day in response.data), 6)
+        self.assertEqual(sum(day['visitors'] for day in response.data), 5)
+        self.assertEqual(self.client.get(url, {'days': 0}).status_code, 400)
+
+
+class CatalogCacheTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = self.create_product()
+
+    def test_list_is_served_from_cache(self):
+        url = reverse('products-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(get_stats()['hits'], 1)
+        self.assertEqual(get_stats()['misses'], 1)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.client.get(reverse('products-list'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('products-list'), {'page_size': 5})
+
+    def test_save_invalidates_list_and_detail(self):
+        detail_url = reverse('products-detail', args=[self.product.pk])
+        self.client.get(reverse('products-list'))
+        self.client.get(detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = 'tablet'
+            self.product.save()
+
+        self.assertEqual(self.client.get(detail_url).data['title'], 'tablet')
+        self.assertEqual(self.client.get(reverse('products-list')).data['results'][0]['title'], 'tablet')
+
+    def test_category_change_invalidates_categories(self):
+        url = reverse('categories-active-categories')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(title='laptop')
+        self.assertEqual(len(self.client.get(url).data), 2)
+
+    def test_errors_are_not_cached(self):
+        url = reverse('products-detail', args=[self.product.pk + 1])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(title='tablet')
+        self.assertEqual(product.pk, self.product.pk + 1)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_current_clients_get_not_modified(self):
+        url = reverse('products-detail', args=[self.product.pk])
+        first = self.client.get(url)
+        self.assertIn('no-cache', first['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.content, b'')
+
+    def test_etag_comes_from_the_data(self):
+        url = reverse('products-detail', args=[self.product.pk])
+        first = self.client.get(url)
+        # another worker, or the next rebuild, builds the same entry again
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_stock_changes_reach_revalidating_clients(self):
+        Product.objects.filter(pk=self.product.pk).update(inventory=5)
+        url = reverse('products-detail', args=[self.product.pk])
+        first = self.client.get(url)
+        self.assertNotIn('Last-Modified', first)
+        user = User.objects.create_user('buyer', 'buyer@example.com', 'secret', is_active=True)
+        # updated_at stays as it was
+        with self.captureOnCommitCallbacks(execute=True):
+            add_to_cart(Cart.objects.create(user=user), self.product.pk, 3)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['inventory'], 2)
+
+    def test_changes_invalidate_the_etag(self):
+        url = reverse('categories-detail', args=[self.category.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.title = 'tablet'
+            self.category.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'tablet')
+        self.assertNotEqual(response['ETag'], etag)
+        # other representations of the same data have their own ETag
+        self.assertNotEqual(self.client.get(url, {'format': 'api'})['ETag'], response['ETag'])
+
+
+class PaginationTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [self.create_product(title=f'product {i}', views_count=i % 3) for i in range(7)]
+        # identical timestamps must still produce a stable order through the id tie-breaker
+        Product.objects.filter(pk__in=[p.pk for p in self.products[2:5]]).update(
+            created_at=self.products[2].created_at
+        )
+
+    def collect(self, url, params):
+        titles, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            pages += 1
+            titles += [item['title'] for item in response.data['results']]
+            if not response.data['next']:
+                return titles, pages, response
+            response = self.client.get(response.data['next'])
+
+    def test_walks_every_product_once(self):
+        titles, pages, _ = self.collect(reverse('products-list'), {'page_size': 3})
+        expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('title', flat=True)
+        )
+        self.assertEqual(titles, expected)
+        self.assertEqual(pages, 3)
+
+    def test_popular_ordering(self):
+        titles, _, _ = self.collect(reverse('products-list'), {'page_size': 2, 'ordering': 'popular'})
+        expected = list(
+            Product.objects.order_by('-views_count', '-id').values_list('title', flat=True)
+        )
+        self.assertEqual(titles, expected)
+
+    def test_previous_link_returns_the_previous_page(self):
+        first = self.client.get(reverse('products-list'), {'page_size': 3})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(first.data['previous'])
+
+    def test_page_size_is_bounded(self):
+        with patch.object(ProductPagination, 'max_page_size', 5):
+            response = self.client.get(reverse('products-list'), {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 5)
+
+    @skipUnless(connection.vendor == 'postgresql', 'the plan is PostgreSQL EXPLAIN output')
+    def test_deep_page_starts_the_index_scan_at_the_cursor(self):
+        Product.objects.bulk_create([
+            Product(
+                title=f'bulk {i}', slug=f'bulk-{i}', description='description', price=1000,
+                category=self.category, brand=self.brand, views_count=i % 3,
+            )
+            for i in range(3000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE products_product')
+
+        factory = APIRequestFactory()
+        queryset = Product.objects.filter(status='available')
+        indexes = {'newest': 'product_available_created_idx', 'popular': 'product_available_views_idx'}
+        for ordering, index in indexes.items():
+            paginator = ProductPagination()
+            paginator.page_queryset(queryset, Request(factory.get('/', {'ordering': ordering})))
+            deep = queryset.order_by(*paginator.ordering)[2900]
+            request = Request(factory.get(paginator.encode_cursor(deep, reverse=False)))
+            page = paginator.page_queryset(queryset, request)
+
+            nodes = plan_nodes(page.explain(format='json', analyze=True))
+            scan = next(node for node in nodes if node.get('Index Name') == index)
+            self.assertIn('ROW(', scan.get('Index Cond', ''))
+            self.assertLessEqual(scan['Actual Rows'], paginator.page_size + 1)
+            self.assertEqual(sum(node.get('Rows Removed by Filter', 0) for node in nodes), 0)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('products-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ValuesSerializerTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.phone = self.create_product(
+            price=1250, image='products/phone.jpg',
+            image_derivatives={'source': 'products/phone.jpg', 'files': {'card': {'webp': 'derivatives/phone.webp'}}},
+        )
+        self.case = self.create_product(title='case', brand=Brand.objects.create(name='apple'), is_popular=True)
+        self.create_product(title='sold out', status='unavailable')
+        for product in (self.phone, self.case):
+            ProductRanking.objects.create(
+                product=product, category=self.category, score=product.pk, last_visit_at=timezone.now()
+            )
+
+    def assertMatchesFullSerializer(self, response, serializer_class, instances):
+        data = response.data['results'] if isinstance(response.data, dict) else response.data
+        context = {'request': response.wsgi_request}
+        self.assertEqual(data, serializer_class(instances, many=True, context=context).data)
+
+    def test_lists_match_the_full_serializers(self):
+        response = self.client.get(reverse('products-list'))
+        self.assertMatchesFullSerializer(
+            response, ProductSerializer, Product.objects.filter(status='available').order_by('-created_at', '-id')
+        )
+        self.assertTrue(response.data['results'][-1]['image'].startswith('http://testserver/'))
+
+        response = self.client.get(reverse('products-popular-products'))
+        self.assertMatchesFullSerializer(response, ProductSerializer, [self.case, self.phone])
+
+        for name in ('categories-list', 'categories-active-categories'):
+            response = self.client.get(reverse(name))
+            self.assertMatchesFullSerializer(response, CategorySerializer, Category.objects.all())
+
+    def test_detail_uses_the_full_serializer(self):
+        response = self.client.get(reverse('products-detail', args=[self.phone.pk]))
+        self.assertEqual(
+            response.data, ProductSerializer(self.phone, context={'request': response.wsgi_request}).data
+        )
+
+
+class CommentThreadTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'secret', is_active=True)
+        self.client.force_authenticate(self.user)
+        self.product = self.create_product()
+        self.url = reverse('product-comment-thread', args=[self.product.pk])
+
+    def comment(self, text, parent=None):
+        return ProductComment.objects.create(
+            product=self.product, user=self.user, text=text, parent=parent
+        )
+
+    def test_reply_maintains_thread_columns(self):
+        root = self.comment('root')
+        response = self.client.post(
+            reverse('product-comment-reply', args=[self.product.pk, root.pk]),
+            {'text': 'reply'}
+        )
+        reply = ProductComment.objects.get(pk=response.data['id'])
+        nested = self.comment('nested', parent=reply)
+        self.assertEqual((reply.root_id, reply.depth), (root.pk, 1))
+        self.assertEqual((nested.root_id, nested.depth), (root.pk, 2))
+
+    def test_thread_is_nested_with_constant_queries(self):
+        root = self.comment('root')
+        first = self.comment('first', parent=root)
+        self.comment('second', parent=root)
+        self.comment('nested', parent=first)
+        self.comment('another root')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        threads = {item['text']: item for item in response.data['results']}
+        replies = threads['root']['replies']
+        self.assertEqual([reply['text'] for reply in replies], ['first', 'second'])
+        self.assertEqual(replies[0]['replies'][0]['text'], 'nested')
+        self.assertEqual(threads['another root']['replies'], [])
+
+        for i in range(30):
+            self.comment(f'reply {i}', parent=first)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    @override_settings(THROTTLING={'RATES': {'comments': '1/min'}})
+    def test_writing_comments_is_throttled(self):
+        cache.clear()
+        url = reverse('product-comment-list', args=[self.product.pk])
+        self.assertEqual(self.client.post(url, {'text': 'first'}).status_code, 201)
+        self.assertEqual(self.client.post(url, {'text': 'second'}).status_code, 429)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_replies_cannot_move_to_another_thread(self):
+        root = self.comment('root')
+        reply = self.comment('reply', parent=root)
+        self.comment('nested', parent=reply)
+        other = self.comment('other root')
+
+        url = reverse('product-comment-detail', args=[self.product.pk, reply.pk])
+        response = self.client.put(url, {'text': 'moved', 'parent': other.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+        response = self.client.put(url, {'text': 'edited', 'parent': root.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_depth_limit(self):
+        root = self.comment('root')
+        child = self.comment('child', parent=root)
+        self.comment('grandchild', parent=child)
+
+        response = self.client.get(self.url, {'depth': 1})
+        self.assertEqual(response.data['results'][0]['replies'][0]['replies'], [])
+
+        response = self.client.get(self.url, {'depth': 0})
+        self.assertEqual(response.data['results'][0]['replies'], [])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageDerivativeTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = self.create_product(image=self.upload('phone.png', (2000, 1000)))
+
+    def upload(self, name, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def generate(self):
+        with ThreadPoolExecutor(1) as executor, self.captureOnCommitCallbacks(execute=True):
+            return generate_pending(executor)
+
+    def test_derivatives_are_rendered_and_served(self):
+        url = reverse('products-detail', args=[self.product.pk])
+        self.assertEqual(self.client.get(url).data['image_derivatives'], {})
+
+        self.assertEqual(self.generate(), (1, 0))
+        self.assertEqual(self.generate(), (0, 0))
+
+        self.product.refresh_from_db()
+        files = self.product.image_derivatives['files']
+        self.assertEqual(set(files), {'thumbnail', 'card', 'full'})
+        with default_storage.open(files['full']['webp']) as image:
+            self.assertEqual(Image.open(image).size, (1600, 800))
+        with default_storage.open(files['thumbnail']['jpeg']) as image:
+            self.assertEqual(Image.open(image).size, (160, 80))
+        self.assertRegex(files['card']['webp'], r'^derivatives/products/phone-card\.[0-9a-f]{16}\.webp$')
+
+        urls = self.client.get(url).data['image_derivatives']
+        self.assertEqual(urls['card']['webp'], f"http://testserver/media/{files['card']['webp']}")
+
+    def test_only_changed_images_are_pending(self):
+        self.assertTrue(self.product.derivatives_stale)
+        self.generate()
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.derivatives_stale)
+
+        self.product.title = 'tablet'
+        self.product.save()
+        self.assertFalse(Product.objects.get(pk=self.product.pk).derivatives_stale)
+        self.product.image = self.upload('tablet.png', (100, 100))
+        self.product.save(update_fields=['image'])
+        self.assertTrue(Product.objects.get(pk=self.product.pk).derivatives_stale)
+        self.assertFalse(self.create_product(title='no image').derivatives_stale)
+
+    def test_replaced_and_broken_images(self):
+        self.generate()
+        self.product.image = self.upload('tablet.png', (100, 100))
+        self.product.save()
+        self.assertEqual(self.generate(), (1, 0))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_derivatives['source'], self.product.image.name)
+
+        self.product.image = SimpleUploadedFile('broken.png', b'not an image')
+        self.product.save()
+        self.assertEqual(self.generate(), (0, 1))
+        self.assertEqual(self.generate(), (0, 0))
+        self.product.refresh_from_db()
+        self.assertIn('error', self.product.image_derivatives)
+
+
+@override_settings(ROOT_URLCONF='products.async_urls')
+class AsyncViewTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = self.create_product()
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'secret', is_active=True)
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_list_matches_the_drf_view(self):
+        response = await self.async_client.get(reverse('products-list'), {'page_size': 5})
+        with self.settings(ROOT_URLCONF='products.urls'):
+            await cache.aclear()
+            expected = await self.async_client.get(reverse('products-list'), {'page_size': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_detail_answers_conditional_requests(self):
+        url = reverse('products-detail', args=[self.product.pk])
+        first = await self.async_client.get(url)
+        self.assertEqual(first.json()['title'], 'phone')
+        second = await self.async_client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+        missing = await self.async_client.get(reverse('products-detail', args=[self.product.pk + 1]))
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(missing.json(), {'detail': 'No Product matches the given query.'})
+
+    async def test_invalid_parameters_are_rejected(self):
+        response = await self.async_client.get(reverse('products-popular-products'), {'page_size': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('page_size', response.json())
+
+    async def test_comments_require_authentication(self):
+        url = reverse('product-comment-thread', args=[self.product.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+        response = await self.async_client.get(url, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    async def test_other_methods_reach_the_viewsets(self):
+        url = reverse('product-comment-list', args=[self.product.pk])
+        response = await self.async_client.post(url, {'text': 'nice'}, headers=self.auth)
+        self.assertEqual(response.status_code, 201)
+
+        response = await self.async_client.get(url, headers=self.auth)
+        self.assertEqual([comment['text'] for comment in response.json()['results']], ['nice'])
+
+        response = await self.async_client.post(reverse('products-popular-products'))
+        self.assertEqual(response.status_code, 405)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN checks need PostgreSQL')
+class QueryPlanTests(APITestCase):
+    def test_hot_queries_use_indexes(self):
+        # with the default planner settings smaller tables are rightly scanned
+        call_command('check_query_plans', rows=5000, stdout=StringIO())
+
+
+@override_settings(REQUEST_METRICS={'ENABLED': True, 'SLOW_REQUEST_MS': 500})
+class RequestMetricsTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+        self.create_product()
+
+    def metrics(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.get(reverse('products-list'))
+        self.client.get(reverse('products-list'))
+        self.client.get(reverse('products-detail', args=[0]))
+        metrics = self.metrics()
+
+        labels = 'view="products-list",method="GET"'
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', metrics)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', metrics)
+        self.assertIn(f'http_response_render_seconds_count{{{labels}}} 2', metrics)
+        self.assertIn(f'http_responses_total{{{labels},status="200"}} 2', metrics)
+        self.assertIn('http_responses_total{view="products-detail",method="GET",status="404"} 1', metrics)
+        # the second list is served from the catalog cache without touching the database
+        self.assertIn(f'http_request_db_queries_bucket{{{labels},le="0"}} 1', metrics)
+        self.assertNotIn('view="metrics"', self.metrics())
+
+    async def test_async_views_record_their_queries(self):
+        with self.settings(ROOT_URLCONF='products.async_urls'):
+            await self.async_client.get(reverse('products-list'))
+        metrics = await sync_to_async(self.metrics)()
+        labels = 'view="products-list",method="GET"'
+        self.assertIn(f'http_request_db_queries_count{{{labels}}} 1', metrics)
+        self.assertNotIn(f'http_request_db_queries_bucket{{{labels},le="0"}} 1', metrics)
+
+    @override_settings(REQUEST_METRICS={'ENABLED': True, 'SLOW_REQUEST_MS': 0.001})
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.client.get(reverse('products-list'))
+        self.assertIn('Slow request GET /products/ (products-list) 200', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(REQUEST_METRICS={'ENABLED': False})
+    def test_disabled_metrics_record_nothing(self):
+        self.client.get(reverse('products-list'))
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with self.settings(REQUEST_METRICS={'ENABLED': True}):
+            self.assertNotIn('products-list', self.metrics())
+
+
+class SeedingTests(APITestCase):
+    def test_reserved_units_are_out_of_the_inventory(self):
+        Seeder(seed=0).seed(
+            categories=2, brands=2, products=20, users=100, carts=100,
+            visits=0, daily_visits=0, comments=0, emails=0,
+        )
+        self.assertTrue(CartItem.objects.filter(reserved_quantity__gt=0).exists())
+        self.assertFalse(Product.objects.filter(inventory__lt=0).exists())
+        # returning every reservation gives back the seeded stock, at most 100 units
+        CartItem.objects.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        release_expired()
+        self.assertFalse(Product.objects.filter(inventory__gt=100).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'the seeded benchmark data needs PostgreSQL')
+class EndpointBenchmarkTests(APITestCase):
+    def test_results_are_compared_with_the_baseline(self):
+        baseline = os.path.join(tempfile.mkdtemp(), 'endpoints.json')
+        options = {'rows': 200, 'requests': 3, 'baseline': Path(baseline), 'stdout': StringIO()}
+        endpoints = ['products-list', 'carts-add-item', 'user-registration']
+        cache.set('auth:revoked:benchmark', True)
+        call_command('benchmark_endpoints', *endpoints, save=True, **options)
+        # runs clear their own caches only
+        self.assertTrue(cache.get('auth:revoked:benchmark'))
+        with open(baseline) as file:
+            results = json.load(file)
+        self.assertEqual(sorted(results), sorted(endpoints))
+
+        results['products-list']['queries'] = 0
+        with open(baseline, 'w') as file:
+            json.dump(results, file)
+        with self.assertRaisesMessage(CommandError, '1 endpoints regressed: products-list'):
+            call_command('benchmark_endpoints', 'products-list', tolerance=100, **options)
+
+
+class SlugTests(ProductTestMixin, APITestCase):
+    def test_collisions_get_suffixes(self):
+        slugs = [self.create_product('Phone!').slug for _ in range(3)]
+        self.assertEqual(slugs, ['phone', 'phone-2', 'phone-3'])
+        self.assertEqual(Category.objects.create(title='mobile').slug, 'mobile-2')
+
+        long_title = 'x' * 60
+        self.assertEqual(self.create_product(long_title).slug, 'x' * 50)
+        self.assertEqual(self.create_product(long_title).slug, 'x' * 48 + '-2')
+
+    def test_persian_titles(self):
+        self.assertEqual(self.create_product('گوشی سامسونگ').slug, 'گوشی-سامسونگ')
+        self.assertEqual(self.create_product('گوشی سامسونگ').slug, 'گوشی-سامسونگ-2')
+        self.assertEqual(Brand.objects.create(name='!!!').slug, 'brand')
+
+    def test_slug_follows_title_changes_only(self):
+        product = Product.objects.get(pk=self.create_product().pk)
+        with patch('products.slugs.unique_slugs') as unique_slugs:
+            product.price = 2000
+            product.save()
+            product.save(update_fields=['views_count'])
+        unique_slugs.assert_not_called()
+
+        product.title = 'tablet'
+        product.save()
+        self.assertEqual(product.slug, 'tablet')
+
+        product.title = 'tablet pro'
+        product.slug = 'custom'
+        product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).slug, 'custom')
+
+    def test_concurrent_saves_look_the_slug_up_again(self):
+        self.create_product('phone')
+        looked_up = []
+
+        def racing_unique_slugs(model, values, exclude_pk=None):
+            # the first lookup ran before the other save committed 'phone'
+            looked_up.append(values)
+            return ['phone'] if len(looked_up) == 1 else unique_slugs(model, values, exclude_pk)
+
+        with patch('products.slugs.unique_slugs', racing_unique_slugs):
+            product = self.create_product('phone')
+        self.assertEqual(product.slug, 'phone-2')
+        self.assertEqual(len(looked_up), 2)
+
+    def test_bulk_slugs_use_one_query(self):
+        self.create_product('phone')
+        with self.assertNumQueries(1):
+            slugs = unique_slugs(Product, ['phone', 'Phone', 'tablet'])
+        self.assertEqual(slugs, ['phone-2', 'phone-3', 'tablet'])
+
+
+class CatalogImportExportTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        self.create_product(title='old phone', price=100)
+        self.admin = User.objects.create_user(
+            'admin', 'admin@example.com', 'secret', is_active=True, is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+
+    def csv_file(self, rows):
+        header = 'slug,title,description,price,category,brand,status,inventory\n'
+        return SimpleUploadedFile('products.csv', (header + ''.join(rows)).encode())
+
+    def test_import_upserts_on_slug(self):
+        upload = self.csv_file([
+            'old-phone,old phone,updated,250,mobile,samsung,,7\n',
+            ',new phone,fresh,300,mobile,samsung,limited,3\n',
+            ',broken,bad price,-5,mobile,samsung,,1\n',
+            ',unknown,no category,10,laptop,samsung,,1\n',
+        ])
+        # lookups, existing slugs, upsert, search index and cart refresh, independent of row count
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                reverse('products-import-products'), {'file': upload}, format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual([error['line'] for error in response.data['errors']], [4, 5])
+        self.assertEqual(Product.objects.get(slug='old-phone').price, 250)
+        self.assertEqual(Product.objects.get(slug='new-phone').status, 'limited')
+
+    def test_import_rejects_repeated_slugs(self):
+        stream = StringIO(
+            'slug,title,description,price,category,brand,status,inventory\n'
+            ',Smart Phone,first,300,mobile,samsung,,3\n'
+            'old-phone,old phone,updated,250,mobile,samsung,,7\n'
+            ',smart  phone!,second,400,mobile,samsung,,3\n'
+        )
+        # the repeat lands in the second chunk
+        result = catalog_io.import_products(stream, 'csv', chunk_size=2)
+        self.assertEqual((result['created'], result['updated'], result['invalid']), (1, 1, 1))
+        self.assertEqual(result['errors'][0]['line'], 4)
+        self.assertIn('سطر 2', result['errors'][0]['errors']['slug'][0])
+        self.assertEqual(Product.objects.get(slug='smart-phone').description, 'first')
+
+    def test_import_invalidates_cached_details(self):
+        product = Product.objects.get(slug='old-phone')
+        cache.clear()
+        url = reverse('products-detail', args=[product.pk])
+        self.assertEqual(self.client.get(url).data['price'], '100')
+
+        upload = self.csv_file(['old-phone,old phone,updated,250,mobile,samsung,,7\n'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('products-import-products'), {'file': upload}, format='multipart')
+        self.assertEqual(self.client.get(url).data['price'], '250')
+
+    def test_import_jsonl_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'products.jsonl')
+        with open(path, 'w') as stream:
+            stream.write('{"title": "tablet", "description": "x", "price": 10, "category": "mobile", "brand": "samsung"}\n')
+            stream.write('not json\n')
+        out, err = StringIO(), StringIO()
+        call_command('import_products', path, stdout=out, stderr=err)
+        self.assertIn('1 created, 0 updated, 1 invalid', out.getvalue())
+        self.assertTrue(Product.objects.filter(slug='tablet').exists())
+
+    def test_export_round_trip(self):
+        response = self.client.get(reverse('products-export-products'))
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+            content.splitlines(),
+            ['slug,title,description,price,category,brand,status,inventory',
+             'old-phone,old phone,description,100,mobile,samsung,available,1']
+        )
+
+        out = StringIO()
+        call_command('export_products', format='jsonl', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['price'], '100')
+
+    def test_import_requires_staff(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(reverse('products-import-products'), {})
+        self.assertIn(response.status_code, (401, 403))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'full-text search needs PostgreSQL')
+class ProductSearchTests(ProductTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.phone = self.create_product(title='galaxy phone', price=500)
+        self.laptop = self.create_product(title='gaming laptop', price=2000)
+        self.url = reverse('products-search')
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.data]
+
+    def test_title_match_ranks_first(self):
+        self.create_product(title='tablet', description='works with any phone')
+        self.assertEqual(self.search(q='phone'), ['galaxy phone', 'tablet'])
+
+    def test_title_matches_survive_the_candidate_cap(self):
+        self.create_product(title='pixel')
+        # newer description matches fill the capped candidates
+        for i in range(3):
+            self.create_product(title=f'case {i}', description='fits the pixel')
+        with patch('products.search.RANK_CANDIDATES', 2):
+            self.assertEqual(self.search(q='pixel')[0], 'pixel')
+
+    def test_unused_terms_are_pruned(self):
+        self.phone.title = 'galaxy handset'
+        self.phone.save()
+        out = StringIO()
+        call_command('prune_search_terms', stdout=out)
+        self.assertIn('1 search terms pruned', out.getvalue())
+        self.assertFalse(SearchTerm.objects.filter(word='phone').exists())
+        self.assertTrue(SearchTerm.objects.filter(word='handset').exists())
+
+    def test_category_and_brand_are_searchable(self):
+        self.assertEqual(len(self.search(q='samsung')), 2)
+        self.brand.name = 'apple'
+        self.brand.save()
+        self.assertEqual(self.search(q='apple gaming'), ['gaming laptop'])
+
+    def test_typo_falls_back_to_closest_word(self):
+        self.assertEqual(self.search(q='labtop'), ['gaming laptop'])
+        self.assertEqual(self.search(q='qwxz'), [])
+
+    def test_filters(self):
+        self.assertEqual(self.search(q='samsung', max_price=1000), ['galaxy phone'])
+        self.create_product(title='old phone', status='unavailable')
+        self.assertEqual(self.search(q='phone'), ['galaxy phone'])
+        self.assertEqual(self.search(q='phone', status='unavailable'), ['old phone'])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
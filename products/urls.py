@@ -5,6 +5,7 @@ from .views import (
     ProductViewSet, 
     CartViewSet, 
     ProductCommentViewSet,
+    CatalogCacheStatsView,
     product_detail
 )
 router = routers.DefaultRouter()
@@ -18,9 +19,12 @@ urlpatterns = [
 
     # Product Comment URLs
     path('products/<int:product_pk>/comments/', ProductCommentViewSet.as_view({'get': 'list', 'post': 'create'}), name='product-comment-list'),
+    path('products/<int:product_pk>/comments/thread/', ProductCommentViewSet.as_view({'get': 'thread'}), name='product-comment-thread'),
     path('products/<int:product_pk>/comments/<int:pk>/', ProductCommentViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='product-comment-detail'),
     path('products/<int:product_pk>/comments/<int:pk>/reply/', ProductCommentViewSet.as_view({'post': 'reply'}), name='product-comment-reply'),
 
+    path('catalog-cache/stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
+
     # Product Detail View
     path('products/<int:product_id>/detail/', product_detail, name='product-detail-view'),
 ]
\ No newline at end of file
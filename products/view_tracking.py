@@ -0,0 +1,240 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Case, F, When
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Product, VisitedProduct
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENGINE': 'products.view_tracking.BufferedViewTracker',
+    'CACHE_ALIAS': 'default',
+    # seconds between background flushes, None disables the flusher thread
+    'FLUSH_INTERVAL': 10,
+    # number of buffered visits that triggers an early flush
+    'FLUSH_THRESHOLD': 500,
+    'BATCH_SIZE': 1000,
+}
+
+FLUSH_REQUEST_KEY = 'product_views:flush_request'
+
+
+def get_tracking_options():
+    return {**DEFAULTS, **getattr(settings, 'PRODUCT_VIEW_TRACKING', {})}
+
+
+class BaseViewTracker:
+    """
+    Deduplicates product visits per (product, user or ip, day) in the cache
+    and leaves persisting the visit to subclasses.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.cache = caches[options['CACHE_ALIAS']]
+
+    def visitor_key(self, product_id, user_ip, user_id):
+        visitor = f'u{user_id}' if user_id else f'ip{user_ip}'
+        return f'product_views:seen:{timezone.localdate().isoformat()}:{product_id}:{visitor}'
+
+    def seconds_until_tomorrow(self):
+        now = timezone.localtime()
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return max(int((tomorrow - now).total_seconds()), 1)
+
+    def record(self, product, user_ip, user=None):
+        user_id = user.pk if user is not None else None
+        key = self.visitor_key(product.pk, user_ip, user_id)
+        if not self.cache.add(key, 1, timeout=self.seconds_until_tomorrow()):
+            return False
+        self.store(product.pk, user_ip, user_id)
+        return True
+
+    def store(self, product_id, user_ip, user_id):
+        raise NotImplementedError
+
+    def flush(self):
+        return 0
+
+    def request_flush(self):
+        self.cache.set(FLUSH_REQUEST_KEY, time.time(), timeout=None)
+
+    def write_visits(self, counts, visits):
+        existing_products = set(
+            Product.objects.filter(pk__in=counts).values_list('pk', flat=True)
+        )
+        user_ids = {visit.user_id for visit in visits if visit.user_id}
+        existing_users = set(
+            User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        ) if user_ids else set()
+
+        visits = [
+            visit for visit in visits
+            if visit.product_id in existing_products
+            and (visit.user_id is None or visit.user_id in existing_users)
+        ]
+        whens = [
+            When(pk=pk, then=F('views_count') + count)
+            for pk, count in sorted(counts.items())
+            if pk in existing_products
+        ]
+        if not whens:
+            return 0
+
+        with transaction.atomic():
+            VisitedProduct.objects.bulk_create(visits, batch_size=self.options['BATCH_SIZE'])
+            Product.objects.filter(pk__in=existing_products).update(
+                views_count=Case(
+                    *whens,
+                    default=F('views_count'),
+                    output_field=Product._meta.get_field('views_count'),
+                ),
+            )
+        return len(visits)
+
+
+class DirectViewTracker(BaseViewTracker):
+    """Writes every new visit immediately, inside the request."""
+
+    def store(self, product_id, user_ip, user_id):
+        self.write_visits(
+            {product_id: 1},
+            [VisitedProduct(product_id=product_id, user_ip=user_ip, user_id=user_id)],
+        )
+
+
+class BufferedViewTracker(BaseViewTracker):
+    """
+    Aggregates new visits in memory and writes them in batches from a
+    background thread, so the view endpoint never waits on the database.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._visits = []
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._last_flush = time.monotonic()
+        self._last_flush_request = self.cache.get(FLUSH_REQUEST_KEY)
+
+    @property
+    def pending(self):
+        return len(self._visits)
+
+    def store(self, product_id, user_ip, user_id):
+        with self._lock:
+            self._counts[product_id] += 1
+            self._visits.append(
+                VisitedProduct(product_id=product_id, user_ip=user_ip, user_id=user_id)
+            )
+            threshold_reached = len(self._visits) >= self.options['FLUSH_THRESHOLD']
+
+        if self.options['FLUSH_INTERVAL'] is None:
+            if threshold_reached:
+                self.flush()
+            return
+
+        self._ensure_flusher()
+        if threshold_reached:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            counts, visits = self._counts, self._visits
+            self._counts, self._visits = Counter(), []
+            self._last_flush = time.monotonic()
+        if not counts:
+            return 0
+
+        try:
+            return self.write_visits(counts, visits)
+        except DatabaseError:
+            logger.exception('Flushing %d product views failed, keeping them buffered', len(visits))
+            with self._lock:
+                self._counts.update(counts)
+                self._visits[:0] = visits
+            return 0
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='product-view-flusher', daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _flush_requested(self):
+        requested_at = self.cache.get(FLUSH_REQUEST_KEY)
+        if requested_at != self._last_flush_request:
+            self._last_flush_request = requested_at
+            return True
+        return False
+
+    def _run(self):
+        interval = self.options['FLUSH_INTERVAL']
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=min(interval, 1))
+            self._wakeup.clear()
+            due = time.monotonic() - self._last_flush >= interval
+            if due or self._flush_requested() or self.pending >= self.options['FLUSH_THRESHOLD']:
+                close_old_connections()
+                self.flush()
+                close_old_connections()
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_view_tracker():
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                options = get_tracking_options()
+                _tracker = import_string(options['ENGINE'])(options)
+    return _tracker
+
+
+def reset_view_tracker():
+    global _tracker
+    with _tracker_lock:
+        tracker, _tracker = _tracker, None
+    if isinstance(tracker, BufferedViewTracker):
+        tracker.stop()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ('PRODUCT_VIEW_TRACKING', 'CACHES'):
+        reset_view_tracker()
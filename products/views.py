@@ -1,88 +1,210 @@
+import io
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser, FileUploadParser
 from django.shortcuts import get_object_or_404, render
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.contrib.auth import get_user_model
+from core.throttling import RateLimitMixin, client_ip
 from .models import (
     Category, Product, VisitedProduct,
     Cart, CartItem, ProductComment
 )
 from .serializers import (
-    CategorySerializer, 
-    ProductSerializer,
-    CartSerializer, CartItemSerializer, 
-    ProductCommentSerializer
+    CategorySerializer, CategoryValuesSerializer,
+    ProductSerializer, ProductValuesSerializer,
+    CartSerializer, CartItemSerializer, OrderSerializer,
+    ProductCommentSerializer,
+    ProductCommentThreadSerializer,
+    ProductSearchSerializer,
+    PopularProductsSerializer,
+    VisitStatsSerializer
 )
 from .permissions import (
     IsAdminOrReadOnly,
     IsOwnerOrReadOnly
 )
+from .view_tracking import get_view_tracker
+from .cache import CatalogCacheMixin, get_stats
+from .pagination import ProductPagination, CommentPagination
+from . import catalog_io, inventory
+from .search import search_products
+from .visit_history import daily_visits
 
 User = get_user_model()
 
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class ValuesReadMixin:
+    """Serves ``values_actions`` from ``.values()`` rows with ``values_serializer_class``."""
+    values_actions = ('list',)
+    values_serializer_class = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.values_actions:
+            return self.values_serializer_class.rows(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in self.values_actions:
+            return self.values_serializer_class
+        return super().get_serializer_class()
+
+
+class CategoryViewSet(CatalogCacheMixin, ValuesReadMixin, viewsets.ModelViewSet):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
+    values_serializer_class = CategoryValuesSerializer
+    values_actions = ('list', 'active_categories')
     permission_classes = [IsAdminOrReadOnly]
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response('categories', super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response('categories', super().retrieve, request, *args, **kwargs)
+
     @action(detail=False, methods=['GET'])
     def active_categories(self, request, *args, **kwargs):
+        return self.cached_response('categories', self._active_categories, request)
+
+    def _active_categories(self, request):
         categories = self.get_queryset()
         serializer = self.get_serializer(categories, many=True)
         return Response(serializer.data)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CatalogCacheMixin, ValuesReadMixin, viewsets.ModelViewSet):
     queryset = Product.objects.filter(status='available')
     serializer_class = ProductSerializer
+    values_serializer_class = ProductValuesSerializer
+    values_actions = ('list', 'popular_products')
+    pagination_class = ProductPagination
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response('products', super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not kwargs['pk'].isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(
+            f"product:{int(kwargs['pk'])}", super().retrieve, request, *args, **kwargs
+        )
 
     def get_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return client_ip(request)
 
     @action(detail=True, methods=['GET'])
     def view_product(self, request, *args, **kwargs):
         product = self.get_object()
-        user_ip = self.get_ip(request)
-        
-        view_entry, created = VisitedProduct.objects.get_or_create(
-            product=product,
-            user_ip=user_ip,
-            visited_date=timezone.now().date(),
-            defaults={
-                'user': request.user if request.user.is_authenticated else None
-            }
+        is_new_view = get_view_tracker().record(
+            product,
+            self.get_ip(request),
+            request.user if request.user.is_authenticated else None
         )
-        
-        if created:
-            Product.objects.filter(pk=product.pk).update(
-                views_count=F('views_count') + 1,
-                is_popular= True
-            )
-        
+
         serializer = self.get_serializer(product)
         return Response({
             'product': serializer.data,
-            'is_new_view': created
+            'is_new_view': is_new_view
         })
 
+    @action(detail=True, methods=['GET'], permission_classes=[IsAdminUser])
+    def visit_stats(self, request, *args, **kwargs):
+        product = get_object_or_404(Product, pk=kwargs['pk'])
+        params = VisitStatsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(daily_visits(product.pk, params.validated_data['days']))
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser, FileUploadParser]
+    )
+    def import_products(self, request, *args, **kwargs):
+        upload = request.data.get('file')
+        if upload is None:
+            return Response({
+                'error': 'فایل ارسال نشده است'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.query_params.get('file_format') or catalog_io.detect_format(upload.name)
+        if file_format not in catalog_io.FORMATS:
+            return Response({
+                'error': 'فرمت فایل پشتیبانی نمی‌شود'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        result = catalog_io.import_products(stream, file_format)
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['GET'], permission_classes=[IsAdminUser])
+    def export_products(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in catalog_io.FORMATS:
+            return Response({
+                'error': 'فرمت فایل پشتیبانی نمی‌شود'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            catalog_io.export_products(file_format),
+            content_type=f'{content_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
+
+    @action(detail=False, methods=['GET'])
+    def search(self, request, *args, **kwargs):
+        return self.cached_response('products', self._search, request)
+
+    def _search(self, request):
+        params = ProductSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = {'status': params.validated_data['status']}
+        if 'category' in params.validated_data:
+            filters['category_id'] = params.validated_data['category']
+        if 'brand' in params.validated_data:
+            filters['brand_id'] = params.validated_data['brand']
+        if 'min_price' in params.validated_data:
+            filters['price__gte'] = params.validated_data['min_price']
+        if 'max_price' in params.validated_data:
+            filters['price__lte'] = params.validated_data['max_price']
+
+        products = search_products(
+            Product.objects.filter(**filters),
+            params.validated_data['q'],
+            params.validated_data['page_size']
+        )
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['GET'])
     def popular_products(self, request, *args, **kwargs):
-        popular_products = self.get_queryset().filter(
-            is_popular=True
-        ).order_by('-views_count')[:10]
+        return self.cached_response('popular', self._popular_products, request)
 
+    def _popular_products(self, request):
+        params = PopularProductsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        popular_products = popular_queryset(self.get_queryset(), params.validated_data)
         serializer = self.get_serializer(popular_products, many=True)
         return Response(serializer.data)
 
 
+def popular_queryset(products, params):
+    popular_products = products.filter(ranking__isnull=False)
+    if 'category' in params:
+        popular_products = popular_products.filter(ranking__category_id=params['category'])
+    return popular_products.order_by('-ranking__score')[:params['page_size']]
+
+
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
@@ -90,50 +212,55 @@ class CartViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user if self.request.user.is_authenticated else None
         if user:
-            return Cart.objects.filter(user=self.request.user, is_paid=False)
+            queryset = Cart.objects.filter(user=self.request.user, is_paid=False)
+            if self.action in ('list', 'retrieve'):
+                queryset = queryset.prefetch_related(
+                    Prefetch('items', queryset=CartItem.objects.select_related('product'))
+                )
+            return queryset
 
     @action(detail=True, methods=['POST'])
     def add_item(self, request, *args, **kwargs):
         cart = self.get_object()
-        product_id = request.data.get('product_id')
-        quantity = request.data.get('quantity', 1)
+        product_id = self.get_positive_int(request, 'product_id')
+        quantity = self.get_positive_int(request, 'quantity', default=1)
+        if product_id is None:
+            return Response({
+                'error': 'محصول یافت نشد'
+            }, status=status.HTTP_404_NOT_FOUND)
+        if quantity is None:
+            return Response({
+                'error': 'تعداد نامعتبر است'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            product = Product.objects.get(id=product_id, status='available')
-            
-            if product.inventory < quantity:
-                return Response({
-                    'error': 'موجودی محصول کافی نیست'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart, 
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
-
-            serializer = CartItemSerializer(cart_item)
-            return Response(serializer.data)
+            cart_item = inventory.add_to_cart(cart, product_id, quantity)
+        except inventory.InsufficientInventory:
+            return Response({
+                'error': 'موجودی محصول کافی نیست'
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Product.DoesNotExist:
             return Response({
                 'error': 'محصول یافت نشد'
             }, status=status.HTTP_404_NOT_FOUND)
 
+        serializer = CartItemSerializer(cart_item)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['POST'])
     def remove_item(self, request, *args, **kwargs):
         cart = self.get_object()
         cart_item_id = request.data.get('cart_item_id')
 
         try:
-            cart_item = CartItem.objects.get(
-                cart=cart, 
-                id=cart_item_id
-            )
-            cart_item.delete()
+            with transaction.atomic():
+                inventory.lock_cart(cart)
+                cart_item = CartItem.objects.get(
+                    cart=cart, 
+                    id=cart_item_id
+                )
+                cart_item.delete()
+                Cart.objects.filter(pk=cart.pk).update_totals()
             return Response({
                 'status': 'محصول از سبد خرید حذف شد'
             })
@@ -146,31 +273,74 @@ class CartViewSet(viewsets.ModelViewSet):
     def update_item_quantity(self, request, *args, **kwargs):
         cart = self.get_object()
         cart_item_id = request.data.get('cart_item_id')
-        new_quantity = request.data.get('quantity')
+        new_quantity = self.get_positive_int(request, 'quantity')
+        if new_quantity is None:
+            return Response({
+                'error': 'تعداد نامعتبر است'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            cart_item = CartItem.objects.get(cart=cart, id=cart_item_id)
-            product = cart_item.product
-
-            if product.inventory < new_quantity:
-                return Response({
-                    'error': 'موجودی محصول کافی نیست'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            cart_item.quantity = new_quantity
-            cart_item.save()
-
-            serializer = CartItemSerializer(cart_item)
-            return Response(serializer.data)
+            cart_item = inventory.set_quantity(cart, cart_item_id, new_quantity)
+        except inventory.InsufficientInventory:
+            return Response({
+                'error': 'موجودی محصول کافی نیست'
+            }, status=status.HTTP_400_BAD_REQUEST)
         except CartItem.DoesNotExist:
             return Response({
                 'error': 'محصول در سبد خرید یافت نشد'
             }, status=status.HTTP_404_NOT_FOUND)
+        except Product.DoesNotExist:
+            return Response({
+                'error': 'محصول یافت نشد'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = CartItemSerializer(cart_item)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['POST'])
+    def checkout(self, request, *args, **kwargs):
+        cart = self.get_object()
+        try:
+            order = inventory.checkout(cart)
+        except inventory.EmptyCart:
+            return Response({
+                'error': 'سبد خرید خالی است'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except inventory.InsufficientInventory:
+            return Response({
+                'error': 'موجودی محصول کافی نیست'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Cart.DoesNotExist:
+            return Response({
+                'error': 'سبد خرید یافت نشد'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Product.DoesNotExist:
+            return Response({
+                'error': 'محصول یافت نشد'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = OrderSerializer(order)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @staticmethod
+    def get_positive_int(request, field, default=None):
+        try:
+            value = int(request.data.get(field, default))
+        except (TypeError, ValueError):
+            return None
+        return value if value >= 1 else None
 
-class ProductCommentViewSet(viewsets.ModelViewSet):
+
+class ProductCommentViewSet(RateLimitMixin, viewsets.ModelViewSet):
     serializer_class = ProductCommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CommentPagination
+    throttle_scope = 'comments'
+    thread_max_depth = 10
+
+    def get_throttles(self):
+        # only writing comments is limited, reading threads is not
+        return super().get_throttles() if self.action in ('create', 'reply') else []
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_pk')
@@ -184,6 +354,28 @@ class ProductCommentViewSet(viewsets.ModelViewSet):
             product=product
         )
 
+    @action(detail=False, methods=['GET'])
+    def thread(self, request, *args, **kwargs):
+        depth = self.get_thread_depth(request)
+        roots = self.paginate_queryset(self.get_queryset().filter(parent__isnull=True))
+        replies = []
+        if depth and roots:
+            replies = list(thread_replies(self.get_queryset(), roots, depth))
+        link_thread(roots, replies)
+
+        serializer = ProductCommentThreadSerializer(
+            roots, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @classmethod
+    def get_thread_depth(cls, request):
+        try:
+            depth = int(request.query_params.get('depth', cls.thread_max_depth))
+        except ValueError:
+            depth = cls.thread_max_depth
+        return max(0, min(depth, cls.thread_max_depth))
+
     @action(detail=True, methods=['POST'])
     def reply(self, request, *args, **kwargs):
         parent_comment = self.get_object()
@@ -200,6 +392,29 @@ class ProductCommentViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+def thread_replies(comments, roots, depth):
+    return comments.filter(
+        root__in=[comment.pk for comment in roots], depth__lte=depth
+    ).order_by('created_date', 'id')
+
+
+def link_thread(roots, replies):
+    """Attach every reply to its parent's ``thread_replies``, replies come oldest first."""
+    nodes = {}
+    for comment in [*roots, *replies]:
+        comment.thread_replies = []
+        nodes[comment.pk] = comment
+    for comment in replies:
+        nodes[comment.parent_id].thread_replies.append(comment)
+
+
+class CatalogCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats())
+
+
 def product_detail(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     return render(request, 'products/product_detail.html', {'product': product})
\ No newline at end of file
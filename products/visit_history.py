@@ -0,0 +1,110 @@
+"""
+Visit history. Raw ``VisitedProduct`` rows are kept for ``RAW_DAYS``, then
+whole days are folded into ``ProductDailyVisits`` and deleted, so the raw
+table stays a fixed window while the daily rollups keep the history small
+and indexed by product and date.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import VisitedProduct, ProductDailyVisits, ProductRanking
+
+
+DEFAULTS = {
+    'RAW_DAYS': 30,
+    'ROLLUP_DAYS': 2 * 365,
+    # whole days folded and deleted per transaction
+    'BATCH_DAYS': 7,
+}
+
+COMPACT_SQL = f'''
+INSERT INTO {ProductDailyVisits._meta.db_table} AS daily (product_id, date, visits, visitors)
+SELECT product_id, (visited_date AT TIME ZONE %(tz)s)::date AS day, count(*), count(DISTINCT user_ip)
+FROM {VisitedProduct._meta.db_table}
+WHERE visited_date >= %(start)s AND visited_date < %(end)s
+GROUP BY product_id, day
+ON CONFLICT (product_id, date) DO UPDATE SET
+    visits = daily.visits + EXCLUDED.visits,
+    visitors = daily.visitors + EXCLUDED.visitors
+'''
+
+
+def get_history_options():
+    return {**DEFAULTS, **getattr(settings, 'VISIT_HISTORY', {})}
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def compact_visits(raw_days=None, batch_days=None):
+    """
+    Fold the raw visits of every whole day older than ``raw_days`` into daily
+    rollups, ``batch_days`` days per transaction with one range delete.
+    Returns the number of raw rows removed.
+    """
+    options = get_history_options()
+    raw_days = raw_days if raw_days is not None else options['RAW_DAYS']
+    batch_days = batch_days or options['BATCH_DAYS']
+    # visits the popularity ranking has not merged yet must stay raw, without
+    # rankings it has merged nothing
+    ranked_until = ProductRanking.objects.aggregate(last=Max('last_visit_at'))['last']
+    if ranked_until is None:
+        return 0
+    cutoff = min(timezone.now() - timedelta(days=raw_days), ranked_until)
+    cutoff_start = day_start(timezone.localdate(cutoff))
+
+    compacted = 0
+    while True:
+        # ids do not follow visited_date for backdated visits; the BRIN index
+        # limits the scan to the block ranges holding visits before the cutoff
+        oldest = VisitedProduct.objects.filter(visited_date__lt=cutoff_start).aggregate(
+            oldest=Min('visited_date')
+        )['oldest']
+        if oldest is None:
+            return compacted
+
+        start = day_start(timezone.localdate(oldest))
+        end = min(day_start(timezone.localdate(oldest) + timedelta(days=batch_days)), cutoff_start)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(COMPACT_SQL, {'tz': timezone.get_current_timezone_name(), 'start': start, 'end': end})
+            deleted, _ = VisitedProduct.objects.filter(visited_date__gte=start, visited_date__lt=end).delete()
+        compacted += deleted
+
+
+def purge_rollups(rollup_days=None):
+    rollup_days = rollup_days if rollup_days is not None else get_history_options()['ROLLUP_DAYS']
+    deleted, _ = ProductDailyVisits.objects.filter(
+        date__lt=timezone.localdate() - timedelta(days=rollup_days)
+    ).delete()
+    return deleted
+
+
+def daily_visits(product_id, days):
+    """Visits and distinct visitor IPs of the last ``days`` days, oldest first."""
+    first_day = timezone.localdate() - timedelta(days=days - 1)
+    totals = {
+        first_day + timedelta(days=offset): {'visits': 0, 'visitors': 0}
+        for offset in range(days)
+    }
+    rollups = ProductDailyVisits.objects.filter(
+        product_id=product_id, date__gte=first_day
+    ).values_list('date', 'visits', 'visitors')
+    raw = (
+        VisitedProduct.objects.filter(product_id=product_id, visited_date__gte=day_start(first_day))
+        .annotate(date=TruncDate('visited_date'))
+        .values('date')
+        .annotate(visits=Count('id'), visitors=Count('user_ip', distinct=True))
+        .values_list('date', 'visits', 'visitors')
+    )
+    for day, visits, visitors in [*rollups, *raw]:
+        if day in totals:
+            totals[day]['visits'] += visits
+            totals[day]['visitors'] += visitors
+    return [{'date': day, **counts} for day, counts in totals.items()]